@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import Counter, deque
+
+
+class AnalysisScheduler:
+    """Chooses how long to wait before the next perception analysis.
+
+    The interval starts from need and is then held to a CPU budget:
+    - max_interval during steady narration, interaction_interval while the
+      child is being prompted;
+    - shorter (down to min_interval) while the labels keep changing;
+    - busy_factor times longer while TTS or STT is running (busy_fn);
+    - never so short that analysis would use more than cpu_budget of a core,
+      based on an EMA of the measured analysis cost.
+    Every decision is counted by reason, and stats() reports the achieved rate.
+    """
+
+    def __init__(self, min_interval=0.5, max_interval=5.0, interaction_interval=1.0,
+                 cpu_budget=0.25, busy_factor=2.0, busy_fn=None, change_alpha=0.3,
+                 cost_alpha=0.2):
+        """
+        :param min_interval: Shortest interval in seconds.
+        :param max_interval: Interval during steady narration.
+        :param interaction_interval: Interval while a prompt is in progress.
+        :param cpu_budget: Share of one core analysis may use (0-1).
+        :param busy_factor: Interval multiplier while busy_fn() is true.
+        :param busy_fn: Callable returning True while TTS/STT is running.
+        :param change_alpha: EMA weight of the newest "labels changed" sample.
+        :param cost_alpha: EMA weight of the newest analysis cost.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interaction_interval = interaction_interval
+        self.cpu_budget = cpu_budget
+        self.busy_factor = busy_factor
+        self.busy_fn = busy_fn
+        self.change_alpha = change_alpha
+        self.cost_alpha = cost_alpha
+
+        self._lock = threading.Lock()
+        self.interaction = False
+        self.change_score = 0.0  # EMA of how often consecutive labels differ
+        self.cost_ema = None  # Seconds per analysis
+        self._last_labels = None
+        self._last_run = None
+        self._run_times = deque(maxlen=20)
+
+        self.analyses = 0
+        self.last_interval = max_interval
+        self.last_reason = "steady"
+        self.reasons = Counter()
+
+    def set_interaction(self, active):
+        """Mark whether an interaction prompt (rather than narration) is in progress."""
+        self.interaction = bool(active)
+
+    def record(self, duration, labels=None, now=None):
+        """Report one finished analysis: its cost in seconds and the labels it produced."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.analyses += 1
+            self._last_run = now
+            self._run_times.append(now)
+            if self.cost_ema is None:
+                self.cost_ema = duration
+            else:
+                self.cost_ema += self.cost_alpha * (duration - self.cost_ema)
+            if labels is not None:
+                changed = self._last_labels is not None and labels != self._last_labels
+                self.change_score += self.change_alpha * (float(changed) - self.change_score)
+                self._last_labels = labels
+
+    def next_interval(self):
+        """Seconds to wait before the next analysis; also recorded as a decision."""
+        with self._lock:
+            interval, reason = self._decide()
+            self.last_interval = interval
+            self.last_reason = reason
+            self.reasons[reason] += 1
+            return interval
+
+    def due(self, now=None):
+        """True if enough time passed since the last recorded analysis (for per-frame loops)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._last_run is None:
+                return True
+            interval, reason = self._decide()
+            if now - self._last_run < interval:
+                return False
+            self.last_interval = interval
+            self.last_reason = reason
+            self.reasons[reason] += 1
+            return True
+
+    def _decide(self):
+        interval = self.interaction_interval if self.interaction else self.max_interval
+        reason = "interaction" if self.interaction else "steady"
+
+        # Labels in flux pull the interval toward min_interval.
+        interval -= (interval - self.min_interval) * self.change_score
+        if self.change_score >= 0.5:
+            reason = "changing"
+
+        if self.busy_fn is not None and self.busy_fn():
+            interval, reason = interval * self.busy_factor, "busy"
+
+        interval = max(interval, self.min_interval)
+        if self.cost_ema and self.cpu_budget:
+            budget_interval = self.cost_ema / self.cpu_budget
+            if budget_interval > interval:
+                interval, reason = budget_interval, "budget"
+        return interval, reason
+
+    def longest_interval(self):
+        """Longest interval need and busy backoff can pick (a CPU budget may exceed it).
+
+        Per-frame state that should carry over between analyses, such as the
+        head pose warm start, must tolerate gaps this long.
+        """
+        return max(self.max_interval, self.interaction_interval) * self.busy_factor
+
+    def achieved_rate(self):
+        """Analyses per second over the recent window."""
+        with self._lock:
+            if len(self._run_times) < 2:
+                return 0.0
+            span = self._run_times[-1] - self._run_times[0]
+            return (len(self._run_times) - 1) / span if span > 0 else 0.0
+
+    def stats(self):
+        cost_ms = None if self.cost_ema is None else round(self.cost_ema * 1000, 2)
+        return {
+            "analyses": self.analyses,
+            "achieved_rate_hz": round(self.achieved_rate(), 3),
+            "last_interval_s": round(self.last_interval, 3),
+            "last_reason": self.last_reason,
+            "decisions": dict(self.reasons),
+            "cost_ms": cost_ms,
+            "change_score": round(self.change_score, 3),
+            "cpu_share": None if cost_ms is None else round(self.cost_ema / self.last_interval, 3),
+        }
@@ -0,0 +1,338 @@
+"""Per-stage latency benchmark for the detector_model perception pipeline.
+
+Runs each stage on a fixed clip at 320x240, 640x480 and native resolution and
+reports p50/p95/p99 latency and throughput per stage plus end-to-end fps.
+--detectors also times each face detector backend alone and reports how often
+it found a face, to pick the fastest one that still works at classroom distance.
+--emotion-batch N compares the emotion CNN one crop per call against
+EmotionBatcher batches of N crops:
+
+    python -m detector_model.benchmark --clip session.mp4 --baseline-out baseline.json
+    python -m detector_model.benchmark --synthetic 120 --compare baseline.json
+    python -m detector_model.benchmark --clip class.mp4 --detectors hog haar yunet dnn
+    python -m detector_model.benchmark --clip session.mp4 --emotion-batch 8
+"""
+import argparse
+import json
+import platform
+import time
+
+import cv2
+import dlib
+import numpy as np
+
+from detector_model.emotion_batcher import EmotionBatcher
+from detector_model.face_detectors import DETECTOR_BACKENDS, create_face_detector
+from detector_model.frame_bus import open_capture
+from detector_model.head_gaze_emotion_detector import FaceAnalyzer, EmotionAnalyzer
+from detector_model.state_updater import StateUpdater
+
+DEFAULT_PREDICTOR_PATH = "detector_model/assets/shape_predictor_68_face_landmarks.dat"
+RESOLUTIONS = {"320x240": (320, 240), "640x480": (640, 480), "native": None}
+STAGES = ("detect", "landmarks", "head_pose", "head_pose_cold", "gaze", "emotion_face",
+          "emotion_fer_frame")
+# Reference paths timed for comparison but not part of the app's per-frame cost.
+REFERENCE_STAGES = ("head_pose_cold", "emotion_fer_frame")
+FRAME_INTERVAL = 1.0 / 30  # Synthetic timestamps for the head pose tracker
+WARMUP_FRAMES = 3
+
+
+def load_clip(path, max_frames):
+    """Read up to max_frames frames of a video file or image directory into memory."""
+    cap = open_capture(path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Cannot open clip: {path}")
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def synthetic_clip(num_frames, size=(640, 480), seed=0):
+    """Deterministic textured frames; stages after detection use a fallback box."""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    base = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (7, 7), 0)
+    frames = []
+    for i in range(num_frames):
+        shift = (i * 3) % width
+        frames.append(np.roll(base, shift, axis=1))
+    return frames
+
+
+def summarize(samples_ms):
+    """p50/p95/p99/mean latency in ms and throughput in calls per second."""
+    if not samples_ms:
+        return None
+    samples = np.asarray(samples_ms)
+    mean = float(samples.mean())
+    return {
+        "count": int(samples.size),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "mean_ms": round(mean, 3),
+        "throughput_per_s": round(1000.0 / mean, 2) if mean > 0 else None,
+    }
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run_resolution(face_analyzer, emotion_analyzer, frames, size, include_frame_emotion):
+    """Run every stage on each frame at one resolution and collect latencies."""
+    samples = {stage: [] for stage in STAGES}
+    end_to_end = []
+    faces_found = 0
+    face_analyzer.head_pose.reset()
+
+    for index, frame in enumerate(frames):
+        if size is not None:
+            frame = cv2.resize(frame, size)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        timings = {}
+
+        faces, timings["detect"] = _timed(face_analyzer.detect_faces, gray)
+        if len(faces):
+            faces_found += 1
+            face = max(faces, key=lambda rect: rect.area())
+        else:
+            # Keep timing the downstream stages on a centered box.
+            height, width = gray.shape
+            face = dlib.rectangle(width // 3, height // 4, 2 * width // 3, 3 * height // 4)
+
+        landmarks, timings["landmarks"] = _timed(face_analyzer.get_landmarks, gray, face)
+        _, timings["head_pose"] = _timed(
+            face_analyzer.track_head_pose, landmarks, gray.shape, index * FRAME_INTERVAL)
+        _, timings["head_pose_cold"] = _timed(_head_pose_labels, face_analyzer, landmarks, gray.shape)
+        _, timings["gaze"] = _timed(face_analyzer.get_gaze_from_landmarks, gray, landmarks)
+        _, timings["emotion_face"] = _timed(emotion_analyzer.detect_emotion_in_face, gray, face)
+        if include_frame_emotion:
+            _, timings["emotion_fer_frame"] = _timed(emotion_analyzer.detect_emotion, frame)
+
+        if index < WARMUP_FRAMES:
+            continue
+        for stage, ms in timings.items():
+            samples[stage].append(ms)
+        # The app runs one emotion path per frame; count the single-pass one.
+        end_to_end.append(sum(ms for stage, ms in timings.items() if stage not in REFERENCE_STAGES))
+
+    measured = max(0, len(frames) - WARMUP_FRAMES)
+    total_ms = sum(end_to_end)
+    return {
+        "frames": measured,
+        "face_found_ratio": round(faces_found / len(frames), 3) if frames else 0.0,
+        "stages": {stage: summarize(values) for stage, values in samples.items() if values},
+        "end_to_end": summarize(end_to_end),
+        "fps": round(measured * 1000.0 / total_ms, 2) if total_ms else None,
+    }
+
+
+def _head_pose_labels(face_analyzer, landmarks, frame_shape):
+    # Stateless solvePnP from scratch, as before HeadPoseTracker.
+    rotation_vector = face_analyzer.get_head_pose(landmarks, frame_shape)
+    if rotation_vector is None:
+        return None
+    yaw, pitch, _ = face_analyzer.rotation_vector_to_euler_angles(rotation_vector)
+    return (face_analyzer.get_horizontal_movement_label(yaw),
+            face_analyzer.get_vertical_movement_label(pitch))
+
+
+def compare_detectors(frames, names):
+    """Time each detector backend alone at every resolution.
+
+    Returns {backend: {resolution: summary + face_found_ratio}}; a backend
+    whose model file is missing is reported with its error instead.
+    """
+    results = {}
+    for name in names:
+        try:
+            detector = create_face_detector(name)
+        except (FileNotFoundError, cv2.error) as e:
+            print(f"Error creating face detector '{name}':", e)
+            results[name] = {"error": str(e)}
+            continue
+        results[name] = {}
+        for resolution, size in RESOLUTIONS.items():
+            samples, found = [], 0
+            for index, frame in enumerate(frames):
+                if size is not None:
+                    frame = cv2.resize(frame, size)
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                faces, ms = _timed(detector, gray)
+                if index < WARMUP_FRAMES:
+                    continue
+                samples.append(ms)
+                found += len(faces) > 0
+            stats = summarize(samples) or {}
+            stats["face_found_ratio"] = round(found / len(samples), 3) if samples else 0.0
+            results[name][resolution] = stats
+    return results
+
+
+def compare_emotion_batching(face_analyzer, emotion_analyzer, frames, batch_size):
+    """Time the emotion CNN on the same 640x480 target-face crops one per call and batched.
+
+    Both paths include cropping; the batched one goes through EmotionBatcher
+    into a StateUpdater as in VideoProcessor. Returns ms per crop for each
+    path and the speedup of batching.
+    """
+    crops = []
+    for frame in frames:
+        gray = cv2.cvtColor(cv2.resize(frame, (640, 480)), cv2.COLOR_BGR2GRAY)
+        faces = face_analyzer.detect_faces(gray)
+        if len(faces):
+            face = max(faces, key=lambda rect: rect.area())
+        else:
+            face = dlib.rectangle(640 // 3, 480 // 4, 2 * 640 // 3, 3 * 480 // 4)
+        crops.append((gray, face))
+    measured = crops[WARMUP_FRAMES:]
+
+    single = []
+    for index, (gray, face) in enumerate(crops):
+        _, ms = _timed(emotion_analyzer.detect_emotion_in_face, gray, face)
+        if index >= WARMUP_FRAMES:
+            single.append(ms)
+
+    # No max_delay flush: only full batches (and the remainder) run.
+    batcher = EmotionBatcher(emotion_analyzer, StateUpdater(), batch_size=batch_size,
+                             max_delay=float("inf"))
+    for gray, face in crops[:WARMUP_FRAMES]:
+        batcher.submit(gray, face, None, None, None, timestamp=0.0)
+    batcher.flush()
+    start = time.perf_counter()
+    for index, (gray, face) in enumerate(measured):
+        batcher.submit(gray, face, None, None, None, timestamp=float(index))
+    batcher.flush()
+    batched_ms = (time.perf_counter() - start) * 1000 / len(measured)
+
+    single_ms = float(np.mean(single))
+    return {
+        "batch_size": batch_size,
+        "crops": len(measured),
+        "single_ms_per_crop": round(single_ms, 3),
+        "batched_ms_per_crop": round(batched_ms, 3),
+        "speedup": round(single_ms / batched_ms, 2) if batched_ms > 0 else None,
+    }
+
+
+def run_benchmark(frames, predictor_path=DEFAULT_PREDICTOR_PATH, include_frame_emotion=True,
+                  clip_name="synthetic", detector="hog", emotion_batch=None):
+    face_analyzer = FaceAnalyzer(predictor_path, detector=detector)
+    emotion_analyzer = EmotionAnalyzer(mode="face")
+    native = f"{frames[0].shape[1]}x{frames[0].shape[0]}"
+    report = {
+        "clip": clip_name,
+        "native_resolution": native,
+        "detector": detector,
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "opencv": cv2.__version__,
+            "dlib": dlib.__version__,
+            "numpy": np.__version__,
+        },
+        "resolutions": {},
+    }
+    for name, size in RESOLUTIONS.items():
+        report["resolutions"][name] = run_resolution(
+            face_analyzer, emotion_analyzer, frames, size, include_frame_emotion)
+    if emotion_batch:
+        report["emotion_batching"] = compare_emotion_batching(
+            face_analyzer, emotion_analyzer, frames, emotion_batch)
+    return report
+
+
+def print_report(report, baseline=None):
+    print(f"Clip: {report['clip']} (native {report['native_resolution']}, "
+          f"detector {report.get('detector', 'hog')})")
+    for name, result in report["resolutions"].items():
+        print(f"\n[{name}] frames={result['frames']} fps={result['fps']} "
+              f"face_found={result['face_found_ratio']}")
+        print(f"  {'stage':<18}{'p50':>9}{'p95':>9}{'p99':>9}{'per s':>9}{'p50 vs base':>13}")
+        rows = dict(result["stages"], end_to_end=result["end_to_end"])
+        for stage, stats in rows.items():
+            delta = ""
+            if baseline is not None:
+                base_result = baseline["resolutions"].get(name, {})
+                base_rows = dict(base_result.get("stages", {}), end_to_end=base_result.get("end_to_end"))
+                base_stats = base_rows.get(stage)
+                if base_stats and base_stats["p50_ms"]:
+                    change = (stats["p50_ms"] - base_stats["p50_ms"]) / base_stats["p50_ms"] * 100
+                    delta = f"{change:+.1f}%"
+            print(f"  {stage:<18}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}"
+                  f"{stats['p99_ms']:>9.2f}{stats['throughput_per_s'] or 0:>9.1f}{delta:>13}")
+
+    batching = report.get("emotion_batching")
+    if batching:
+        print(f"\nEmotion batching (batch of {batching['batch_size']}, {batching['crops']} crops): "
+              f"single {batching['single_ms_per_crop']:.2f} ms/crop, "
+              f"batched {batching['batched_ms_per_crop']:.2f} ms/crop, "
+              f"speedup x{batching['speedup']}")
+
+    detectors = report.get("detectors")
+    if detectors:
+        print(f"\nFace detectors\n  {'backend':<10}{'resolution':<12}{'p50':>9}{'p95':>9}{'found':>9}")
+        for name, by_resolution in detectors.items():
+            if "error" in by_resolution:
+                print(f"  {name:<10}unavailable: {by_resolution['error']}")
+                continue
+            for resolution, stats in by_resolution.items():
+                print(f"  {name:<10}{resolution:<12}{stats.get('p50_ms', 0):>9.2f}"
+                      f"{stats.get('p95_ms', 0):>9.2f}{stats['face_found_ratio']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detector_model stages.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--clip", help="Video file or image directory to benchmark on.")
+    source.add_argument("--synthetic", type=int, metavar="N", default=None,
+                        help="Use N synthetic 640x480 frames instead of a clip.")
+    parser.add_argument("--max-frames", type=int, default=150)
+    parser.add_argument("--predictor", default=DEFAULT_PREDICTOR_PATH)
+    parser.add_argument("--detector", default="hog", choices=sorted(DETECTOR_BACKENDS),
+                        help="Face detector backend used by the pipeline stages.")
+    parser.add_argument("--detectors", nargs="+", choices=sorted(DETECTOR_BACKENDS),
+                        help="Also time these detector backends on their own.")
+    parser.add_argument("--emotion-batch", type=int, metavar="N", default=None,
+                        help="Also compare single emotion calls against EmotionBatcher batches of N.")
+    parser.add_argument("--skip-frame-emotion", action="store_true",
+                        help="Do not time FER's full-frame path.")
+    parser.add_argument("--baseline-out", help="Write the machine-readable report to this JSON file.")
+    parser.add_argument("--compare", help="Baseline JSON to compare p50 latencies against.")
+    args = parser.parse_args()
+
+    if args.clip:
+        frames, clip_name = load_clip(args.clip, args.max_frames), args.clip
+    else:
+        count = args.synthetic or args.max_frames
+        frames, clip_name = synthetic_clip(count), f"synthetic:{count}"
+    if len(frames) <= WARMUP_FRAMES:
+        raise SystemExit(f"Need more than {WARMUP_FRAMES} frames to benchmark.")
+
+    report = run_benchmark(frames, args.predictor, not args.skip_frame_emotion, clip_name,
+                           args.detector, args.emotion_batch)
+    if args.detectors:
+        report["detectors"] = compare_detectors(frames, args.detectors)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.baseline_out:
+        with open(args.baseline_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.baseline_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Compare the emotion CNN runtimes on load time, resident memory, latency and agreement.
+
+Each runtime is measured in its own fresh process, so TensorFlow loaded by the
+Keras path cannot inflate the numbers of the others:
+
+    python -m detector_model.benchmark_emotion --clip session.mp4
+    python -m detector_model.benchmark_emotion --runtimes keras onnx opencv \\
+        --model detector_model/assets/emotion_cnn.int8.onnx
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from detector_model.emotion_runtime import EMOTION_RUNTIMES, ONNX_MODEL_PATH
+
+WARMUP_CALLS = 3
+
+
+def _rss_mb():
+    # ru_maxrss is the peak resident set size, in KB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _probe(runtime_name, model_path, crops_path, batch_size, results):
+    """Entry point of one measurement process."""
+    from detector_model.emotion_runtime import create_emotion_runtime
+
+    crops = np.load(crops_path)
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    options = {} if runtime_name == "keras" else {"model_path": model_path}
+    runtime = create_emotion_runtime(runtime_name, **options)
+    load_s = time.perf_counter() - start
+
+    single_ms, batch_ms = [], []
+    for index, crop in enumerate(crops):
+        tick = time.perf_counter()
+        runtime(crop[np.newaxis])
+        if index >= WARMUP_CALLS:
+            single_ms.append((time.perf_counter() - tick) * 1000)
+    scores = []
+    for begin in range(0, len(crops), batch_size):
+        batch = crops[begin:begin + batch_size]
+        tick = time.perf_counter()
+        scores.append(np.asarray(runtime(batch)))
+        batch_ms.append((time.perf_counter() - tick) * 1000 / len(batch))
+
+    results.put({
+        "runtime": runtime_name,
+        "load_s": round(load_s, 3),
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "tensorflow_imported": "tensorflow" in sys.modules,
+        "single_ms": single_ms,
+        "batched_ms_per_crop": batch_ms,
+        "scores": np.concatenate(scores).tolist(),
+    })
+
+
+def measure(runtime_name, model_path, crops_path, batch_size=8, timeout=600):
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=_probe, args=(runtime_name, model_path, crops_path, batch_size, results))
+    process.start()
+    deadline = time.monotonic() + timeout
+    try:
+        while time.monotonic() < deadline:
+            try:
+                return results.get(timeout=1.0)
+            except queue.Empty:
+                if not process.is_alive():
+                    break
+        print(f"Error benchmarking the {runtime_name} runtime: process exited without a result.")
+        return None
+    finally:
+        process.join(timeout=5.0)
+        if process.is_alive():
+            process.terminate()
+
+
+def main():
+    from detector_model.benchmark import summarize
+    from detector_model.export_emotion_model import calibration_crops, compare_scores, random_crops
+
+    parser = argparse.ArgumentParser(description="Benchmark the emotion CNN runtimes.")
+    parser.add_argument("--runtimes", nargs="+", default=["keras", "onnx", "opencv"],
+                        choices=sorted(EMOTION_RUNTIMES))
+    parser.add_argument("--model", default=ONNX_MODEL_PATH, help="Exported .onnx model.")
+    parser.add_argument("--clip", help="Video file or image directory to take face crops from.")
+    parser.add_argument("--crops", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--out", help="Write the report to this JSON file.")
+    args = parser.parse_args()
+
+    crops = calibration_crops(args.clip, args.crops) if args.clip else None
+    if crops is None:
+        print("No face crops from a clip; using random inputs (latency and memory only).")
+        crops = random_crops(args.crops)
+
+    report = {"crops": int(len(crops)), "model": args.model, "runtimes": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        crops_path = os.path.join(tmp, "crops.npy")
+        np.save(crops_path, crops)
+        raw = {name: measure(name, args.model, crops_path, args.batch_size) for name in args.runtimes}
+
+    reference = raw.get("keras")
+    print(f"{'runtime':<9}{'load s':>8}{'peak MB':>9}{'TF':>4}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'batched':>9}{'max diff':>10}{'agree':>7}")
+    for name, result in raw.items():
+        if result is None:
+            continue
+        single = summarize(result["single_ms"])
+        batched = summarize(result["batched_ms_per_crop"])
+        entry = {key: result[key] for key in ("load_s", "rss_before_mb", "peak_rss_mb", "tensorflow_imported")}
+        entry.update(single=single, batched_per_crop=batched)
+        if reference is not None:
+            entry.update(compare_scores(np.asarray(reference["scores"]), np.asarray(result["scores"])))
+        report["runtimes"][name] = entry
+        print(f"{name:<9}{entry['load_s']:>8.2f}{entry['peak_rss_mb']:>9.0f}"
+              f"{'y' if entry['tensorflow_imported'] else 'n':>4}{single['p50_ms']:>9.3f}"
+              f"{single['p95_ms']:>9.3f}{batched['mean_ms']:>9.3f}"
+              f"{entry.get('max_abs_diff', float('nan')):>10.2e}{entry.get('label_agreement', float('nan')):>7.2f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import statistics
+import time
+from collections import deque
+
+import numpy as np
+
+
+def eye_aspect_ratio(points):
+    """Eye aspect ratio of six eye landmarks (dlib order, corner first).
+
+    The two vertical lid distances over twice the corner-to-corner width:
+    about 0.25-0.35 for an open eye and close to 0 for a closed one, and,
+    unlike the width/height ratio, it stays finite when the lids touch.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    width = np.linalg.norm(points[0] - points[3])
+    if width == 0:
+        return 0.0
+    vertical = np.linalg.norm(points[1] - points[5]) + np.linalg.norm(points[2] - points[4])
+    return float(vertical / (2.0 * width))
+
+
+class BlinkDetector:
+    """Eye openness, blinks and eye-closure share from 68-point landmarks.
+
+    The closed threshold is calibrated per child: the samples of the first
+    calibration_seconds (at least min_calibration_samples of them) set an
+    open-eye baseline (their median, so blinks among them do not matter),
+    which then follows slow changes in pose and distance through an EMA of
+    open-eye samples. The eyes count as closed below closed_ratio times the
+    baseline. Until calibration ends default_threshold is used. Calibration is
+    timed, so it takes as long at 30 fps as at one analysis every few seconds;
+    call reset() when a new child sits down.
+
+    Over the last `window` seconds it reports:
+    - blink_rate(): open-to-closed transitions per minute. A blink
+      lasts 100-400 ms, so this undercounts when frames are analyzed less
+      often than a few times per second;
+    - closure_fraction(): share of samples with closed eyes (PERCLOS), which
+      stays meaningful at any sampling rate.
+    """
+
+    def __init__(self, closed_ratio=0.7, default_threshold=0.2, calibration_seconds=10.0,
+                 min_calibration_samples=3, baseline_alpha=0.02, window=60.0, max_samples=2000):
+        """
+        :param closed_ratio: Fraction of the open-eye baseline below which eyes count as closed.
+        :param default_threshold: Closed threshold used until calibration ends.
+        :param calibration_seconds: Seconds of samples that set the open-eye baseline.
+        :param min_calibration_samples: Fewest samples the baseline is taken from.
+        :param baseline_alpha: EMA weight of each later open-eye sample.
+        :param window: Seconds covered by blink_rate() and closure_fraction().
+        :param max_samples: Cap on the samples kept for the window.
+        """
+        self.closed_ratio = closed_ratio
+        self.default_threshold = default_threshold
+        self.calibration_seconds = calibration_seconds
+        self.min_calibration_samples = min_calibration_samples
+        self.baseline_alpha = baseline_alpha
+        self.window = window
+
+        self._calibration = []
+        self._calibration_start = None
+        self._samples = deque(maxlen=max_samples)  # (timestamp, closed)
+        self._blinks = deque(maxlen=max_samples)  # Timestamps of blink onsets
+        self.baseline = None
+        self.ear = None
+        self.closed = False
+
+    def reset(self):
+        """Forget the calibration and history, e.g. when a different child is in front."""
+        self._calibration = []
+        self._calibration_start = None
+        self._samples.clear()
+        self._blinks.clear()
+        self.baseline = None
+        self.ear = None
+        self.closed = False
+
+    @property
+    def calibrated(self):
+        return self.baseline is not None
+
+    @property
+    def threshold(self):
+        if self.baseline is None:
+            return self.default_threshold
+        return self.baseline * self.closed_ratio
+
+    @property
+    def openness(self):
+        """Last EAR relative to the open-eye baseline (1.0 = normally open), or None."""
+        if self.ear is None or not self.baseline:
+            return None
+        return self.ear / self.baseline
+
+    def update(self, left_points, right_points, timestamp=None):
+        """Add one frame's eye landmarks; returns True if the eyes are closed."""
+        timestamp = time.time() if timestamp is None else timestamp
+        self.ear = (eye_aspect_ratio(left_points) + eye_aspect_ratio(right_points)) / 2
+        closed = self.ear < self.threshold
+
+        if self.baseline is None:
+            if not self._calibration:
+                self._calibration_start = timestamp
+            self._calibration.append(self.ear)
+            if (len(self._calibration) >= self.min_calibration_samples and
+                    timestamp - self._calibration_start >= self.calibration_seconds):
+                self.baseline = statistics.median(self._calibration)
+                self._calibration = []
+        elif not closed:
+            self.baseline += self.baseline_alpha * (self.ear - self.baseline)
+
+        if closed and not self.closed:
+            self._blinks.append(timestamp)
+        self.closed = closed
+        self._samples.append((timestamp, closed))
+        return closed
+
+    def _prune(self, now):
+        start = now - self.window
+        while self._samples and self._samples[0][0] < start:
+            self._samples.popleft()
+        while self._blinks and self._blinks[0] < start:
+            self._blinks.popleft()
+
+    def blink_rate(self, now=None):
+        """Blinks per minute over the window, or None without samples."""
+        now = time.time() if now is None else now
+        self._prune(now)
+        if not self._samples:
+            return None
+        # Normalize by the time actually observed so a fresh window is not diluted.
+        span = max(now - self._samples[0][0], 1.0)
+        return len(self._blinks) * 60.0 / min(span, self.window)
+
+    def closure_fraction(self, now=None):
+        """Share of samples in the window with closed eyes, or None without samples."""
+        now = time.time() if now is None else now
+        self._prune(now)
+        if not self._samples:
+            return None
+        return sum(closed for _, closed in self._samples) / len(self._samples)
+
+    def stats(self, now=None):
+        blink_rate = self.blink_rate(now)
+        closure = self.closure_fraction(now)
+        return {
+            "calibrated": self.calibrated,
+            "baseline_ear": None if self.baseline is None else round(self.baseline, 3),
+            "threshold": round(self.threshold, 3),
+            "blink_rate_per_min": None if blink_rate is None else round(blink_rate, 1),
+            "closure_fraction": None if closure is None else round(closure, 3),
+        }
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import numpy as np
+
+
+class EmotionBatcher:
+    """Queues face crops as frames arrive and classifies them in batches.
+
+    One batched forward pass of the emotion CNN is much cheaper per crop than
+    repeated single-image calls. Every crop keeps the head pose and gaze labels
+    and the timestamp of the frame it came from, and its score is written to
+    StateUpdater.add_reading with that original timestamp.
+    """
+
+    def __init__(self, emotion_analyzer, state_updater, batch_size=8, max_delay=1.0):
+        """
+        :param emotion_analyzer: EmotionAnalyzer providing preprocess_face and classify_faces.
+        :param state_updater: StateUpdater that receives one reading per classified crop.
+        :param batch_size: Crops per batch; a full batch is classified immediately.
+        :param max_delay: Seconds the oldest queued crop may wait before a partial batch runs.
+        """
+        self.emotion_analyzer = emotion_analyzer
+        self.state_updater = state_updater
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+
+        self._batch = None  # Preallocated (batch_size, h, w, 1) input array
+        self._pending = []  # (timestamp, horizontal, vertical, gaze) per queued crop
+        self._lock = threading.Lock()
+
+        self.batches_run = 0
+        self.crops_classified = 0
+        self.total_inference_time = 0.0
+
+    def submit(self, gray_frame, face, horizontal, vertical, gaze, timestamp=None):
+        """Queue the face crop of one frame; runs a batch when one is due."""
+        crop = self.emotion_analyzer.preprocess_face(gray_frame, face)
+        if crop is None:
+            return None
+        timestamp = time.time() if timestamp is None else timestamp
+
+        with self._lock:
+            if self._batch is None:
+                self._batch = np.empty((self.batch_size,) + crop.shape, dtype=np.float32)
+            self._batch[len(self._pending)] = crop
+            self._pending.append((timestamp, horizontal, vertical, gaze))
+            due = (len(self._pending) >= self.batch_size or
+                   timestamp - self._pending[0][0] >= self.max_delay)
+        return self.flush() if due else None
+
+    def poll(self, now=None):
+        """Classify a partial batch if its oldest crop has waited max_delay."""
+        now = time.time() if now is None else now
+        with self._lock:
+            due = bool(self._pending) and now - self._pending[0][0] >= self.max_delay
+        return self.flush() if due else None
+
+    def flush(self):
+        """Classify every queued crop and feed the results to the StateUpdater.
+
+        Returns a list of (timestamp, emotion, score) in submission order.
+        """
+        with self._lock:
+            count = len(self._pending)
+            if not count:
+                return []
+            pending, self._pending = self._pending, []
+            start = time.perf_counter()
+            scores = self.emotion_analyzer.classify_faces(self._batch[:count])
+            self.total_inference_time += time.perf_counter() - start
+            self.batches_run += 1
+            self.crops_classified += count
+
+        labels = self.emotion_analyzer.labels
+        results = []
+        for (timestamp, horizontal, vertical, gaze), row in zip(pending, scores):
+            best = int(np.argmax(row))
+            emotion, score = labels[best], round(float(row[best]), 2)
+            self.state_updater.add_reading(
+                horizontal, vertical, gaze, emotion, score, timestamp=timestamp)
+            results.append((timestamp, emotion, score))
+
+        self.emotion_analyzer.last_emotion, self.emotion_analyzer.last_score = results[-1][1:]
+        return results
+
+    def stats(self):
+        """Batches run, crops classified and mean inference time per crop (ms)."""
+        per_crop = (self.total_inference_time * 1000 / self.crops_classified
+                    if self.crops_classified else 0.0)
+        return {
+            "batches_run": self.batches_run,
+            "crops_classified": self.crops_classified,
+            "ms_per_crop": per_crop,
+        }
@@ -0,0 +1,143 @@
+import os
+
+import cv2
+import numpy as np
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+# Written by python -m detector_model.export_emotion_model.
+ONNX_MODEL_PATH = os.path.join(ASSETS_DIR, "emotion_cnn.onnx")
+ONNX_INT8_MODEL_PATH = os.path.join(ASSETS_DIR, "emotion_cnn.int8.onnx")
+
+# FER's emotion CNN output order (FER._get_labels()), kept here so the
+# exported runtimes never need to import FER.
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+EMOTION_INPUT_SIZE = (64, 64)
+
+# Face crop margin (x, y) and zero padding FER applies around each box.
+FACE_OFFSETS = (10, 10)
+FACE_PADDING = 40
+
+
+def crop_face(gray_frame, face, input_size=EMOTION_INPUT_SIZE, offsets=FACE_OFFSETS,
+              padding=FACE_PADDING):
+    """Crop, resize and normalize a face exactly as FER does before its CNN.
+
+    Returns a float32 array of shape (h, w, 1), or None for an empty crop.
+    """
+    x, y, w, h = face.left(), face.top(), face.width(), face.height()
+    # FER squares the box around its center before applying the offsets.
+    if h > w:
+        x, w = x - (h - w) // 2, h
+    elif w > h:
+        y, h = y - (w - h) // 2, w
+    off_x, off_y = offsets
+    x1, x2 = x - off_x, x + w + off_x
+    y1, y2 = y - off_y, y + h + off_y
+
+    # Clip to the frame padded by `padding` zeros on each side.
+    frame_h, frame_w = gray_frame.shape[:2]
+    x1, y1 = max(x1, -padding), max(y1, -padding)
+    x2, y2 = min(x2, frame_w + padding), min(y2, frame_h + padding)
+    if x2 <= x1 or y2 <= y1:
+        return None
+
+    crop = gray_frame[max(y1, 0):max(min(y2, frame_h), 0),
+                      max(x1, 0):max(min(x2, frame_w), 0)]
+    if crop.size == 0:
+        return None
+    crop = cv2.copyMakeBorder(
+        crop, max(0, -y1), max(0, y2 - frame_h), max(0, -x1), max(0, x2 - frame_w),
+        cv2.BORDER_CONSTANT, value=0)
+
+    crop = cv2.resize(crop, input_size).astype(np.float32)
+    crop = (crop / 255.0 - 0.5) * 2.0
+    return crop[..., np.newaxis]
+
+
+class EmotionRuntime:
+    """Runs the emotion CNN on a (n, h, w, 1) float32 batch and returns (n, 7) scores."""
+
+    name = None
+    input_size = EMOTION_INPUT_SIZE
+    labels = EMOTION_LABELS
+
+    def __call__(self, faces):
+        raise NotImplementedError
+
+
+class KerasEmotionRuntime(EmotionRuntime):
+    """FER's own Keras model; needs TensorFlow."""
+
+    name = "keras"
+
+    def __init__(self, fer_detector=None):
+        """
+        :param fer_detector: An existing FER instance to take the model from,
+            so frame mode and face mode share one copy.
+        """
+        if fer_detector is None:
+            from fer import FER
+            fer_detector = FER()
+        self.classifier = fer_detector._FER__emotion_classifier
+        self.input_size = tuple(self.classifier.input_shape[1:3])
+        labels = fer_detector._get_labels()
+        self.labels = [labels[i] for i in range(len(labels))]
+
+    def __call__(self, faces):
+        return np.asarray(self.classifier(faces, training=False))
+
+
+class OnnxEmotionRuntime(EmotionRuntime):
+    """Exported model on ONNX Runtime (CPU); no TensorFlow import."""
+
+    name = "onnx"
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, threads=1):
+        """
+        :param model_path: .onnx file written by export_emotion_model.
+        :param threads: Intra-op threads; 1 leaves the other cores to dlib and the UI.
+        """
+        import onnxruntime as ort
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Emotion model not found: {model_path}")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_size = tuple(model_input.shape[1:3])
+
+    def __call__(self, faces):
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(faces, np.float32)})[0]
+
+
+class OpenCVEmotionRuntime(EmotionRuntime):
+    """Exported model on OpenCV's dnn module; needs nothing beyond cv2."""
+
+    name = "opencv"
+
+    def __init__(self, model_path=ONNX_MODEL_PATH):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Emotion model not found: {model_path}")
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def __call__(self, faces):
+        self.net.setInput(np.ascontiguousarray(faces, np.float32))
+        return self.net.forward()
+
+
+EMOTION_RUNTIMES = {
+    runtime.name: runtime
+    for runtime in (KerasEmotionRuntime, OnnxEmotionRuntime, OpenCVEmotionRuntime)
+}
+
+
+def create_emotion_runtime(name="keras", **options):
+    """Build an emotion runtime by name ("keras", "onnx" or "opencv")."""
+    if name not in EMOTION_RUNTIMES:
+        raise ValueError(f"Unknown emotion runtime '{name}', expected one of {sorted(EMOTION_RUNTIMES)}.")
+    return EMOTION_RUNTIMES[name](**options)
@@ -0,0 +1,155 @@
+"""Export FER's emotion CNN to ONNX so EmotionAnalyzer can run it without TensorFlow.
+
+The exported model keeps FER's input layout, (n, 64, 64, 1) float32 in [-1, 1],
+and its output order, so the "onnx" and "opencv" runtimes are drop-in
+replacements. It is checked against the Keras model before anything is
+reported as usable:
+
+    python -m detector_model.export_emotion_model
+    python -m detector_model.export_emotion_model --int8 --calibration class_clip.mp4
+
+Needs tensorflow, tf2onnx and onnxruntime at export time only.
+"""
+import argparse
+import os
+
+import numpy as np
+
+from detector_model.emotion_runtime import (
+    ONNX_INT8_MODEL_PATH, ONNX_MODEL_PATH, OnnxEmotionRuntime, OpenCVEmotionRuntime, crop_face)
+from detector_model.frame_bus import open_capture
+
+# Maximum absolute score difference accepted for each precision.
+FP32_TOLERANCE = 1e-4
+INT8_TOLERANCE = 0.05
+
+
+def load_keras_model():
+    """FER's Keras emotion classifier."""
+    from fer import FER
+    return FER()._FER__emotion_classifier
+
+
+def export_onnx(model, out_path, opset=13):
+    """Convert the Keras model to ONNX with a dynamic batch dimension."""
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="face"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=out_path)
+    return out_path
+
+
+def calibration_crops(source, max_crops=200, detector="haar"):
+    """Face crops from a video file or image directory, preprocessed like FER."""
+    import cv2
+    from detector_model.face_detectors import create_face_detector
+
+    face_detector = create_face_detector(detector)
+    cap = open_capture(source)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Cannot open calibration source: {source}")
+    crops = []
+    while len(crops) < max_crops:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        for face in face_detector(gray):
+            crop = crop_face(gray, face)
+            if crop is not None:
+                crops.append(crop)
+    cap.release()
+    return np.stack(crops) if crops else None
+
+
+def random_crops(count=64, input_size=(64, 64), seed=0):
+    """Smooth random inputs in FER's [-1, 1] range, for checks without a clip."""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    crops = rng.uniform(-1.0, 1.0, (count,) + input_size).astype(np.float32)
+    crops = np.stack([cv2.GaussianBlur(crop, (5, 5), 0) for crop in crops])
+    return crops[..., np.newaxis]
+
+
+def quantize_int8(fp32_path, out_path, crops=None):
+    """Quantize to int8: static (QDQ) with calibration crops, else weights only."""
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static)
+
+    if crops is None:
+        quantize_dynamic(fp32_path, out_path, weight_type=QuantType.QUInt8)
+        return out_path
+
+    class CropReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self._feeds = iter({input_name: crop[np.newaxis]} for crop in crops)
+
+        def get_next(self):
+            return next(self._feeds, None)
+
+    input_name = OnnxEmotionRuntime(fp32_path).input_name
+    quantize_static(fp32_path, out_path, CropReader(input_name), quant_format=QuantFormat.QDQ,
+                    per_channel=True, activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8)
+    return out_path
+
+
+def compare_scores(reference, scores):
+    """Maximum absolute score difference and top-1 label agreement."""
+    return {
+        "max_abs_diff": float(np.max(np.abs(reference - scores))),
+        "label_agreement": float(np.mean(reference.argmax(axis=1) == scores.argmax(axis=1))),
+    }
+
+
+def verify(keras_model, model_path, crops, tolerance):
+    """Compare every runtime that can load model_path against the Keras scores."""
+    reference = np.asarray(keras_model(crops, training=False))
+    report = {}
+    for runtime_cls in (OnnxEmotionRuntime, OpenCVEmotionRuntime):
+        try:
+            runtime = runtime_cls(model_path)
+        except Exception as e:
+            # OpenCV dnn does not implement every QDQ pattern ONNX Runtime does.
+            print(f"Error loading {model_path} with the {runtime_cls.name} runtime:", e)
+            continue
+        result = compare_scores(reference, np.asarray(runtime(crops)))
+        result["within_tolerance"] = result["max_abs_diff"] <= tolerance and result["label_agreement"] == 1.0
+        report[runtime_cls.name] = result
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export FER's emotion CNN to ONNX.")
+    parser.add_argument("--out", default=ONNX_MODEL_PATH)
+    parser.add_argument("--int8", action="store_true", help="Also write an int8-quantized model.")
+    parser.add_argument("--int8-out", default=ONNX_INT8_MODEL_PATH)
+    parser.add_argument("--calibration", help="Video file or image directory of faces, used for "
+                                              "static int8 calibration and for the checks.")
+    parser.add_argument("--max-crops", type=int, default=200)
+    parser.add_argument("--opset", type=int, default=13)
+    args = parser.parse_args()
+
+    keras_model = load_keras_model()
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    export_onnx(keras_model, args.out, args.opset)
+    print(f"Wrote {args.out} ({os.path.getsize(args.out) / 1024:.0f} KB)")
+
+    crops = calibration_crops(args.calibration, args.max_crops) if args.calibration else None
+    if crops is None:
+        print("No calibration faces; checking on random inputs instead.")
+    check_crops = crops if crops is not None else random_crops(input_size=tuple(keras_model.input_shape[1:3]))
+    for name, result in verify(keras_model, args.out, check_crops, FP32_TOLERANCE).items():
+        print(f"fp32 {name}: {result}")
+
+    if args.int8:
+        quantize_int8(args.out, args.int8_out, crops)
+        print(f"Wrote {args.int8_out} ({os.path.getsize(args.int8_out) / 1024:.0f} KB)")
+        for name, result in verify(keras_model, args.int8_out, check_crops, INT8_TOLERANCE).items():
+            print(f"int8 {name}: {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import os
+
+import cv2
+import dlib
+import numpy as np
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+# Model files for the DNN backends are not bundled; download them into assets/.
+YUNET_MODEL_PATH = os.path.join(ASSETS_DIR, "face_detection_yunet_2023mar.onnx")
+SSD_PROTOTXT_PATH = os.path.join(ASSETS_DIR, "deploy.prototxt")
+SSD_MODEL_PATH = os.path.join(ASSETS_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+
+
+def _require(path, backend):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model file for the '{backend}' face detector not found: {path}")
+    return path
+
+
+class FaceDetector:
+    """Face detector backend: a callable from a grayscale frame to dlib.rectangles.
+
+    Every backend returns the same type as dlib's HOG detector, so the
+    result can go straight to FaceAnalyzer.get_landmarks or FaceTracker.
+    Subclasses implement detect_boxes() and return (left, top, right, bottom)
+    tuples in pixels.
+    """
+
+    name = None
+
+    def __call__(self, gray_frame):
+        return self.to_rectangles(self.detect_boxes(gray_frame), gray_frame.shape)
+
+    def detect_boxes(self, gray_frame):
+        raise NotImplementedError
+
+    @staticmethod
+    def clip_boxes(boxes, frame_shape):
+        """Clip boxes to the frame and drop the empty ones."""
+        height, width = frame_shape[:2]
+        clipped = []
+        for left, top, right, bottom in boxes:
+            left, top = max(0, int(left)), max(0, int(top))
+            right, bottom = min(width - 1, int(right)), min(height - 1, int(bottom))
+            if right > left and bottom > top:
+                clipped.append((left, top, right, bottom))
+        return clipped
+
+    @classmethod
+    def to_rectangles(cls, boxes, frame_shape):
+        return dlib.rectangles([dlib.rectangle(*box) for box in cls.clip_boxes(boxes, frame_shape)])
+
+
+class HogFaceDetector(FaceDetector):
+    """dlib's frontal HOG + linear SVM detector (the original backend)."""
+
+    name = "hog"
+
+    def __init__(self, upsample=0):
+        """
+        :param upsample: Times to upsample the image; 1 finds faces down to ~40 px
+            at roughly 4x the cost.
+        """
+        self.detector = dlib.get_frontal_face_detector()
+        self.upsample = upsample
+
+    def __call__(self, gray_frame):
+        return self.detector(gray_frame, self.upsample)
+
+
+class HaarFaceDetector(FaceDetector):
+    """OpenCV Viola-Jones cascade; cheapest backend, weakest on turned heads."""
+
+    name = "haar"
+
+    def __init__(self, cascade_path=None, scale_factor=1.1, min_neighbors=5, min_size=(40, 40)):
+        """
+        :param cascade_path: Cascade XML; defaults to OpenCV's frontal face cascade.
+        :param scale_factor: Image pyramid step.
+        :param min_neighbors: Overlapping hits needed to keep a detection.
+        :param min_size: Smallest face (w, h) to look for, in pixels.
+        """
+        if cascade_path is None:
+            cascade_path = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        self.cascade = cv2.CascadeClassifier(_require(cascade_path, self.name))
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = tuple(min_size)
+
+    def detect_boxes(self, gray_frame):
+        faces = self.cascade.detectMultiScale(
+            gray_frame, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=self.min_size)
+        return [(x, y, x + w, y + h) for x, y, w, h in faces]
+
+
+class YuNetFaceDetector(FaceDetector):
+    """OpenCV's YuNet CNN detector (cv2.FaceDetectorYN, OpenCV >= 4.5.4).
+
+    Small and fast on CPU, and keeps finding faces that are turned or far from
+    the camera where HOG and Haar give up.
+    """
+
+    name = "yunet"
+
+    def __init__(self, model_path=YUNET_MODEL_PATH, score_threshold=0.7, nms_threshold=0.3, top_k=20):
+        self.detector = cv2.FaceDetectorYN.create(
+            _require(model_path, self.name), "", (320, 320), score_threshold, nms_threshold, top_k)
+        self.input_size = None
+
+    def detect_boxes(self, gray_frame):
+        height, width = gray_frame.shape[:2]
+        if self.input_size != (width, height):
+            self.input_size = (width, height)
+            self.detector.setInputSize(self.input_size)
+        # YuNet takes 3-channel input; the channels carry the same luma.
+        bgr = cv2.cvtColor(gray_frame, cv2.COLOR_GRAY2BGR) if gray_frame.ndim == 2 else gray_frame
+        _, faces = self.detector.detect(bgr)
+        if faces is None:
+            return []
+        return [(x, y, x + w, y + h) for x, y, w, h in faces[:, :4]]
+
+
+class SsdFaceDetector(FaceDetector):
+    """OpenCV DNN ResNet-10 SSD face detector (Caffe, 300x300 input)."""
+
+    name = "dnn"
+
+    def __init__(self, prototxt_path=SSD_PROTOTXT_PATH, model_path=SSD_MODEL_PATH,
+                 confidence_threshold=0.6):
+        self.net = cv2.dnn.readNetFromCaffe(
+            _require(prototxt_path, self.name), _require(model_path, self.name))
+        self.confidence_threshold = confidence_threshold
+
+    def detect_boxes(self, gray_frame):
+        height, width = gray_frame.shape[:2]
+        bgr = cv2.cvtColor(gray_frame, cv2.COLOR_GRAY2BGR) if gray_frame.ndim == 2 else gray_frame
+        blob = cv2.dnn.blobFromImage(bgr, 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.confidence_threshold]
+        boxes = detections[:, 3:7] * np.array([width, height, width, height])
+        return [tuple(box) for box in boxes]
+
+
+DETECTOR_BACKENDS = {
+    backend.name: backend
+    for backend in (HogFaceDetector, HaarFaceDetector, YuNetFaceDetector, SsdFaceDetector)
+}
+
+
+def create_face_detector(name="hog", **options):
+    """Build a face detector backend by name ("hog", "haar", "yunet" or "dnn")."""
+    if name not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown face detector '{name}', expected one of {sorted(DETECTOR_BACKENDS)}.")
+    return DETECTOR_BACKENDS[name](**options)
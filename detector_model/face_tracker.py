@@ -0,0 +1,101 @@
+import dlib
+import numpy as np
+
+
+class FaceTracker:
+    """Detect-then-track: full face detection every N frames, tracking in between.
+
+    Between detections the face is followed with a dlib correlation tracker.
+    When a re-detection is due, or the tracker loses confidence, the detector is
+    first run only inside a padded ROI around the last known box and falls back
+    to the full frame if nothing is found there.
+    """
+
+    def __init__(self, detect_fn, redetect_interval=10, roi_padding=0.5, min_track_quality=7.0):
+        """
+        :param detect_fn: Callable taking a grayscale image and returning dlib rectangles.
+        :param redetect_interval: Number of tracked frames between detections.
+        :param roi_padding: ROI margin around the last box, as a fraction of its size.
+        :param min_track_quality: Peak-to-side-lobe ratio below which the track is lost.
+        """
+        self.detect_fn = detect_fn
+        self.redetect_interval = redetect_interval
+        self.roi_padding = roi_padding
+        self.min_track_quality = min_track_quality
+
+        self.tracker = None
+        self.last_box = None
+        self.frames_since_detection = 0
+
+        # Counters so the detection/tracking split can be measured on a clip.
+        self.full_detections = 0
+        self.roi_detections = 0
+        self.tracked_frames = 0
+        self.lost_tracks = 0
+
+    def reset(self):
+        """Drop the current track so the next frame runs a full detection."""
+        self.tracker = None
+        self.last_box = None
+        self.frames_since_detection = 0
+
+    def update(self, gray_frame):
+        """Return a dlib.rectangles holding the tracked face (empty if none)."""
+        if self.tracker is not None and self.frames_since_detection < self.redetect_interval:
+            quality = self.tracker.update(gray_frame)
+            if quality >= self.min_track_quality:
+                self.frames_since_detection += 1
+                self.tracked_frames += 1
+                self.last_box = self._clip(self.tracker.get_position(), gray_frame.shape)
+                return dlib.rectangles([self.last_box])
+            self.lost_tracks += 1
+
+        return self._detect(gray_frame)
+
+    def _detect(self, gray_frame):
+        faces = self._detect_in_roi(gray_frame) if self.last_box is not None else []
+        if len(faces) == 0:
+            faces = self.detect_fn(gray_frame)
+            self.full_detections += 1
+        if len(faces) == 0:
+            self.reset()
+            return dlib.rectangles()
+
+        face = max(faces, key=lambda rect: rect.area())
+        self.tracker = dlib.correlation_tracker()
+        self.tracker.start_track(gray_frame, face)
+        self.last_box = face
+        self.frames_since_detection = 0
+        return dlib.rectangles([face])
+
+    def _detect_in_roi(self, gray_frame):
+        """Run the detector on a padded crop around the last box, in frame coordinates."""
+        height, width = gray_frame.shape[:2]
+        box = self.last_box
+        pad_x = int(box.width() * self.roi_padding)
+        pad_y = int(box.height() * self.roi_padding)
+        x0, y0 = max(0, box.left() - pad_x), max(0, box.top() - pad_y)
+        x1, y1 = min(width, box.right() + pad_x), min(height, box.bottom() + pad_y)
+        if x1 <= x0 or y1 <= y0:
+            return []
+
+        self.roi_detections += 1
+        faces = self.detect_fn(np.ascontiguousarray(gray_frame[y0:y1, x0:x1]))
+        return [dlib.rectangle(f.left() + x0, f.top() + y0, f.right() + x0, f.bottom() + y0)
+                for f in faces]
+
+    @staticmethod
+    def _clip(position, frame_shape):
+        height, width = frame_shape[:2]
+        return dlib.rectangle(
+            max(0, int(position.left())), max(0, int(position.top())),
+            min(width - 1, int(position.right())), min(height - 1, int(position.bottom())))
+
+    def stats(self):
+        """Counts of full detections, ROI detections and tracked frames so far."""
+        return {
+            "full_detections": self.full_detections,
+            "roi_detections": self.roi_detections,
+            "tracked_frames": self.tracked_frames,
+            "lost_tracks": self.lost_tracks,
+        }
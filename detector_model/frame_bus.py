@@ -0,0 +1,228 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# A published frame: a read-only view into the ring, its sequence number and
+# the wall-clock time it was captured at.
+FramePacket = namedtuple("FramePacket", ["frame", "seq", "timestamp"])
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class ImageDirectoryCapture:
+    """Minimal cv2.VideoCapture stand-in that yields the images of a directory in name order."""
+
+    def __init__(self, directory):
+        self.paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.index = 0
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self, image=None):
+        while self.index < len(self.paths):
+            frame = cv2.imread(self.paths[self.index])
+            self.index += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.index)
+        if prop_id == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.paths))
+        return 0.0
+
+    def set(self, prop_id, value):
+        return False
+
+    def release(self):
+        self.paths = []
+
+
+def open_capture(source):
+    """Open a camera index, a video file or a directory of images."""
+    if isinstance(source, str) and os.path.isdir(source):
+        return ImageDirectoryCapture(source)
+    return cv2.VideoCapture(source)
+
+
+class FrameRing:
+    """Fixed-size ring of preallocated frames written by a single producer."""
+
+    def __init__(self, size=4, shape=None):
+        if size < 2:
+            raise ValueError("FrameRing needs at least 2 slots.")
+        self.size = size
+        self.frames = None
+        self._views = None
+        self.seqs = np.full(size, -1, dtype=np.int64)
+        self.timestamps = np.zeros(size, dtype=np.float64)
+        self.head = np.full(1, -1, dtype=np.int64)  # Sequence of the newest frame
+        if shape is not None:
+            self.allocate(shape)
+
+    def allocate(self, shape):
+        """Preallocate every slot for frames of the given (h, w, c) shape."""
+        self.frames = np.zeros((self.size,) + tuple(shape), dtype=np.uint8)
+        self._bind_views()
+
+    def _bind_views(self):
+        # Consumers only ever see these read-only views, created once per slot.
+        self._views = []
+        for slot in self.frames:
+            view = slot.view()
+            view.flags.writeable = False
+            self._views.append(view)
+
+    def slot_for(self, seq):
+        """Writable slot the producer should fill for the given sequence number."""
+        return self.frames[seq % self.size]
+
+    def commit(self, seq, timestamp):
+        """Publish the slot for seq once its pixels have been written."""
+        idx = seq % self.size
+        self.timestamps[idx] = timestamp
+        self.seqs[idx] = seq
+        self.head[0] = seq
+
+    def latest(self):
+        """Return the newest FramePacket, or None if nothing was captured yet."""
+        seq = int(self.head[0])
+        if seq < 0:
+            return None
+        idx = seq % self.size
+        return FramePacket(self._views[idx], seq, float(self.timestamps[idx]))
+
+    def is_current(self, seq):
+        """True while the slot holding seq has not been recycled by the producer.
+
+        The producer starts overwriting a slot only after size - 1 newer frames,
+        so a consumer can check this after reading to detect a torn frame.
+        """
+        return int(self.head[0]) - seq < self.size - 1
+
+
+class FrameBus:
+    """Single capture thread publishing frames to any number of consumers.
+
+    The camera is read exactly once per frame, straight into a preallocated
+    ring slot, no matter how many consumers attach. Consumers get zero-copy
+    read-only views through latest() or wait_for_frame().
+    """
+
+    def __init__(self, source=0, ring_size=4, ring=None):
+        self.source = source
+        self.ring = ring if ring is not None else FrameRing(ring_size)
+        self.cap = None
+        self.running = False
+        self.frames_captured = 0
+        self.read_failures = 0
+        self._thread = None
+        self._cond = threading.Condition()
+
+    def start(self):
+        """Open the video source and start the capture thread."""
+        if self.running:
+            return True
+        self.cap = open_capture(self.source)
+        if not self.cap.isOpened():
+            print("Error: Unable to open video source:", self.source)
+            self.cap.release()
+            self.cap = None
+            return False
+        if self.ring.frames is not None:
+            # Ask the camera for the ring's size so frames decode in place.
+            height, width = self.ring.frames.shape[1:3]
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.running = True
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+        print("Frame bus started on source:", self.source)
+        return True
+
+    def stop(self):
+        """Stop the capture thread and release the video source."""
+        self.running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+        with self._cond:
+            self._cond.notify_all()
+
+    def _read_into(self, seq):
+        """Decode the next frame directly into the ring slot for seq."""
+        if self.ring.frames is None:
+            ret, frame = self.cap.read()
+            if not ret:
+                return False
+            self.ring.allocate(frame.shape)
+            np.copyto(self.ring.slot_for(seq), frame)
+            return True
+
+        slot = self.ring.slot_for(seq)
+        ret, frame = self.cap.read(slot)
+        if not ret:
+            return False
+        if frame is not slot:
+            # The decoder could not write in place (e.g. the camera changed size).
+            if frame.shape == slot.shape:
+                np.copyto(slot, frame)
+            else:
+                cv2.resize(frame, (slot.shape[1], slot.shape[0]), dst=slot)
+        return True
+
+    def _capture_loop(self):
+        seq = int(self.ring.head[0]) + 1
+        while self.running and self.cap:
+            try:
+                ret = self._read_into(seq)
+            except cv2.error as e:
+                print("Error reading frame:", e)
+                ret = False
+            if not ret:
+                self.read_failures += 1
+                time.sleep(0.01)
+                continue
+            self.ring.commit(seq, time.time())
+            self.frames_captured += 1
+            seq += 1
+            with self._cond:
+                self._cond.notify_all()
+
+    def latest(self):
+        """Return the newest FramePacket without blocking (None if none yet)."""
+        return self.ring.latest()
+
+    def wait_for_frame(self, after_seq=-1, timeout=None):
+        """Block until a frame newer than after_seq is published.
+
+        Returns the newest FramePacket, or None on timeout or when the bus stops.
+        """
+        with self._cond:
+            packet = self.ring.latest()
+            if packet is not None and packet.seq > after_seq:
+                return packet
+            if not self.running:
+                return None
+            self._cond.wait(timeout)
+        packet = self.ring.latest()
+        if packet is not None and packet.seq > after_seq:
+            return packet
+        return None
+
+    def is_current(self, packet):
+        """True if packet's pixels have not been overwritten since it was read."""
+        return self.ring.is_current(packet.seq)
@@ -2,19 +2,37 @@ import cv2
 import dlib
 import numpy as np
 import math
-from fer import FER
+import time
 from gaze_tracking import GazeTracking
 import os
+from detector_model.emotion_runtime import FACE_OFFSETS, FACE_PADDING, create_emotion_runtime, crop_face
+from detector_model.face_detectors import create_face_detector
+from detector_model.face_tracker import FaceTracker
+from detector_model.frame_bus import open_capture
+from detector_model.head_pose import HeadPoseTracker
+from detector_model.blink_detector import BlinkDetector
+from detector_model.landmark_gaze import LandmarkGaze
+from detector_model.target_selector import TargetSelector
 # from state_updater import StateUpdater
 
 
 class FaceAnalyzer:
     """Handles face detection, gaze tracking, and head pose estimation."""
 
-    def __init__(self, predictor_path):
-        self.detector = dlib.get_frontal_face_detector()
+    def __init__(self, predictor_path, tracking=False, redetect_interval=10, detector="hog",
+                 detector_options=None, pose_max_gap=1.0):
+        # detector picks the backend from face_detectors ("hog", "haar",
+        # "yunet" or "dnn"); all of them return dlib rectangles.
+        self.detector = create_face_detector(detector, **(detector_options or {}))
         self.predictor = dlib.shape_predictor(predictor_path)
-        self.gaze = GazeTracking()
+        # In tracking mode the detector only runs every redetect_interval
+        # frames (or when the track is lost); a correlation tracker fills the gaps.
+        self.tracker = FaceTracker(
+            self.detect_faces, redetect_interval) if tracking else None
+        self.gaze = None  # GazeTracking is only built if the frame-based path is used
+        # Eye openness calibrated to the child in front; also drives "Blinking".
+        self.blink = BlinkDetector()
+        self.landmark_gaze = LandmarkGaze(self.blink)
         self.model_points = np.array([
             (0.0, 0.0, 0.0),             # Nose tip
             (0.0, -330.0, -65.0),        # Chin
@@ -23,11 +41,31 @@ class FaceAnalyzer:
             (-150.0, -150.0, -125.0),    # Left mouth corner
             (150.0, -150.0, -125.0)      # Right mouth corner
         ])
+        # Warm-started, smoothed pose and flicker-free labels across frames.
+        # pose_max_gap must cover the caller's analysis interval, or every
+        # update starts from scratch (see HeadPoseTracker).
+        self.head_pose = HeadPoseTracker(
+            self.model_points, self.get_horizontal_movement_label,
+            self.get_vertical_movement_label, max_gap=pose_max_gap)
+
+    def reset_session(self):
+        """Forget everything learned about the child in front (new session or child)."""
+        self.blink.reset()
+        self.head_pose.reset()
+        self.landmark_gaze.reset()
+        if self.tracker is not None:
+            self.tracker.reset()
 
     def detect_faces(self, gray_frame):
         """Detect faces in a grayscale image."""
         return self.detector(gray_frame)
 
+    def locate_faces(self, gray_frame):
+        """Return faces for a video frame, tracking between detections if enabled."""
+        if self.tracker is not None:
+            return self.tracker.update(gray_frame)
+        return self.detect_faces(gray_frame)
+
     def get_landmarks(self, gray_frame, face):
         """Return face landmarks for a given face."""
         return self.predictor(gray_frame, face)
@@ -43,22 +81,26 @@ class FaceAnalyzer:
             (landmarks.part(54).x, landmarks.part(54).y)   # Right mouth corner
         ], dtype="double")
 
-        focal_length = frame_size[1]
-        center = (frame_size[1] // 2, frame_size[0] // 2)
-        camera_matrix = np.array([
-            [focal_length, 0, center[0]],
-            [0, focal_length, center[1]],
-            [0, 0, 1]
-        ], dtype="double")
-
+        camera_matrix = self.head_pose.camera_matrix(frame_size)
         dist_coeffs = np.zeros((4, 1))  # Assuming no lens distortion
         success, rotation_vector, _ = cv2.solvePnP(
             self.model_points, image_points, camera_matrix, dist_coeffs)
 
         return rotation_vector if success else None
 
+    def track_head_pose(self, landmarks, frame_size, timestamp=None):
+        """Head pose of the tracked face, smoothed over frames.
+
+        Returns (yaw, pitch, horizontal_label, vertical_label) or None. Call
+        self.head_pose.reset() when the face is lost or a different face is
+        tracked.
+        """
+        return self.head_pose.update(landmarks, frame_size, timestamp)
+
     def get_gaze_direction(self, frame):
         """Detects gaze direction using GazeTracking library."""
+        if self.gaze is None:
+            self.gaze = GazeTracking()
         self.gaze.refresh(frame)
 
         if self.gaze.is_right():
@@ -69,6 +111,16 @@ class FaceAnalyzer:
             return "Looking Center"
         return "Unknown"
 
+    def get_gaze_from_landmarks(self, gray_frame, landmarks, timestamp=None):
+        """Gaze direction from landmarks already computed for this face.
+
+        Only the eye regions are processed, so unlike get_gaze_direction no
+        second face detection or landmark prediction runs on the full frame.
+        Also returns "Blinking" when both eyes are closed; self.blink keeps
+        the blink rate and eye-closure share.
+        """
+        return self.landmark_gaze.estimate(gray_frame, landmarks, timestamp)
+
     @staticmethod
     def rotation_vector_to_euler_angles(rotation_vector):
         """Convert rotation vector to yaw, pitch, roll angles."""
@@ -105,78 +157,253 @@ class FaceAnalyzer:
 
 
 class EmotionAnalyzer:
-    """Handles emotion detection from facial expressions."""
+    """Handles emotion detection from facial expressions.
 
-    def __init__(self):
-        self.detector = FER()
+    mode="frame" runs FER on the whole frame (its own face detection).
+    mode="face" classifies the face dlib already found: the box is cropped the
+    way FER crops it, converted to grayscale and sent through one forward
+    pass of FER's emotion CNN.
+
+    runtime picks what executes the CNN in face mode: "keras" (FER's model,
+    imports TensorFlow) or the exported model on "onnx" or "opencv" (see
+    export_emotion_model), which never import TensorFlow.
+    """
+
+    # Face crop margin (x, y) and zero padding FER applies around each box.
+    FACE_OFFSETS = FACE_OFFSETS
+    FACE_PADDING = FACE_PADDING
+
+    def __init__(self, mode="frame", runtime="keras", model_path=None):
+        if mode not in ("frame", "face"):
+            raise ValueError("mode must be 'frame' or 'face'.")
+        self.mode = mode
+        self.detector = None
+        if mode == "frame" or runtime == "keras":
+            # Imported here: FER pulls in TensorFlow, which the exported
+            # runtimes exist to avoid.
+            from fer import FER
+            self.detector = FER()
+        if runtime == "keras":
+            self.classifier = create_emotion_runtime(runtime, fer_detector=self.detector)
+        else:
+            options = {} if model_path is None else {"model_path": model_path}
+            self.classifier = create_emotion_runtime(runtime, **options)
+        self.runtime = runtime
+        self.input_size = tuple(self.classifier.input_size)
+        self.labels = list(self.classifier.labels)
         self.last_emotion = "Neutral"
         self.last_score = 0.0
+        # Duration of the most recent call on each path, in milliseconds.
+        self.latency_ms = {"frame": None, "face": None}
+
+    def detect_emotion(self, frame, face=None, gray_frame=None):
+        """Run emotion detection and return the most likely emotion.
 
-    def detect_emotion(self, frame):
-        """Run emotion detection and return the most likely emotion."""
+        In "face" mode, pass the dlib rectangle (and the grayscale frame if it
+        is already available) to skip FER's own face detection.
+        """
+        if self.mode == "face" and face is not None:
+            if gray_frame is None:
+                gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            return self.detect_emotion_in_face(gray_frame, face)
+        if self.detector is None:
+            # Exported runtimes only classify faces found by the face detector.
+            return self.last_emotion, self.last_score
+
+        start = time.perf_counter()
         result = self.detector.detect_emotions(frame)
         if result:
             emotion, score = self.detector.top_emotion(frame)
             if emotion:
                 self.last_emotion = emotion
                 self.last_score = round(score, 2)
+        self.latency_ms["frame"] = (time.perf_counter() - start) * 1000
+        return self.last_emotion, self.last_score
+
+    def detect_emotion_in_face(self, gray_frame, face):
+        """Classify an already-detected face with a single CNN forward pass."""
+        start = time.perf_counter()
+        crop = self.preprocess_face(gray_frame, face)
+        if crop is not None:
+            scores = self.classify_faces(crop[np.newaxis])[0]
+            best = int(np.argmax(scores))
+            self.last_emotion = self.labels[best]
+            self.last_score = round(float(scores[best]), 2)
+        self.latency_ms["face"] = (time.perf_counter() - start) * 1000
         return self.last_emotion, self.last_score
 
+    def preprocess_face(self, gray_frame, face):
+        """Crop, resize and normalize a face exactly as FER does before its CNN.
+
+        Returns a float32 array of shape (h, w, 1), or None for an empty crop.
+        """
+        return crop_face(gray_frame, face, self.input_size, self.FACE_OFFSETS, self.FACE_PADDING)
+
+    def classify_faces(self, faces):
+        """Run the emotion CNN on a (n, h, w, 1) batch and return (n, 7) scores."""
+        return np.asarray(self.classifier(faces))
+
 
 class VideoProcessor:
     """Handles video processing (head pose, gaze tracking, and emotions)."""
 
-    def __init__(self, predictor_path):
-        self.face_analyzer = FaceAnalyzer(predictor_path)
-        self.emotion_analyzer = EmotionAnalyzer()
-        self.cap = cv2.VideoCapture(1)
+    # Stages timed by process_frame (milliseconds, target face only).
+    STAGES = ("read", "preprocess", "detect", "landmarks", "head_pose", "gaze", "emotion")
+
+    def __init__(self, predictor_path, frame_bus=None, tracking=False, emotion_mode="face",
+                 emotion_batcher=None, source=1, detector="hog", emotion_runtime="keras",
+                 target_policy="largest", motion_gate=None, emotion_scheduler=None,
+                 pose_max_gap=1.0):
+        self.face_analyzer = FaceAnalyzer(predictor_path, tracking=tracking, detector=detector,
+                                          pose_max_gap=pose_max_gap)
+        self.emotion_analyzer = EmotionAnalyzer(mode=emotion_mode, runtime=emotion_runtime)
+        # When a FrameBus is shared with other consumers, read from it instead
+        # of opening a second capture on the same camera.
+        self.frame_bus = frame_bus
+        # source may be a camera index, a video file or a directory of images.
+        self.cap = open_capture(source) if frame_bus is None else None
+        self.last_seq = -1
+        self.frame_time = None
         self.frame_count = 0
         self.emotion_update_interval = 15  # Run emotion detection every 15 frames
+        # An AnalysisScheduler replaces the fixed frame interval with one set
+        # by CPU budget and need.
+        self.emotion_scheduler = emotion_scheduler
+        # With an EmotionBatcher, every face crop is queued and classified in
+        # batches instead of one frame every emotion_update_interval frames.
+        # Opt-in for high-rate callers (replay/benchmark --emotion-batch); the
+        # app analyzes one frame every few seconds and never fills a batch.
+        self.emotion_batcher = emotion_batcher
+        # Chooses the one face per frame that is analyzed.
+        self.target_selector = TargetSelector(target_policy)
+        self.target_face = None
+        # With a MotionGate, frames where the face region did not change
+        # reuse the previous labels instead of running detection and pose.
+        self.motion_gate = motion_gate
+        self.labels_reused = False
+        self.labels_time = None
 
         self.horizontal_label = None
         self.vertical_label = None
         self.gaze_direction = None
         self.last_emotion = None
         self.last_score = None
+        self.yaw = None
+        self.pitch = None
+        self.face_count = 0
+        self.timings = dict.fromkeys(self.STAGES, 0.0)
 
     def process_frame(self):
         """Processes a single frame and updates the detected values."""
-        ret, frame = self.cap.read()
-        if not ret:
+        timings = dict.fromkeys(self.STAGES, 0.0)
+        tick = time.perf_counter()
+        frame = self.read_frame()
+        if frame is None:
             return None
+        frame_time = self.frame_time
+        tick = self._lap(timings, "read", tick)
 
         self.frame_count += 1
         frame_resized = cv2.resize(frame, (640, 480))
         gray = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2GRAY)
-        faces = self.face_analyzer.detect_faces(gray)
+        tick = self._lap(timings, "preprocess", tick)
 
-        for face in faces:
+        if self.motion_gate is not None and not self.motion_gate.should_process(
+                gray, self._target_box(), frame_time):
+            # Nothing moved in the face region: keep the labels, restamp them.
+            self.labels_reused = True
+            self.labels_time = frame_time
+            if self.emotion_batcher is not None:
+                self.emotion_batcher.poll()
+            self.timings = timings
+            return frame_resized
+        self.labels_reused = False
+        self.labels_time = frame_time
+
+        faces = self.face_analyzer.locate_faces(gray)
+        self.face_count = len(faces)
+        tick = self._lap(timings, "detect", tick)
+
+        # Only the target child goes through the expensive stages; other
+        # faces (teacher, siblings) would each overwrite the same labels.
+        face = self.target_selector.select(faces, gray.shape, frame_time)
+        self.target_face = face
+        if face is None:
+            self.face_analyzer.head_pose.reset()
+        else:
             landmarks = self.face_analyzer.get_landmarks(gray, face)
+            tick = self._lap(timings, "landmarks", tick)
 
             # Get head pose
-            rotation_vector = self.face_analyzer.get_head_pose(
-                landmarks, frame_resized.shape)
-            if rotation_vector is not None:
-                yaw, pitch, _ = self.face_analyzer.rotation_vector_to_euler_angles(
-                    rotation_vector)
-                self.horizontal_label = self.face_analyzer.get_horizontal_movement_label(
-                    yaw)
-                self.vertical_label = self.face_analyzer.get_vertical_movement_label(
-                    pitch)
+            pose = self.face_analyzer.track_head_pose(
+                landmarks, frame_resized.shape, frame_time)
+            if pose is not None:
+                self.yaw, self.pitch, self.horizontal_label, self.vertical_label = pose
+            tick = self._lap(timings, "head_pose", tick)
 
             # Get gaze direction
-            self.gaze_direction = self.face_analyzer.get_gaze_direction(
-                frame_resized)
+            self.gaze_direction = self.face_analyzer.get_gaze_from_landmarks(
+                gray, landmarks, frame_time)
+            tick = self._lap(timings, "gaze", tick)
 
-            # Get emotion every self.emotion_update_interval frames
-            if self.frame_count % self.emotion_update_interval == 0:
+            if self.emotion_batcher is not None:
+                self.emotion_batcher.submit(
+                    gray, face, self.horizontal_label, self.vertical_label,
+                    self.gaze_direction, timestamp=frame_time)
+                self.last_emotion = self.emotion_analyzer.last_emotion
+                self.last_score = self.emotion_analyzer.last_score
+
+            # Get emotion when the scheduler (or every emotion_update_interval frames) says so
+            elif self._emotion_due(frame_time):
+                emotion_start = time.perf_counter()
                 emotion, score = self.emotion_analyzer.detect_emotion(
-                    frame_resized)
+                    frame_resized, face, gray)
                 self.last_emotion = emotion
                 self.last_score = score
+                if self.emotion_scheduler is not None:
+                    self.emotion_scheduler.record(
+                        time.perf_counter() - emotion_start, emotion, frame_time)
+            tick = self._lap(timings, "emotion", tick)
+
+        if self.emotion_batcher is not None:
+            # Do not let a partial batch wait forever once the face is gone.
+            self.emotion_batcher.poll()
+            tick = self._lap(timings, "emotion", tick)
 
+        self.timings = timings
         return frame_resized
 
+    def _emotion_due(self, frame_time):
+        if self.emotion_scheduler is not None:
+            return self.emotion_scheduler.due(frame_time)
+        return self.frame_count % self.emotion_update_interval == 0
+
+    def _target_box(self):
+        face = self.target_face
+        if face is None:
+            return None
+        return face.left(), face.top(), face.right(), face.bottom()
+
+    @staticmethod
+    def _lap(timings, stage, tick):
+        """Add the time since tick to a stage (in ms) and return a new tick."""
+        now = time.perf_counter()
+        timings[stage] += (now - tick) * 1000
+        return now
+
+    def read_frame(self):
+        """Returns the next frame from the frame bus or the private capture."""
+        if self.frame_bus is not None:
+            packet = self.frame_bus.wait_for_frame(self.last_seq, timeout=1.0)
+            if packet is None:
+                return None
+            self.last_seq = packet.seq
+            self.frame_time = packet.timestamp
+            return packet.frame
+        ret, frame = self.cap.read()
+        self.frame_time = time.time()
+        return frame if ret else None
+
     def get_latest_state(self):
         """Returns the latest detected head pose, gaze, and emotion."""
         return {
@@ -184,10 +411,13 @@ class VideoProcessor:
             "vertical": self.vertical_label,
             "gaze": self.gaze_direction,
             "emotion": self.last_emotion,
-            "score": self.last_score
+            "score": self.last_score,
+            "timestamp": self.labels_time,
+            "reused": self.labels_reused,
         }
 
     def release(self):
         """Releases the video capture resources."""
-        self.cap.release()
+        if self.cap is not None:
+            self.cap.release()
         cv2.destroyAllWindows()
@@ -0,0 +1,155 @@
+import math
+import time
+
+import cv2
+import numpy as np
+
+# dlib 68-point indices matching FaceAnalyzer.model_points: nose tip, chin,
+# left eye left corner, right eye right corner, left and right mouth corners.
+POSE_LANDMARKS = (30, 8, 36, 45, 48, 54)
+
+
+def _wrap_degrees(angle):
+    """Map an angle to [-180, 180)."""
+    return (angle + 180.0) % 360.0 - 180.0
+
+
+class HeadPoseTracker:
+    """Stateful head pose for one face across consecutive frames.
+
+    Compared with calling solvePnP from scratch each frame:
+    - the camera matrix is built once per frame size;
+    - solvePnP starts from the previous rotation/translation (useExtrinsicGuess),
+      so its iterations converge in a few steps;
+    - yaw and pitch go through an EMA that handles the +-180 degree wrap;
+    - labels change only when the angle is at least `hysteresis` degrees inside
+      the new label's range, so a head resting on a threshold does not flicker.
+    """
+
+    def __init__(self, model_points, horizontal_label_fn, vertical_label_fn, alpha=0.4,
+                 hysteresis=3.0, max_gap=1.0):
+        """
+        :param model_points: (6, 3) 3D model points in POSE_LANDMARKS order.
+        :param horizontal_label_fn: Maps yaw in degrees to a label.
+        :param vertical_label_fn: Maps pitch in degrees to a label.
+        :param alpha: EMA weight of the newest sample (1.0 disables smoothing).
+        :param hysteresis: Degrees an angle must move past a label boundary.
+        :param max_gap: Seconds between updates after which the previous pose
+            is no longer used as a starting point or smoothed into the new one.
+            Callers analyzing every few seconds must raise it to their longest
+            interval, or every update starts from scratch.
+        """
+        self.model_points = np.ascontiguousarray(model_points, dtype=np.float64)
+        self.horizontal_label_fn = horizontal_label_fn
+        self.vertical_label_fn = vertical_label_fn
+        self.alpha = alpha
+        self.hysteresis = hysteresis
+        self.max_gap = max_gap
+
+        self._camera_matrices = {}
+        self._dist_coeffs = np.zeros((4, 1))
+        self._image_points = np.zeros((len(POSE_LANDMARKS), 2), dtype=np.float64)
+        self.rotation_vector = None
+        self.translation_vector = None
+        self.last_update = None
+
+        self.yaw = None
+        self.pitch = None
+        self.roll = None
+        self.horizontal_label = None
+        self.vertical_label = None
+
+    def reset(self):
+        """Forget the pose (e.g. the face was lost); labels restart on the next update."""
+        self.rotation_vector = None
+        self.translation_vector = None
+        self.last_update = None
+        self.yaw = self.pitch = self.roll = None
+        self.horizontal_label = None
+        self.vertical_label = None
+
+    def camera_matrix(self, frame_size):
+        """Pinhole intrinsics for a frame of (h, w), cached per size."""
+        height, width = frame_size[:2]
+        matrix = self._camera_matrices.get((height, width))
+        if matrix is None:
+            matrix = np.array([
+                [width, 0, width // 2],
+                [0, width, height // 2],
+                [0, 0, 1]
+            ], dtype=np.float64)
+            self._camera_matrices[(height, width)] = matrix
+        return matrix
+
+    def solve(self, landmarks, frame_size, warm_start=True):
+        """Run solvePnP for these landmarks; returns the rotation vector or None."""
+        for row, index in enumerate(POSE_LANDMARKS):
+            point = landmarks.part(index)
+            self._image_points[row, 0] = point.x
+            self._image_points[row, 1] = point.y
+
+        camera_matrix = self.camera_matrix(frame_size)
+        if warm_start and self.rotation_vector is not None:
+            success, rotation_vector, translation_vector = cv2.solvePnP(
+                self.model_points, self._image_points, camera_matrix, self._dist_coeffs,
+                self.rotation_vector, self.translation_vector, useExtrinsicGuess=True,
+                flags=cv2.SOLVEPNP_ITERATIVE)
+        else:
+            success, rotation_vector, translation_vector = cv2.solvePnP(
+                self.model_points, self._image_points, camera_matrix, self._dist_coeffs)
+        if not success:
+            return None
+        self.rotation_vector = rotation_vector
+        self.translation_vector = translation_vector
+        return rotation_vector
+
+    def update(self, landmarks, frame_size, timestamp=None):
+        """Estimate, smooth and label the pose for one frame.
+
+        Returns (yaw, pitch, horizontal_label, vertical_label), or None if
+        solvePnP failed.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        fresh = self.last_update is None or timestamp - self.last_update > self.max_gap
+        rotation_vector = self.solve(landmarks, frame_size, warm_start=not fresh)
+        if rotation_vector is None:
+            self.reset()
+            return None
+        self.last_update = timestamp
+
+        yaw, pitch, roll = self.euler_angles(rotation_vector)
+        if fresh or self.yaw is None:
+            self.yaw, self.pitch, self.roll = yaw, pitch, roll
+        else:
+            self.yaw = self._smooth(self.yaw, yaw)
+            self.pitch = self._smooth(self.pitch, pitch)
+            self.roll = self._smooth(self.roll, roll)
+
+        self.horizontal_label = self._hysteresis_label(
+            self.horizontal_label_fn, self.horizontal_label, self.yaw)
+        self.vertical_label = self._hysteresis_label(
+            self.vertical_label_fn, self.vertical_label, self.pitch)
+        return self.yaw, self.pitch, self.horizontal_label, self.vertical_label
+
+    def _smooth(self, previous, sample):
+        return _wrap_degrees(previous + self.alpha * _wrap_degrees(sample - previous))
+
+    def _hysteresis_label(self, label_fn, current, angle):
+        candidate = label_fn(angle)
+        if current is None or candidate == current:
+            return candidate
+        # Switch only once the angle is well inside the candidate's range.
+        if (label_fn(_wrap_degrees(angle - self.hysteresis)) == candidate and
+                label_fn(_wrap_degrees(angle + self.hysteresis)) == candidate):
+            return candidate
+        return current
+
+    @staticmethod
+    def euler_angles(rotation_vector):
+        """(yaw, pitch, roll) in degrees, same convention as FaceAnalyzer."""
+        rotation_matrix, _ = cv2.Rodrigues(rotation_vector)
+        r21, r22, r20 = rotation_matrix[2, 1], rotation_matrix[2, 2], rotation_matrix[2, 0]
+        pitch = math.atan2(r21, r22)
+        yaw = math.atan2(-r20, math.hypot(r21, r22))
+        roll = math.atan2(rotation_matrix[1, 0], rotation_matrix[0, 0])
+        return math.degrees(yaw), math.degrees(pitch), math.degrees(roll)
@@ -0,0 +1,78 @@
+"""Integer codes of the perception labels, shared by snapshots and StateUpdater.
+
+Labels are encoded once, when a reading is taken; everything downstream
+(snapshots, the StateUpdater windows and its reading ring) works on codes.
+Lookups ignore case because the detectors and FER do not agree on it
+("Looking Left" vs "looking left", "happy" vs "Happy"). Labels outside a
+table encode to UNKNOWN.
+"""
+
+UNKNOWN = -1
+
+HEAD_POSE_MAPPING = {
+    "Front": 0,
+    "Left": 1,
+    "Right": 2,
+    "Up": 3,
+    "Down": 4,
+    "Slight Left": 5,
+    "Slight Right": 6
+}
+GAZE_MAPPING = {
+    "Looking Center": 0,
+    "Looking Left": 1,
+    "Looking Right": 2,
+    "Blinking": 3
+}
+EMOTION_MAPPING = {
+    "Angry": 0,
+    "Disgust": 1,
+    "Fear": 2,
+    "Happy": 3,
+    "Neutral": 4,
+    "Sad": 5,
+    "Surprise": 6
+}
+
+
+def _index(mapping):
+    return {label.lower(): code for label, code in mapping.items()}
+
+
+def _labels(mapping):
+    labels = [None] * len(mapping)
+    for label, code in mapping.items():
+        labels[code] = label
+    return tuple(labels)
+
+
+_HEAD_POSE_INDEX = _index(HEAD_POSE_MAPPING)
+_GAZE_INDEX = _index(GAZE_MAPPING)
+_EMOTION_INDEX = _index(EMOTION_MAPPING)
+
+HEAD_POSE_LABELS = _labels(HEAD_POSE_MAPPING)
+GAZE_LABELS = _labels(GAZE_MAPPING)
+EMOTION_LABELS = _labels(EMOTION_MAPPING)
+
+
+def _encode(index, label):
+    if label is None:
+        return UNKNOWN
+    return index.get(str(label).lower(), UNKNOWN)
+
+
+def encode_head_pose(label):
+    return _encode(_HEAD_POSE_INDEX, label)
+
+
+def encode_gaze(label):
+    return _encode(_GAZE_INDEX, label)
+
+
+def encode_emotion(label):
+    return _encode(_EMOTION_INDEX, label)
+
+
+def decode(labels, code, default=None):
+    """Label of code in one of the *_LABELS tuples, or default for UNKNOWN."""
+    return labels[code] if 0 <= code < len(labels) else default
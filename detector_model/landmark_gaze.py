@@ -0,0 +1,132 @@
+import cv2
+import numpy as np
+
+from detector_model.blink_detector import BlinkDetector
+
+LEFT_EYE_POINTS = (36, 37, 38, 39, 40, 41)
+RIGHT_EYE_POINTS = (42, 43, 44, 45, 46, 47)
+
+
+class LandmarkGaze:
+    """Gaze direction from existing 68-point landmarks.
+
+    Same approach as GazeTracking (isolate each eye, threshold the iris and take
+    the pupil centroid), but it reuses the landmarks already computed by
+    FaceAnalyzer and only processes the two small eye crops, so no second
+    full-frame face detection or landmark prediction is needed. Closed eyes
+    are recognized by blink_detector from the same eye landmarks.
+    """
+
+    def __init__(self, blink_detector=None, left_limit=0.65, right_limit=0.35,
+                 iris_ratio=0.48, calibration_frames=20, margin=5):
+        """
+        :param blink_detector: BlinkDetector deciding when the eyes are closed
+            (a new one if None).
+        :param left_limit: Horizontal pupil ratio at or above which gaze is "Looking Left".
+        :param right_limit: Horizontal pupil ratio at or below which gaze is "Looking Right".
+        :param iris_ratio: Fraction of the eye crop the iris should cover after thresholding.
+        :param calibration_frames: Frames used per eye to pick the binarization threshold.
+        :param margin: Pixels kept around each eye polygon when cropping.
+        """
+        self.blink = blink_detector if blink_detector is not None else BlinkDetector()
+        self.left_limit = left_limit
+        self.right_limit = right_limit
+        self.iris_ratio = iris_ratio
+        self.calibration_frames = calibration_frames
+        self.margin = margin
+        self.thresholds = {"left": [], "right": []}
+        self.erode_kernel = np.ones((3, 3), np.uint8)
+
+    def reset(self):
+        """Recalibrate the binarization thresholds, e.g. for a different child.
+
+        The blink detector is reset by its owner.
+        """
+        self.thresholds = {"left": [], "right": []}
+
+    def estimate(self, gray_frame, landmarks, timestamp=None):
+        """Return "Looking Left/Right/Center", "Blinking" or "Unknown"."""
+        left_points = self._eye_points(landmarks, LEFT_EYE_POINTS)
+        right_points = self._eye_points(landmarks, RIGHT_EYE_POINTS)
+
+        if self.blink.update(left_points, right_points, timestamp):
+            return "Blinking"
+
+        ratios = []
+        for side, points in (("left", left_points), ("right", right_points)):
+            ratio = self._pupil_ratio(gray_frame, points, side)
+            if ratio is not None:
+                ratios.append(ratio)
+        if not ratios:
+            return "Unknown"
+
+        horizontal_ratio = sum(ratios) / len(ratios)
+        if horizontal_ratio <= self.right_limit:
+            return "Looking Right"
+        elif horizontal_ratio >= self.left_limit:
+            return "Looking Left"
+        return "Looking Center"
+
+    @staticmethod
+    def _eye_points(landmarks, indices):
+        return np.array([(landmarks.part(i).x, landmarks.part(i).y) for i in indices], dtype=np.int32)
+
+    def _isolate_eye(self, gray_frame, points):
+        """Crop the eye and whiten everything outside the eye polygon."""
+        height, width = gray_frame.shape[:2]
+        x0 = max(0, points[:, 0].min() - self.margin)
+        y0 = max(0, points[:, 1].min() - self.margin)
+        x1 = min(width, points[:, 0].max() + self.margin)
+        y1 = min(height, points[:, 1].max() + self.margin)
+        if x1 - x0 < 3 or y1 - y0 < 3:
+            return None
+
+        eye = gray_frame[y0:y1, x0:x1].copy()
+        mask = np.zeros(eye.shape, np.uint8)
+        cv2.fillPoly(mask, [points - (x0, y0)], 255)
+        eye[mask == 0] = 255
+        return eye
+
+    def _binarize(self, eye, threshold):
+        eye = cv2.bilateralFilter(eye, 10, 15, 15)
+        eye = cv2.erode(eye, self.erode_kernel, iterations=3)
+        return cv2.threshold(eye, threshold, 255, cv2.THRESH_BINARY)[1]
+
+    def _calibrated_threshold(self, eye, side):
+        history = self.thresholds[side]
+        if len(history) < self.calibration_frames:
+            history.append(self._best_threshold(eye))
+        return int(sum(history) / len(history))
+
+    def _best_threshold(self, eye):
+        """Threshold whose iris coverage is closest to iris_ratio."""
+        best, best_error = 50, None
+        for threshold in range(5, 100, 5):
+            iris = self._binarize(eye, threshold)[5:-5, 5:-5]
+            if iris.size == 0:
+                return best
+            coverage = 1 - cv2.countNonZero(iris) / iris.size
+            error = abs(coverage - self.iris_ratio)
+            if best_error is None or error < best_error:
+                best, best_error = threshold, error
+        return best
+
+    def _pupil_ratio(self, gray_frame, points, side):
+        """Horizontal pupil position in the eye crop, 0.0 (right) to 1.0 (left)."""
+        eye = self._isolate_eye(gray_frame, points)
+        if eye is None:
+            return None
+
+        iris = self._binarize(eye, self._calibrated_threshold(eye, side))
+        contours, _ = cv2.findContours(iris, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
+        if len(contours) < 2:
+            return None
+        # The largest contour is the white border; the next one is the iris.
+        contour = sorted(contours, key=cv2.contourArea)[-2]
+        moments = cv2.moments(contour)
+        if moments["m00"] == 0:
+            return None
+
+        pupil_x = moments["m10"] / moments["m00"]
+        span = eye.shape[1] - 10
+        return pupil_x / span if span > 0 else None
@@ -0,0 +1,100 @@
+import time
+
+import cv2
+
+
+class MotionGate:
+    """Decides whether a frame differs enough from the last analyzed one to analyze again.
+
+    Both frames are downscaled and compared by mean absolute grayscale
+    difference inside the last face box (or the whole frame if there was no
+    face). The comparison is against the last *analyzed* frame, so slow drift
+    adds up instead of slipping through a frame at a time. A frame is always
+    analyzed once max_reuse seconds have passed, so reused labels never go stale.
+    """
+
+    def __init__(self, threshold=4.0, scale=0.25, max_reuse=2.0, roi_padding=0.25):
+        """
+        :param threshold: Mean absolute difference (0-255) in the ROI that counts as motion.
+        :param scale: Downscale factor applied before comparing.
+        :param max_reuse: Longest time in seconds labels may be reused.
+        :param roi_padding: Margin around the face box, as a fraction of its size.
+        """
+        self.threshold = threshold
+        self.scale = scale
+        self.max_reuse = max_reuse
+        self.roi_padding = roi_padding
+
+        self._reference = None  # Downscaled copy of the last analyzed frame
+        self._small = None  # Reused downscale buffer
+        self._reference_time = None
+        self.last_motion = None
+
+        self.frames_seen = 0
+        self.frames_skipped = 0
+
+    def reset(self):
+        """Force the next frame to be analyzed."""
+        self._reference = None
+        self._reference_time = None
+
+    def should_process(self, gray_frame, face_box=None, now=None):
+        """True if gray_frame must be analyzed, False if the previous labels still hold.
+
+        :param face_box: (left, top, right, bottom) of the face in the last
+            analyzed frame, in gray_frame pixels; None compares the whole frame.
+        :param now: Frame timestamp in seconds (defaults to time.time()).
+        """
+        now = time.time() if now is None else now
+        self.frames_seen += 1
+        height, width = gray_frame.shape[:2]
+        size = (max(1, int(width * self.scale)), max(1, int(height * self.scale)))
+        if self._small is None or self._small.shape[:2] != (size[1], size[0]):
+            self._small = None
+        self._small = cv2.resize(gray_frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+
+        if (self._reference is None or self._reference.shape != self._small.shape or
+                now - self._reference_time >= self.max_reuse):
+            return self._accept(now)
+
+        current, reference = self._small, self._reference
+        if face_box is not None:
+            left, top, right, bottom = self._scaled_roi(face_box, size)
+            if right > left and bottom > top:
+                current = current[top:bottom, left:right]
+                reference = reference[top:bottom, left:right]
+        self.last_motion = cv2.mean(cv2.absdiff(current, reference))[0]
+        if self.last_motion >= self.threshold:
+            return self._accept(now)
+
+        self.frames_skipped += 1
+        return False
+
+    def _accept(self, now):
+        if self._reference is None or self._reference.shape != self._small.shape:
+            self._reference = self._small.copy()
+        else:
+            self._reference[...] = self._small
+        self._reference_time = now
+        return True
+
+    def _scaled_roi(self, face_box, size):
+        left, top, right, bottom = face_box
+        pad_x = (right - left) * self.roi_padding
+        pad_y = (bottom - top) * self.roi_padding
+        width, height = size
+        return (max(0, int((left - pad_x) * self.scale)), max(0, int((top - pad_y) * self.scale)),
+                min(width, int((right + pad_x) * self.scale) + 1),
+                min(height, int((bottom + pad_y) * self.scale) + 1))
+
+    def skip_rate(self):
+        """Fraction of frames whose analysis was skipped."""
+        return self.frames_skipped / self.frames_seen if self.frames_seen else 0.0
+
+    def stats(self):
+        return {
+            "frames_seen": self.frames_seen,
+            "frames_skipped": self.frames_skipped,
+            "skip_rate": round(self.skip_rate(), 3),
+            "last_motion": None if self.last_motion is None else round(self.last_motion, 2),
+        }
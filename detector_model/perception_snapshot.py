@@ -0,0 +1,101 @@
+import time
+
+from detector_model.label_codes import (
+    EMOTION_LABELS, GAZE_LABELS, HEAD_POSE_LABELS, UNKNOWN, decode, encode_emotion,
+    encode_gaze, encode_head_pose)
+
+
+class PerceptionSnapshot:
+    """One analysis result: sequence number, capture time and integer-coded labels.
+
+    The codes are those of detector_model.label_codes, so they go into
+    StateUpdater.add_codes as they are.
+
+    Snapshots are immutable, so a reader holding one always sees the labels of
+    a single frame. The producer publishes a new snapshot by replacing its
+    reference to the old one, which is atomic in CPython.
+    """
+
+    __slots__ = ("seq", "timestamp", "face_found", "reused", "horizontal", "vertical",
+                 "gaze", "emotion", "emotion_confidence", "blink_rate", "eye_closure")
+
+    def __init__(self, seq, timestamp, face_found, horizontal=0, vertical=0, gaze=0,
+                 emotion=UNKNOWN, emotion_confidence=0.0, reused=False, blink_rate=None,
+                 eye_closure=None):
+        """
+        :param seq: Sequence number of the analyzed frame.
+        :param timestamp: Wall-clock time (time.time()) the frame was captured at.
+        :param face_found: False if the frame had no face; the labels are then
+            the ones of the last frame that had one.
+        :param reused: True if the labels were carried over by the motion gate.
+        :param blink_rate: Blinks per minute over the BlinkDetector window, or None.
+        :param eye_closure: Share of recent samples with closed eyes, or None.
+        """
+        set_field = object.__setattr__
+        set_field(self, "seq", int(seq))
+        set_field(self, "timestamp", float(timestamp))
+        set_field(self, "face_found", bool(face_found))
+        set_field(self, "reused", bool(reused))
+        set_field(self, "horizontal", int(horizontal))
+        set_field(self, "vertical", int(vertical))
+        set_field(self, "gaze", int(gaze))
+        set_field(self, "emotion", int(emotion))
+        set_field(self, "emotion_confidence", float(emotion_confidence))
+        set_field(self, "blink_rate", None if blink_rate is None else float(blink_rate))
+        set_field(self, "eye_closure", None if eye_closure is None else float(eye_closure))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PerceptionSnapshot is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("PerceptionSnapshot is immutable.")
+
+    def __repr__(self):
+        return (f"PerceptionSnapshot(seq={self.seq}, age={self.age():.2f}s, "
+                f"face_found={self.face_found}, head={self.horizontal_label}/"
+                f"{self.vertical_label}, gaze={self.gaze_label}, "
+                f"emotion={self.emotion_label} ({self.emotion_confidence:.2f}))")
+
+    @classmethod
+    def from_detection(cls, detected_state, seq, timestamp, previous=None, reused=False):
+        """Encode a detected_state dict; with no face, keep the labels of previous."""
+        if detected_state is None:
+            if previous is None:
+                return cls(seq, timestamp, False, reused=reused)
+            return cls(seq, timestamp, False, previous.horizontal, previous.vertical,
+                       previous.gaze, previous.emotion, previous.emotion_confidence, reused,
+                       previous.blink_rate, previous.eye_closure)
+        return cls(
+            seq, timestamp, True,
+            encode_head_pose(detected_state["horizontal"]),
+            encode_head_pose(detected_state["vertical"]),
+            encode_gaze(detected_state["gaze"]),
+            encode_emotion(detected_state["emotion"]),
+            detected_state["emotion_confidence"] or 0.0,
+            reused,
+            detected_state.get("blink_rate"),
+            detected_state.get("eye_closure"))
+
+    def age(self, now=None):
+        """Seconds since the frame was captured."""
+        return (time.time() if now is None else now) - self.timestamp
+
+    def labels(self):
+        """The codes as a tuple, e.g. to compare two snapshots' labels."""
+        return self.horizontal, self.vertical, self.gaze, self.emotion
+
+    @property
+    def horizontal_label(self):
+        return decode(HEAD_POSE_LABELS, self.horizontal, "Front")
+
+    @property
+    def vertical_label(self):
+        return decode(HEAD_POSE_LABELS, self.vertical, "Front")
+
+    @property
+    def gaze_label(self):
+        return decode(GAZE_LABELS, self.gaze, "Unknown")
+
+    @property
+    def emotion_label(self):
+        return decode(EMOTION_LABELS, self.emotion, "Neutral")
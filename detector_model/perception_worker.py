@@ -0,0 +1,265 @@
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from detector_model.frame_bus import FrameRing
+from detector_model.target_selector import TargetSelector
+
+
+class SharedFrameRing(FrameRing):
+    """FrameRing whose slots and metadata live in multiprocessing shared memory.
+
+    Layout of the segment: head (int64), seqs (int64 x size),
+    timestamps (float64 x size), then the frame slots (uint8).
+    Slots are sized up front, so FrameBus decodes straight into shared memory
+    and another process reads the same pixels without any copy.
+    """
+
+    def __init__(self, shape, size=4, name=None):
+        super().__init__(size)
+        self.shape = tuple(shape)
+        meta_bytes = 8 * (1 + 2 * size)
+        frame_bytes = size * int(np.prod(self.shape))
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=self.owner, size=meta_bytes + frame_bytes)
+
+        buf = self.shm.buf
+        self.head = np.ndarray((1,), np.int64, buffer=buf, offset=0)
+        self.seqs = np.ndarray((size,), np.int64, buffer=buf, offset=8)
+        self.timestamps = np.ndarray((size,), np.float64, buffer=buf, offset=8 * (1 + size))
+        self.frames = np.ndarray((size,) + self.shape, np.uint8, buffer=buf, offset=meta_bytes)
+        if self.owner:
+            self.head[0] = -1
+            self.seqs[:] = -1
+        self._bind_views()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def allocate(self, shape):
+        if tuple(shape) != self.shape:
+            raise ValueError(f"Shared ring holds {self.shape} frames, got {tuple(shape)}.")
+
+    def close(self):
+        """Drop this process's mapping (and the segment itself if we created it)."""
+        self.head = self.seqs = self.timestamps = self.frames = None
+        self._views = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def analyze_gray_frame(face_analyzer, emotion_analyzer, gray, target_selector=None, timestamp=None):
+    """Run head pose, gaze and emotion on the target face of a grayscale frame.
+
+    target_selector picks that face (the largest one if not given). Head pose
+    goes through face_analyzer's HeadPoseTracker and blinks through its
+    BlinkDetector, so pass the frame timestamp.
+    Returns a detected_state dict, or None when no face (or no pose) was found.
+    """
+    faces = face_analyzer.detect_faces(gray)
+    if target_selector is None:
+        face = max(faces, key=lambda rect: rect.area()) if len(faces) else None
+    else:
+        face = target_selector.select(faces, gray.shape, timestamp)
+    if face is None:
+        face_analyzer.head_pose.reset()
+        return None
+    landmarks = face_analyzer.get_landmarks(gray, face)
+    pose = face_analyzer.track_head_pose(landmarks, gray.shape[:2], timestamp)
+    if pose is None:
+        return None
+
+    _, _, horizontal, vertical = pose
+    emotion, confidence = emotion_analyzer.detect_emotion_in_face(gray, face)
+    return {
+        "face_box": (face.left(), face.top(), face.right(), face.bottom()),
+        "horizontal": horizontal,
+        "vertical": vertical,
+        "gaze": face_analyzer.get_gaze_from_landmarks(gray, landmarks, timestamp),
+        "emotion": emotion,
+        "emotion_confidence": confidence,
+        "blink_rate": face_analyzer.blink.blink_rate(timestamp),
+        "eye_closure": face_analyzer.blink.closure_fraction(timestamp),
+    }
+
+
+def _perception_loop(ring_name, shape, ring_size, predictor_path, results, stop_event,
+                     ready_event, reset_event, interval, detector, emotion_runtime, target_policy,
+                     motion_gate, pose_max_gap):
+    """Entry point of the worker process."""
+    from detector_model.head_gaze_emotion_detector import FaceAnalyzer, EmotionAnalyzer
+
+    ring = SharedFrameRing(shape, ring_size, name=ring_name)
+    face_analyzer = FaceAnalyzer(predictor_path, detector=detector, pose_max_gap=pose_max_gap)
+    emotion_analyzer = EmotionAnalyzer(mode="face", runtime=emotion_runtime)
+    target_selector = TargetSelector(target_policy)
+    ready_event.set()
+    last_seq = -1
+    last_record = None
+    try:
+        while not stop_event.is_set():
+            if reset_event.is_set():
+                # A new session: drop the previous child's calibration and target.
+                reset_event.clear()
+                face_analyzer.reset_session()
+                target_selector.reset()
+                if motion_gate is not None:
+                    motion_gate.reset()
+                last_record = None
+            packet = ring.latest()
+            if packet is None or packet.seq == last_seq:
+                time.sleep(0.005)
+                continue
+            last_seq = packet.seq
+            gray = cv2.cvtColor(packet.frame, cv2.COLOR_BGR2GRAY)
+            if not ring.is_current(packet.seq):
+                continue  # The producer lapped us while we were reading.
+
+            start = time.perf_counter()
+            face_box = last_record.get("face_box") if last_record else None
+            if motion_gate is not None and not motion_gate.should_process(
+                    gray, face_box, packet.timestamp):
+                # Nothing moved in the face region: resend the labels, restamped.
+                record = dict(last_record, seq=packet.seq, timestamp=packet.timestamp, reused=True)
+            else:
+                detected_state = analyze_gray_frame(
+                    face_analyzer, emotion_analyzer, gray, target_selector, packet.timestamp)
+                record = {
+                    "seq": packet.seq,
+                    "timestamp": packet.timestamp,
+                    "face_found": detected_state is not None,
+                    "reused": False,
+                }
+                if detected_state is not None:
+                    record.update(detected_state)
+                last_record = record
+            record["latency_ms"] = (time.perf_counter() - start) * 1000
+            if motion_gate is not None:
+                record["skip_rate"] = motion_gate.skip_rate()
+            try:
+                results.put_nowait(record)
+            except queue.Full:
+                pass  # The UI is behind; it will pick up the next record.
+
+            # The UI process may change the interval between analyses at any time.
+            if interval.value > 0:
+                stop_event.wait(interval.value)
+    finally:
+        ring.close()
+
+
+class PerceptionWorker:
+    """Runs FaceAnalyzer and EmotionAnalyzer in a separate process.
+
+    Frames are published into a SharedFrameRing (attach it to a FrameBus with
+    FrameBus(ring=worker.ring)); the worker reads them in place and sends back
+    small label records, so the UI process never copies or analyzes pixels and
+    the models never compete with it for the GIL.
+    """
+
+    def __init__(self, predictor_path, frame_shape=(480, 640, 3), ring_size=4, min_interval=0.0,
+                 detector="hog", emotion_runtime="keras", target_policy="largest",
+                 motion_gate=None, pose_max_gap=1.0):
+        """
+        :param predictor_path: Path to the dlib 68-point shape predictor.
+        :param frame_shape: (h, w, c) of the shared frame slots.
+        :param ring_size: Number of shared frame slots.
+        :param min_interval: Seconds the worker waits between analyses (see set_interval).
+        :param detector: Face detector backend name (see face_detectors).
+        :param emotion_runtime: Emotion CNN runtime name (see emotion_runtime).
+        :param target_policy: Which face to analyze (see TargetSelector).
+        :param motion_gate: Optional MotionGate; a copy runs in the worker and
+            skips analysis of frames where the face region did not change.
+        :param pose_max_gap: Longest gap in seconds between analyses over which
+            head pose is still warm-started and smoothed; set it from the
+            longest analysis interval.
+        """
+        self.frame_shape = frame_shape
+        self.ring_size = ring_size
+        self.ring = SharedFrameRing(frame_shape, ring_size)
+        ctx = mp.get_context("spawn")
+        self._ctx = ctx
+        self.results = ctx.Queue(maxsize=8)
+        self.stop_event = ctx.Event()
+        self.ready_event = ctx.Event()  # Set once the models are loaded
+        self.reset_event = ctx.Event()  # Set by reset_session, cleared by the worker
+        self.interval = ctx.Value("d", min_interval, lock=False)
+        self._options = (predictor_path, detector, emotion_runtime, target_policy, motion_gate,
+                         pose_max_gap)
+        self.process = None
+
+    def _new_process(self):
+        predictor_path, detector, emotion_runtime, target_policy, motion_gate, pose_max_gap = (
+            self._options)
+        return self._ctx.Process(
+            target=_perception_loop,
+            args=(self.ring.name, self.ring.shape, self.ring_size, predictor_path,
+                  self.results, self.stop_event, self.ready_event, self.reset_event,
+                  self.interval, detector,
+                  emotion_runtime, target_policy, motion_gate, pose_max_gap),
+            daemon=True,
+        )
+
+    def start(self):
+        """Start the worker process, or a new one if it was stopped or exited.
+
+        A ring freed by stop() is recreated, so re-attach the FrameBus to
+        self.ring after restarting.
+        """
+        if self.process is not None and self.process.is_alive():
+            return
+        if self.ring.frames is None:
+            self.ring = SharedFrameRing(self.frame_shape, self.ring_size)
+        self.stop_event.clear()
+        self.ready_event.clear()
+        while self.get_result(timeout=0) is not None:
+            pass  # Records of the previous process
+        self.process = self._new_process()
+        self.process.start()
+
+    def reset_session(self):
+        """Make the worker forget the previous child before its next analysis."""
+        self.reset_event.set()
+
+    def set_interval(self, seconds):
+        """Change the wait between two analyses; applies from the next one."""
+        self.interval.value = max(0.0, float(seconds))
+
+    def wait_ready(self, timeout=None):
+        """Block until the worker has loaded its models.
+
+        The worker can be started long before frames flow, so the models load
+        while the rest of the app starts up. Returns False on timeout or if the
+        process exited first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.ready_event.wait(0.1):
+            if self.process is None or not self.process.is_alive():
+                return self.ready_event.is_set()
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return True
+
+    def get_result(self, timeout=None):
+        """Return the next result record, or None if none arrived in time."""
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        """Stop the worker process and free the shared frame ring."""
+        self.stop_event.set()
+        if self.process is not None and self.process.is_alive():
+            self.process.join(timeout=5.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        if self.ring.shm is not None and self.ring.frames is not None:
+            self.ring.close()
@@ -0,0 +1,270 @@
+import os
+
+import numpy as np
+
+from detector_model.label_codes import EMOTION_MAPPING, GAZE_MAPPING, HEAD_POSE_MAPPING
+
+# One perception reading: capture time, label codes (label_codes, -1 for
+# unknown) and the continuous signals (NaN when not measured). 24 bytes a row.
+READING_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("horizontal", "i1"),
+    ("vertical", "i1"),
+    ("gaze", "i1"),
+    ("emotion", "i1"),
+    ("emotion_conf", "<f4"),
+    ("blink_rate", "<f4"),
+    ("eye_closure", "<f4"),
+])
+
+
+def _float(value):
+    return np.nan if value is None else value
+
+
+def _weighted_mode(codes, weights, size, default):
+    valid = codes >= 0
+    if not valid.any():
+        return default
+    return int(np.argmax(np.bincount(codes[valid], weights[valid], minlength=size)))
+
+
+def _weighted_mean(values, weights):
+    valid = ~np.isnan(values)
+    total = weights[valid].sum()
+    return float(np.dot(values[valid], weights[valid]) / total) if total > 0 else None
+
+
+def aggregate_readings(rows, half_life=None, now=None):
+    """Modes and means of an array of READING_DTYPE rows, vectorized.
+
+    With half_life, each row is weighted by 0.5 ** ((now - timestamp) / half_life),
+    so recent evidence dominates; otherwise all rows weigh the same.
+    Returns a dict with the horizontal, vertical, gaze and emotion mode codes,
+    the mean confidence of the modal emotion, the mean blink rate and eye
+    closure (None if never measured) and the number of rows.
+    """
+    if half_life is not None and len(rows):
+        now = rows["timestamp"].max() if now is None else now
+        weights = np.exp2((rows["timestamp"] - now) / half_life)
+    else:
+        weights = np.ones(len(rows))
+
+    emotion = _weighted_mode(rows["emotion"], weights, len(EMOTION_MAPPING), None)
+    if emotion is None:
+        emotion_conf = 0.0
+    else:
+        same = rows["emotion"] == emotion
+        emotion_conf = _weighted_mean(rows["emotion_conf"][same].astype(np.float64), weights[same])
+    return {
+        "readings": int(len(rows)),
+        "horizontal": _weighted_mode(rows["horizontal"], weights, len(HEAD_POSE_MAPPING), HEAD_POSE_MAPPING["Front"]),
+        "vertical": _weighted_mode(rows["vertical"], weights, len(HEAD_POSE_MAPPING), HEAD_POSE_MAPPING["Front"]),
+        "gaze": _weighted_mode(rows["gaze"], weights, len(GAZE_MAPPING), GAZE_MAPPING["Looking Center"]),
+        "emotion": EMOTION_MAPPING["Neutral"] if emotion is None else emotion,
+        "emotion_conf": emotion_conf or 0.0,
+        "blink_rate": _weighted_mean(rows["blink_rate"].astype(np.float64), weights),
+        "eye_closure": _weighted_mean(rows["eye_closure"].astype(np.float64), weights),
+    }
+
+
+# With half_life, RunningAggregate moves its reference time up once the newest
+# row weighs more than 2 ** REBASE_HALF_LIVES, so the sums stay well within
+# float64 range.
+REBASE_HALF_LIVES = 32
+
+_CODE_FIELDS = (
+    ("horizontal", len(HEAD_POSE_MAPPING)),
+    ("vertical", len(HEAD_POSE_MAPPING)),
+    ("gaze", len(GAZE_MAPPING)),
+    ("emotion", len(EMOTION_MAPPING)),
+)
+_SIGNAL_FIELDS = ("blink_rate", "eye_closure")
+
+
+class RunningAggregate:
+    """Per-code counts and confidence sums of a window of rows, kept incrementally.
+
+    add() and remove() update them for one READING_DTYPE row, as it enters
+    and leaves the window, so aggregate() gives the modes and means of
+    aggregate_readings() over the window at a cost that does not depend on
+    its length. With half_life, a row weighs 2 ** ((timestamp - reference) /
+    half_life); the factor relative to aggregate_readings' weights is common
+    to all rows and cancels in the modes and means, so the sums need no
+    rescaling as time passes. Integer counts next to the weight sums make a
+    code whose rows all left weigh exactly zero.
+    """
+
+    def __init__(self, half_life=None):
+        self.half_life = half_life
+        self.clear()
+
+    def clear(self):
+        self.rows = 0
+        self.reference = None
+        self.counts = {field: np.zeros(size, np.int64) for field, size in _CODE_FIELDS}
+        self.weights = {field: np.zeros(size) for field, size in _CODE_FIELDS}
+        size = len(EMOTION_MAPPING)
+        # Confidence of each emotion's readings, where measured.
+        self.conf_counts = np.zeros(size, np.int64)
+        self.conf_weights = np.zeros(size)
+        self.conf_sums = np.zeros(size)
+        self.signal_counts = dict.fromkeys(_SIGNAL_FIELDS, 0)
+        self.signal_weights = dict.fromkeys(_SIGNAL_FIELDS, 0.0)
+        self.signal_sums = dict.fromkeys(_SIGNAL_FIELDS, 0.0)
+
+    def __len__(self):
+        return self.rows
+
+    def _weight(self, timestamp):
+        if self.half_life is None:
+            return 1.0
+        if self.reference is None:
+            self.reference = timestamp
+        elif timestamp - self.reference > REBASE_HALF_LIVES * self.half_life:
+            self._rebase(timestamp)
+        return float(np.exp2((timestamp - self.reference) / self.half_life))
+
+    def _rebase(self, reference):
+        scale = float(np.exp2((self.reference - reference) / self.half_life))
+        for weights in self.weights.values():
+            weights *= scale
+        self.conf_weights *= scale
+        self.conf_sums *= scale
+        for field in _SIGNAL_FIELDS:
+            self.signal_weights[field] *= scale
+            self.signal_sums[field] *= scale
+        self.reference = reference
+
+    def add(self, row):
+        """Count one row entering the window."""
+        self._update(row, 1)
+
+    def remove(self, row):
+        """Uncount a row added before, as it leaves the window."""
+        self._update(row, -1)
+
+    def _update(self, row, sign):
+        weight = sign * self._weight(float(row["timestamp"]))
+        self.rows += sign
+        for field, _ in _CODE_FIELDS:
+            code = int(row[field])
+            if code < 0:
+                continue
+            counts, weights = self.counts[field], self.weights[field]
+            counts[code] += sign
+            # Restart from zero so float error does not build up.
+            weights[code] = weights[code] + weight if counts[code] else 0.0
+        emotion, conf = int(row["emotion"]), float(row["emotion_conf"])
+        if emotion >= 0 and not np.isnan(conf):
+            self.conf_counts[emotion] += sign
+            if self.conf_counts[emotion]:
+                self.conf_weights[emotion] += weight
+                self.conf_sums[emotion] += weight * conf
+            else:
+                self.conf_weights[emotion] = self.conf_sums[emotion] = 0.0
+        for field in _SIGNAL_FIELDS:
+            value = float(row[field])
+            if np.isnan(value):
+                continue
+            self.signal_counts[field] += sign
+            if self.signal_counts[field]:
+                self.signal_weights[field] += weight
+                self.signal_sums[field] += weight * value
+            else:
+                self.signal_weights[field] = self.signal_sums[field] = 0.0
+
+    def _mode(self, field, default):
+        if not self.counts[field].any():
+            return default
+        return int(np.argmax(self.weights[field]))
+
+    def _mean(self, field):
+        if not self.signal_counts[field]:
+            return None
+        return self.signal_sums[field] / self.signal_weights[field]
+
+    def aggregate(self):
+        """The aggregate_readings() dict of the rows in the window."""
+        emotion = self._mode("emotion", None)
+        emotion_conf = 0.0
+        if emotion is not None and self.conf_counts[emotion]:
+            emotion_conf = float(self.conf_sums[emotion] / self.conf_weights[emotion])
+        return {
+            "readings": self.rows,
+            "horizontal": self._mode("horizontal", HEAD_POSE_MAPPING["Front"]),
+            "vertical": self._mode("vertical", HEAD_POSE_MAPPING["Front"]),
+            "gaze": self._mode("gaze", GAZE_MAPPING["Looking Center"]),
+            "emotion": EMOTION_MAPPING["Neutral"] if emotion is None else emotion,
+            "emotion_conf": emotion_conf or 0.0,
+            "blink_rate": self._mean("blink_rate"),
+            "eye_closure": self._mean("eye_closure"),
+        }
+
+
+class ReadingRing:
+    """Preallocated ring of READING_DTYPE rows.
+
+    Memory is fixed at capacity rows (about 200 KB for the default, over an
+    hour of readings at 2 Hz); once full, the oldest rows are overwritten.
+    """
+
+    def __init__(self, capacity=8192):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, READING_DTYPE)
+        self.appended = 0
+
+    def __len__(self):
+        return min(self.appended, self.capacity)
+
+    def append(self, timestamp, horizontal, vertical, gaze, emotion, emotion_conf=None,
+               blink_rate=None, eye_closure=None):
+        self.data[self.appended % self.capacity] = (
+            timestamp, horizontal, vertical, gaze, emotion, _float(emotion_conf),
+            _float(blink_rate), _float(eye_closure))
+        self.appended += 1
+
+    def clear(self):
+        self.appended = 0
+
+    def row(self, index):
+        """The row appended index-th (0 = first ever); it must still be stored."""
+        return self.data[index % self.capacity]
+
+    def rows(self, last=None):
+        """All stored rows, or the last `last`, oldest first (a view unless they wrap)."""
+        count = len(self) if last is None else max(0, min(last, len(self)))
+        end = self.appended % self.capacity or (self.capacity if self.appended else 0)
+        if count <= end:
+            return self.data[end - count:end]
+        return np.concatenate((self.data[self.capacity - (count - end):], self.data[:end]))
+
+    def latest_timestamp(self):
+        """Capture time of the newest row, or None if the ring is empty."""
+        if not self.appended:
+            return None
+        return float(self.data[(self.appended - 1) % self.capacity]["timestamp"])
+
+    def recent(self, last=None, since=None):
+        """The last `last` rows and/or the rows captured at or after `since`."""
+        rows = self.rows(last)
+        if since is not None:
+            # Rows arrive in capture order, so the cut is a binary search.
+            rows = rows[np.searchsorted(rows["timestamp"], since, side="left"):]
+        return rows
+
+    def aggregate(self, last=None, since=None, half_life=None, now=None):
+        return aggregate_readings(self.recent(last, since), half_life, now)
+
+    def dump(self, path):
+        """Write all rows, oldest first, to a .npy file in one write."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.save(path, self.rows())
+        return path
+
+    @staticmethod
+    def load(path):
+        """Rows written by dump(), as a READING_DTYPE array."""
+        return np.load(path)
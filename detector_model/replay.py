@@ -0,0 +1,143 @@
+"""Replay a recorded clip through VideoProcessor and log one JSON record per frame.
+
+Runs as fast as the pipeline allows, with no camera needed:
+
+    python -m detector_model.replay session.mp4 --out session.jsonl
+    python -m detector_model.replay frames_dir/ --out frames.jsonl --tracking
+    python -m detector_model.replay session.mp4 --out batched.jsonl --emotion-batch 8
+"""
+import argparse
+import json
+import time
+
+import cv2
+
+from detector_model.emotion_batcher import EmotionBatcher
+from detector_model.emotion_runtime import EMOTION_RUNTIMES
+from detector_model.face_detectors import DETECTOR_BACKENDS
+from detector_model.head_gaze_emotion_detector import VideoProcessor
+from detector_model.motion_gate import MotionGate
+from detector_model.state_updater import StateUpdater
+from detector_model.target_selector import TARGET_POLICIES
+
+DEFAULT_PREDICTOR_PATH = "detector_model/assets/shape_predictor_68_face_landmarks.dat"
+
+
+def frame_record(video_processor, index, frame_time_ms):
+    """Build the JSONL record for the frame video_processor just processed."""
+    target = video_processor.target_face
+    blink = video_processor.face_analyzer.blink
+    return {
+        "frame": index,
+        "time_ms": frame_time_ms,
+        "faces": video_processor.face_count,
+        "target": None if target is None else [target.left(), target.top(), target.right(), target.bottom()],
+        "horizontal": video_processor.horizontal_label,
+        "vertical": video_processor.vertical_label,
+        "yaw": None if video_processor.yaw is None else round(video_processor.yaw, 3),
+        "pitch": None if video_processor.pitch is None else round(video_processor.pitch, 3),
+        "gaze": video_processor.gaze_direction,
+        "ear": None if blink.ear is None else round(blink.ear, 4),
+        "blink_threshold": round(blink.threshold, 4),
+        "emotion": video_processor.last_emotion,
+        "score": video_processor.last_score,
+        "reused": video_processor.labels_reused,
+        "timings_ms": {stage: round(ms, 3) for stage, ms in video_processor.timings.items()},
+    }
+
+
+def replay(source, out_path, predictor_path=DEFAULT_PREDICTOR_PATH, tracking=False,
+           emotion_mode="face", emotion_interval=15, max_frames=None, detector="hog",
+           emotion_runtime="keras", target_policy="largest", motion_gate=None,
+           emotion_batch=None):
+    """Process every frame of source and write per-frame records to out_path.
+
+    Returns a summary dict with the frame count, wall time and achieved fps.
+    With emotion_batch, every face crop goes through an EmotionBatcher of that
+    size (into a StateUpdater) instead of one crop every emotion_interval frames;
+    a record's emotion is then the last classified one.
+    A MotionGate's max_reuse counts wall-clock time, which passes faster than
+    video time when replaying.
+    """
+    video_processor = VideoProcessor(
+        predictor_path, tracking=tracking, emotion_mode=emotion_mode, source=source,
+        detector=detector, emotion_runtime=emotion_runtime, target_policy=target_policy,
+        motion_gate=motion_gate)
+    video_processor.emotion_update_interval = emotion_interval
+    if emotion_batch:
+        video_processor.emotion_batcher = EmotionBatcher(
+            video_processor.emotion_analyzer, StateUpdater(), batch_size=emotion_batch)
+    if not video_processor.cap.isOpened():
+        raise FileNotFoundError(f"Cannot open replay source: {source}")
+
+    frames = 0
+    start = time.perf_counter()
+    try:
+        with open(out_path, "w", encoding="utf-8") as out:
+            while max_frames is None or frames < max_frames:
+                # Position of the frame about to be read (0 for image directories).
+                frame_time_ms = video_processor.cap.get(cv2.CAP_PROP_POS_MSEC)
+                if video_processor.process_frame() is None:
+                    break
+                out.write(json.dumps(frame_record(video_processor, frames, frame_time_ms)) + "\n")
+                frames += 1
+        if video_processor.emotion_batcher is not None:
+            video_processor.emotion_batcher.flush()
+    finally:
+        # Not VideoProcessor.release(): destroyAllWindows fails on headless OpenCV builds.
+        video_processor.cap.release()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "source": str(source),
+        "detector": detector,
+        "emotion_runtime": emotion_runtime,
+        "target_policy": target_policy,
+        "frames": frames,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    if motion_gate is not None:
+        summary["motion_gate"] = motion_gate.stats()
+    if video_processor.emotion_batcher is not None:
+        summary["emotion_batcher"] = video_processor.emotion_batcher.stats()
+    tracker = video_processor.face_analyzer.tracker
+    if tracker is not None:
+        summary["tracker"] = tracker.stats()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a video file or image directory through VideoProcessor.")
+    parser.add_argument("source", help="Video file or directory of images.")
+    parser.add_argument("--out", default="replay.jsonl", help="Per-frame JSONL output path.")
+    parser.add_argument("--predictor", default=DEFAULT_PREDICTOR_PATH, help="dlib 68-point predictor file.")
+    parser.add_argument("--tracking", action="store_true", help="Use detect-then-track face location.")
+    parser.add_argument("--detector", default="hog", choices=sorted(DETECTOR_BACKENDS),
+                        help="Face detector backend.")
+    parser.add_argument("--emotion-mode", default="face", choices=("frame", "face"))
+    parser.add_argument("--emotion-runtime", default="keras", choices=sorted(EMOTION_RUNTIMES),
+                        help="What runs the emotion CNN in face mode.")
+    parser.add_argument("--target", default="largest", choices=TARGET_POLICIES,
+                        help="Which face is analyzed when several are in frame.")
+    parser.add_argument("--motion-threshold", type=float, default=None,
+                        help="Skip frames whose face region changed less than this (0-255).")
+    parser.add_argument("--max-reuse", type=float, default=2.0,
+                        help="Longest time in seconds the motion gate may reuse labels.")
+    parser.add_argument("--emotion-interval", type=int, default=15, help="Run emotion every N frames.")
+    parser.add_argument("--emotion-batch", type=int, metavar="N", default=None,
+                        help="Classify every face crop in EmotionBatcher batches of N.")
+    parser.add_argument("--max-frames", type=int, default=None)
+    args = parser.parse_args()
+
+    motion_gate = None
+    if args.motion_threshold is not None:
+        motion_gate = MotionGate(args.motion_threshold, max_reuse=args.max_reuse)
+    summary = replay(args.source, args.out, args.predictor, args.tracking,
+                     args.emotion_mode, args.emotion_interval, args.max_frames, args.detector,
+                     args.emotion_runtime, args.target, motion_gate, args.emotion_batch)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
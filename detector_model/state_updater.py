@@ -1,106 +1,296 @@
+import threading
 import time
-from collections import deque, Counter
-import statistics
+from collections import namedtuple
+from detector_model.label_codes import (
+    EMOTION_MAPPING, GAZE_MAPPING, HEAD_POSE_MAPPING, encode_emotion, encode_gaze,
+    encode_head_pose)
+from detector_model.reading_ring import ReadingRing, RunningAggregate, aggregate_readings
 from rl_framework.state import Mode, EngagementLevel, EmotionalState, ResponseQuality, PromptNecessity, ResponseLength, VocabularyUsage, State
 
-HEAD_POSE_MAPPING = {
-    "Front": 0,
-    "Left": 1,
-    "Right": 2,
-    "Up": 3,
-    "Down": 4
-}
-GAZE_MAPPING = {
-    "Looking left": 1,
-    "Looking right": 2,
-    "Looking center": 0,
-    "Blinking": 3
-}
-EMOTION_MAPPING = {
-    "Angry": 0,
-    "Disgust": 1,
-    "Fear": 2,
-    "Happy": 3,
-    "Neutral": 4,
-    "Sad": 5,
-    "Surprise": 6
-}
+# Share of recent samples with closed eyes (BlinkDetector.closure_fraction)
+# above which the child is treated as drowsy, i.e. low engagement.
+DROWSY_EYE_CLOSURE = 0.3
+
+# With half_life, readings older than this many half-lives (weight below 0.1%)
+# are left out of the aggregate.
+DECAY_HORIZON = 10
+
+# Sent to StateUpdater subscribers when the discretized State changes. source
+# is "perception" (a reading), "story" (update_state_from_story) or "update".
+StateChange = namedtuple("StateChange", ["previous", "current", "timestamp", "source"])
 
 
 class StateUpdater:
-    def __init__(self, update_interval=60):
-        # Buffers to store sensor outputs during the window
-        self.head_horizontal_buffer = deque(maxlen=100)
-        self.head_vertical_buffer = deque(maxlen=100)
-        self.gaze_buffer = deque(maxlen=100)
-        self.emotion_buffer = deque(maxlen=100)
-        self.emotion_conf_buffer = deque(maxlen=100)
+    def __init__(self, update_interval=60, window_size=100, update_on_reading=False,
+                 window_seconds=None, half_life=None, session_capacity=8192, debounce=0.0,
+                 min_dwell=0.0):
+        """
+        :param update_interval: Seconds between maybe_update() state changes.
+        :param window_size: Readings aggregated (count-based windows).
+        :param update_on_reading: Recompute the state on every add_reading()
+            instead of only in update_state()/maybe_update().
+        :param window_seconds: Aggregate the readings of the last window_seconds
+            (by capture time) instead of the last window_size readings.
+        :param half_life: Weigh readings by exponential decay with this half-life
+            in seconds instead of using a window; takes precedence.
+        :param session_capacity: Readings kept in the ring; the windows above are
+            cut from it, and dump_session() writes all of it.
+        :param debounce: Seconds a new perception State must persist before it
+            replaces the current one.
+        :param min_dwell: Seconds a State is kept at least before perception
+            may replace it.
+        """
+        self.window_size = min(window_size, session_capacity)
+        self.window_seconds = window_seconds
+        self.half_life = half_life
+        # Every reading of the session, as codes. The window at its end is
+        # also kept as running counts and sums, updated as readings enter and
+        # leave it, so the State costs the same whatever the window length.
+        self.readings = ReadingRing(session_capacity)
+        self._running = RunningAggregate(half_life)
+        self._window_start = 0  # Count-based windows start at this reading
+        self._oldest = 0  # Index (in appended order) of the oldest reading in _running
+        self._window_now = None  # Time the time-based windows were last cut at
 
         self.last_update_time = time.time()
         self.update_interval = update_interval  # seconds
+        self.update_on_reading = update_on_reading
 
         self.current_state = None
-
-    def add_reading(self, horizontal, vertical, gaze, emotion, emotion_conf):
+        self.debounce = debounce
+        self.min_dwell = min_dwell
+        self._subscribers = []
+        self._pending_state = None  # Candidate waiting out the debounce
+        self._pending_since = None
+        self._last_change = None
+        self.state_changes = 0
+        # Readings may arrive from the perception and emotion batcher threads.
+        self._lock = threading.RLock()
+
+    def add_reading(self, horizontal, vertical, gaze, emotion, emotion_conf, timestamp=None,
+                    blink_rate=None, eye_closure=None):
+        """Store one sensor reading; timestamp defaults to now (capture time if batched).
+
+        The labels are encoded to label_codes here; blink_rate and eye_closure
+        come from the BlinkDetector, when available.
+        """
         try:
-            self.head_horizontal_buffer.append(horizontal)
-            self.head_vertical_buffer.append(vertical)
-            self.gaze_buffer.append(gaze)
-            self.emotion_buffer.append(emotion)
-            self.emotion_conf_buffer.append(emotion_conf)
+            codes = (encode_head_pose(horizontal), encode_head_pose(vertical),
+                     encode_gaze(gaze), encode_emotion(emotion))
         except Exception as e:
             print("Error in add_reading:", e)
+            return
+        self.add_codes(*codes, emotion_conf, timestamp, blink_rate, eye_closure)
 
-    def aggregate_head_pose(self):
-        try:
-            horizontal_values = [HEAD_POSE_MAPPING[pose]
-                                 for pose in self.head_horizontal_buffer if pose in HEAD_POSE_MAPPING]
-            vertical_values = [HEAD_POSE_MAPPING[pose]
-                               for pose in self.head_vertical_buffer if pose in HEAD_POSE_MAPPING]
-            horizontal_mode = Counter(horizontal_values).most_common(
-                1)[0][0] if horizontal_values else HEAD_POSE_MAPPING["Front"]
-            vertical_mode = Counter(vertical_values).most_common(
-                1)[0][0] if vertical_values else HEAD_POSE_MAPPING["Front"]
-            return horizontal_mode, vertical_mode
-        except Exception as e:
-            print("Error in aggregate_head_pose:", e)
-            return HEAD_POSE_MAPPING["Front"], HEAD_POSE_MAPPING["Front"]
+    def add_codes(self, horizontal, vertical, gaze, emotion, emotion_conf, timestamp=None,
+                  blink_rate=None, eye_closure=None):
+        """Store one reading whose labels are already label_codes (e.g. a PerceptionSnapshot).
 
-    def aggregate_gaze(self):
-        try:
-            if self.gaze_buffer:
-                gaze_mode = Counter(self.gaze_buffer).most_common(1)[0][0]
-                return GAZE_MAPPING.get(gaze_mode, 0)
+        With subscribers (or update_on_reading) the State is recomputed right
+        away, and subscribers are called if it changed.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            try:
+                if self.readings.appended - self._oldest >= self.readings.capacity:
+                    self._evict()  # About to be overwritten
+                # Unknown labels keep their window slot but are not counted.
+                self.readings.append(timestamp, horizontal, vertical, gaze, emotion, emotion_conf,
+                                     blink_rate, eye_closure)
+            except Exception as e:
+                print("Error in add_codes:", e)
+                return
+            self._running.add(self.readings.row(self.readings.appended - 1))
+            if self.half_life is None and self.window_seconds is None:
+                while self.readings.appended - self._oldest > self.window_size:
+                    self._evict()
             else:
-                return 0
-        except Exception as e:
-            print("Error in aggregate_gaze:", e)
-            return 0
+                self._advance(timestamp)
+            change = None
+            if self.update_on_reading or self._subscribers:
+                change = self._consider(self._merge(self.compute_state(timestamp)), timestamp)
+        if change is not None:
+            self._notify(change)
 
-    def aggregate_emotion(self):
-        try:
-            if not self.emotion_buffer:
-                return 4, 0.0  # Neutral and 0.0 confidence
-            counts = Counter(self.emotion_buffer)
-            most_common_emotion, _ = counts.most_common(1)[0]
-            # Filter out any None values from confidence
-            confs = [conf for emo, conf in zip(
-                self.emotion_buffer, self.emotion_conf_buffer) if emo == most_common_emotion and conf is not None]
-            avg_conf = statistics.mean(confs) if confs else 0.0
-            return EMOTION_MAPPING.get(most_common_emotion, 4), avg_conf
-        except Exception as e:
-            print("Error in aggregate_emotion:", e)
-            return 4, 0.0
+    def subscribe(self, callback):
+        """Call callback(StateChange) whenever the State changes; returns callback.
+
+        Callbacks run on the thread that added the reading, so keep them short.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
 
-    def update_state(self):
+    def _merge(self, perceived):
+        """Fold a perception State into the current one.
+
+        Perception measures engagement and emotion only; the mode and the
+        response fields (quality, length, vocabulary, WH-question) stay those
+        set by update_state_from_story from the child's last answer.
+        """
+        current = self.current_state
+        if current is None:
+            return perceived
+        return State(current.mode, perceived.engagement_level, perceived.emotional_state,
+                     current.response_quality, current.prompt_necessity,
+                     current.response_length, current.vocabulary_usage,
+                     current.wh_question_detected)
+
+    def _consider(self, candidate, now):
+        """Debounce and dwell for a perception State; returns a StateChange or None."""
+        if candidate == self.current_state:
+            self._pending_state = None
+            return None
+        if candidate != self._pending_state:
+            self._pending_state = candidate
+            self._pending_since = now
+        if now - self._pending_since < self.debounce:
+            return None
+        if self._last_change is not None and now - self._last_change < self.min_dwell:
+            return None
+        return self._apply(candidate, now, "perception")
+
+    def _apply(self, state, now, source):
+        change = StateChange(self.current_state, state, now, source)
+        self.current_state = state
+        self._pending_state = None
+        self._last_change = now
+        self.state_changes += 1
+        return change
+
+    def _publish(self, state, source, now=None):
+        """Set the State directly (no debounce); notify subscribers if it changed."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if state == self.current_state:
+                return
+            change = self._apply(state, now, source)
+        self._notify(change)
+
+    def _notify(self, change):
+        print("State changed:", change.current, f"({change.source})")
+        for callback in list(self._subscribers):
+            try:
+                callback(change)
+            except Exception as e:
+                print("Error in state change subscriber:", e)
+
+    def _evict(self):
+        self._running.remove(self.readings.row(self._oldest))
+        self._oldest += 1
+
+    def _span(self):
+        return self.window_seconds if self.half_life is None else self.half_life * DECAY_HORIZON
+
+    def _advance(self, now):
+        """Evict the readings a time-based window ending at now no longer covers."""
+        if self._window_now is None or now > self._window_now:
+            self._window_now = now
+        start = self._window_now - self._span()
+        while self._oldest < self.readings.appended and self.readings.row(self._oldest)["timestamp"] < start:
+            self._evict()
+
+    def _restart_window(self):
+        self._running.clear()
+        self._oldest = self._window_start = self.readings.appended
+        self._window_now = None
+
+    def reset(self):
+        """Forget the readings and the State, e.g. when a new child's session starts.
+
+        Subscribers stay registered.
+        """
+        with self._lock:
+            self.readings.clear()
+            self._restart_window()
+            self.current_state = None
+            self._pending_state = None
+            self._pending_since = None
+            self._last_change = None
+            self.last_update_time = time.time()
+
+    def window(self, now=None):
+        """The readings the State is aggregated from, as READING_DTYPE rows.
+
+        The last window_size readings (since the last maybe_update), those of
+        the last window_seconds, or with half_life those of the last
+        DECAY_HORIZON half-lives. now defaults to the newest reading's time.
+        """
+        with self._lock:
+            if self.half_life is None and self.window_seconds is None:
+                return self.readings.recent(
+                    last=min(self.window_size, self.readings.appended - self._window_start))
+            if now is None:
+                now = self.readings.latest_timestamp()
+                if now is None:
+                    return self.readings.recent(last=0)
+            return self.readings.recent(since=now - self._span())
+
+    def aggregate(self, now=None):
+        """Modes and means of window(now) (see reading_ring.aggregate_readings).
+
+        They come from the running counts; only a time-based window ending
+        before the latest one cut (now in the past) is aggregated from the ring.
+        """
+        with self._lock:
+            if now is None:
+                now = self.readings.latest_timestamp()
+            if now is None or (self.half_life is None and self.window_seconds is None):
+                return self._running.aggregate()
+            if self._window_now is not None and now < self._window_now:
+                return aggregate_readings(self.window(now), self.half_life, now)
+            self._advance(now)
+            return self._running.aggregate()
+
+    def aggregate_head_pose(self, now=None):
+        aggregate = self.aggregate(now)
+        return aggregate["horizontal"], aggregate["vertical"]
+
+    def aggregate_gaze(self, now=None):
+        return self.aggregate(now)["gaze"]
+
+    def aggregate_emotion(self, now=None):
+        """Modal emotion and the mean confidence of its readings (Neutral, 0.0 without any)."""
+        aggregate = self.aggregate(now)
+        return aggregate["emotion"], aggregate["emotion_conf"]
+
+    def aggregate_blinks(self, now=None):
+        """Mean blink rate and eye-closure share over the window (None if not measured)."""
+        aggregate = self.aggregate(now)
+        return aggregate["blink_rate"], aggregate["eye_closure"]
+
+    def update_state(self, now=None):
+        """Aggregate the windows into a new State and make it the current one."""
+        now = time.time() if now is None else now
+        with self._lock:
+            new_state = self.compute_state(now)
+        print("Updated State:", new_state)
+        self._publish(new_state, "update", now)
+        return new_state
+
+    def compute_state(self, now=None):
+        """Aggregate the windows into a State without changing the current one.
+
+        now (defaults to time.time()) ages the time-based and decayed windows,
+        so readings that stopped arriving also stop counting.
+        """
         try:
-            horizontal, vertical = self.aggregate_head_pose()
-            gaze = self.aggregate_gaze()
-            emotion_idx, emotion_conf = self.aggregate_emotion()
+            now = time.time() if now is None else now
+            aggregate = self.aggregate(now)
+            horizontal, vertical = aggregate["horizontal"], aggregate["vertical"]
+            gaze = aggregate["gaze"]
+            emotion_idx, emotion_conf = aggregate["emotion"], aggregate["emotion_conf"]
+            eye_closure = aggregate["eye_closure"]
         except Exception as e:
             print("Error during state aggregation:", e)
             horizontal, vertical, gaze, emotion_idx, emotion_conf = HEAD_POSE_MAPPING[
                 "Front"], HEAD_POSE_MAPPING["Front"], 0, 4, 0.0
+            eye_closure = None
 
         try:
             emotion_list = list(EMOTION_MAPPING.keys())
@@ -113,7 +303,9 @@ class StateUpdater:
             emotional_state = EmotionalState.NEUTRAL
 
         try:
-            if emotion_conf > 0.6:
+            if eye_closure is not None and eye_closure > DROWSY_EYE_CLOSURE:
+                engagement = EngagementLevel.LOW
+            elif emotion_conf > 0.6:
                 engagement = EngagementLevel.HIGH
             elif horizontal in [HEAD_POSE_MAPPING.get("Left"), HEAD_POSE_MAPPING.get("Right"), HEAD_POSE_MAPPING.get("Down")]:
                 engagement = EngagementLevel.LOW
@@ -125,7 +317,7 @@ class StateUpdater:
 
         try:
             mode = Mode.INTERACTION if gaze != GAZE_MAPPING.get(
-                "Looking center", 0) else Mode.NARRATION
+                "Looking Center", 0) else Mode.NARRATION
         except Exception as e:
             print("Error determining mode:", e)
             mode = Mode.NARRATION
@@ -146,8 +338,6 @@ class StateUpdater:
             new_state = State(
                 Mode.NARRATION, EngagementLevel.MEDIUM, EmotionalState.NEUTRAL)
 
-        print("Updated State:", new_state)
-        self.current_state = new_state
         return new_state
 
 # ----------------------------------------------------------
@@ -220,7 +410,7 @@ class StateUpdater:
                               wh_question_detected)  # Include WH-question detection
         else:
             new_state = State(mode, engagement, emotional_state)
-        self.current_state = new_state
+        self._publish(new_state, "story")
         return new_state
 
 # ----------------------------------------------------------
@@ -229,16 +419,27 @@ class StateUpdater:
     def maybe_update(self):
         current_time = time.time()
         if current_time - self.last_update_time >= self.update_interval:
-            new_state = self.update_state()
+            new_state = self.update_state(current_time)
             self.last_update_time = current_time
-            self.head_horizontal_buffer.clear()
-            self.head_vertical_buffer.clear()
-            self.gaze_buffer.clear()
-            self.emotion_buffer.clear()
-            self.emotion_conf_buffer.clear()
+            # Count-based windows restart each interval; time-based and decayed
+            # ones age readings out themselves and keep their history.
+            if self.window_seconds is None and self.half_life is None:
+                with self._lock:
+                    self._restart_window()
             return new_state
         return None
 
+    def summary(self, last=None, since=None, half_life=None, now=None):
+        """Aggregate any slice of the session's readings, e.g. for a report.
+
+        The live State uses aggregate(), i.e. the configured window.
+        """
+        return self.readings.aggregate(last, since, half_life, now)
+
+    def dump_session(self, path):
+        """Write the session's readings to a .npy file; returns the path."""
+        return self.readings.dump(path)
+
     def get_current_state(self):
         print("Current State:", self.current_state)
         return self.current_state
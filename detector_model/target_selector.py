@@ -0,0 +1,108 @@
+import time
+
+TARGET_POLICIES = ("largest", "central", "tracked")
+
+
+def _box(face):
+    return face.left(), face.top(), face.right(), face.bottom()
+
+
+def _area(box):
+    left, top, right, bottom = box
+    return max(0, right - left) * max(0, bottom - top)
+
+
+def _iou(a, b):
+    inter = _area((max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])))
+    union = _area(a) + _area(b) - inter
+    return inter / union if union else 0.0
+
+
+class TargetSelector:
+    """Picks the one face per frame that belongs to the child being taught.
+
+    Policies:
+    - "largest": the biggest box, i.e. the face closest to the robot.
+    - "central": the box whose center is nearest the frame center.
+    - "tracked": the largest face of the first frame, then whichever box
+      overlaps the previous target most. Other people entering the frame are
+      ignored; a face alone in the frame is always taken (the child moved
+      between two samples), and after lost_seconds without a match the
+      largest face is taken again.
+    """
+
+    def __init__(self, policy="largest", min_iou=0.2, lost_seconds=3.0):
+        """
+        :param policy: "largest", "central" or "tracked".
+        :param min_iou: Overlap with the previous target a box needs to keep the identity.
+        :param lost_seconds: Seconds without a match before "tracked" picks a new
+            target. Time, not frames, so it holds at any analysis rate.
+        """
+        if policy not in TARGET_POLICIES:
+            raise ValueError(f"policy must be one of {TARGET_POLICIES}.")
+        self.policy = policy
+        self.min_iou = min_iou
+        self.lost_seconds = lost_seconds
+        self.target_box = None
+        self.lost_since = None
+        self.acquisitions = 0
+
+    def reset(self):
+        """Forget the tracked target, e.g. at the start of a new session."""
+        self.target_box = None
+        self.lost_since = None
+
+    def select(self, faces, frame_shape, timestamp=None):
+        """Return the target face among faces (dlib rectangles), or None.
+
+        timestamp is the frame's capture time (defaults to now).
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        if len(faces) == 0:
+            self._mark_lost(timestamp)
+            return None
+        if len(faces) == 1:
+            if self.policy == "tracked":
+                self._acquire(faces[0])
+            return faces[0]
+
+        if self.policy == "largest":
+            return max(faces, key=lambda face: _area(_box(face)))
+        if self.policy == "central":
+            height, width = frame_shape[:2]
+            return min(faces, key=lambda face: self._center_distance(face, width, height))
+        return self._select_tracked(faces, timestamp)
+
+    @staticmethod
+    def _center_distance(face, width, height):
+        left, top, right, bottom = _box(face)
+        return ((left + right) / 2 - width / 2) ** 2 + ((top + bottom) / 2 - height / 2) ** 2
+
+    def _select_tracked(self, faces, timestamp):
+        if self.target_box is not None:
+            best = max(faces, key=lambda face: _iou(_box(face), self.target_box))
+            if _iou(_box(best), self.target_box) >= self.min_iou:
+                self.target_box = _box(best)
+                self.lost_since = None
+                return best
+            self._mark_lost(timestamp)
+            if self.target_box is not None:
+                return None  # Someone else is in frame; wait for the child.
+
+        best = max(faces, key=lambda face: _area(_box(face)))
+        self._acquire(best)
+        return best
+
+    def _acquire(self, face):
+        if self.target_box is None or _iou(_box(face), self.target_box) < self.min_iou:
+            self.acquisitions += 1
+        self.target_box = _box(face)
+        self.lost_since = None
+
+    def _mark_lost(self, timestamp):
+        if self.target_box is None:
+            return
+        if self.lost_since is None:
+            self.lost_since = timestamp
+        if timestamp - self.lost_since >= self.lost_seconds:
+            self.reset()
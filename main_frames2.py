@@ -1,3 +1,6 @@
+import time
+STARTED_AT = time.perf_counter()
+
 from ui_assets.flet_frames.flet_app import MyApp
 import flet as ft
 import asyncio
@@ -8,8 +11,11 @@ def main(page: ft.Page):
     page.window_width = 900
     page.window_height = 500
     page.padding = 0
-    app = MyApp(page)
+    app = MyApp(page, started_at=STARTED_AT)
     app.event_loop = loop
 
 
-ft.app(target=main)
+# The perception worker is a spawned process that re-imports this script;
+# only the launching process may start the app.
+if __name__ == "__main__":
+    ft.app(target=main)
@@ -0,0 +1,101 @@
+import time
+
+import numpy as np
+
+from . import state_codec
+from .environment import Environment
+from .q_learning import QLearning
+from .trainer import Trainer
+
+
+class BatchTrainer(Trainer):
+    def __init__(self, q_learning: QLearning, environment: Environment, num_episodes: int = 1000,
+                 steps_per_episode: int = 10, batch_size: int = 1000, seed=None):
+        """
+        Trainer that steps batch_size independent episodes at once as arrays of state indices.
+
+        Follows Trainer.train: random initial states, epsilon-greedy actions,
+        reward of the next state, Q-learning updates. evaluate() is inherited.
+        :param batch_size: Episodes simulated in parallel.
+        :param seed: Seed of the NumPy generator, for reproducible runs.
+        """
+        super().__init__(q_learning, environment, num_episodes, steps_per_episode)
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+        self.compiled = environment.compiled
+
+    def initial_states(self, n: int) -> np.ndarray:
+        """
+        Batched _get_random_initial_state: either mode, uniform fields, no WH-question.
+        """
+        narration = self.rng.random(n) < 0.5
+        interaction = self._uniform_digits(n, state_codec.INTERACTION_RADICES)
+        interaction[-1] = np.zeros(n, dtype=np.int64)
+        return np.where(narration,
+                        self.rng.integers(state_codec.N_NARRATION, size=n),
+                        state_codec.INTERACTION_OFFSET + state_codec.from_digits(interaction, state_codec.INTERACTION_RADICES))
+
+    def transition(self, states: np.ndarray, actions: np.ndarray) -> np.ndarray:
+        """
+        Batched Environment.transition on state and action indices, sampled from the compiled kernels.
+        """
+        return self.compiled.sample(states, actions, self.rng)
+
+    def choose_actions(self, states: np.ndarray) -> np.ndarray:
+        """
+        Batched epsilon-greedy choice; ties between best actions are broken at random.
+        """
+        q_values = self.q_learning.q_table[states]
+        is_best = q_values == q_values.max(axis=1, keepdims=True)
+        greedy = np.argmax(is_best * self.rng.random(q_values.shape), axis=1)
+        explore = self.rng.random(len(states)) < self.q_learning.epsilon
+        return np.where(explore, self.rng.integers(q_values.shape[1], size=len(states)), greedy)
+
+    def update(self, states, actions, rewards, next_states):
+        """
+        Q-learning update for a batch of transitions.
+
+        TD errors of repeated (state, action) pairs are gathered with np.add.at,
+        and each pair moves toward its mean target by 1 - (1 - alpha) ** count:
+        what count sequential updates toward one target would do. Summing the
+        raw errors instead would step by count * alpha, which overshoots for
+        the 210 narration pairs that every batch hits many times.
+        """
+        q_table = self.q_learning.q_table
+        targets = rewards + self.q_learning.gamma * q_table[next_states].max(axis=1)
+        td_sums = np.zeros(q_table.shape, dtype=np.float64)
+        counts = np.zeros(q_table.shape, dtype=np.int64)
+        np.add.at(td_sums, (states, actions), targets - q_table[states, actions])
+        np.add.at(counts, (states, actions), 1)
+
+        seen = counts > 0
+        step = 1.0 - (1.0 - self.q_learning.alpha) ** counts[seen]
+        q_table[seen] += (step * td_sums[seen] / counts[seen]).astype(q_table.dtype)
+
+    def train(self):
+        """
+        Runs num_episodes episodes, batch_size at a time, and reports the throughput.
+        """
+        rewards = self.compiled.rewards
+        start = time.perf_counter()
+        done = 0
+        while done < self.num_episodes:
+            n = min(self.batch_size, self.num_episodes - done)
+            states = self.initial_states(n)
+            for _ in range(self.steps_per_episode):
+                actions = self.choose_actions(states)
+                next_states = self.transition(states, actions)
+                self.update(states, actions, rewards[next_states, actions], next_states)
+                states = next_states
+            previous, done = done, done + n
+            if done // 10000 > previous // 10000 or done == self.num_episodes:
+                print(f"Episode {done}/{self.num_episodes} completed.")
+
+        elapsed = time.perf_counter() - start
+        steps = self.num_episodes * self.steps_per_episode
+        print(f"Training finished! {steps} steps in {elapsed:.2f} s ({steps / max(elapsed, 1e-9):,.0f} steps/s).")
+        self.q_learning.save_q_table()  # Save after training
+        return {"steps": steps, "seconds": elapsed, "steps_per_second": steps / max(elapsed, 1e-9)}
+
+    def _uniform_digits(self, n, radices):
+        return [self.rng.integers(radix, size=n) for radix in radices]
@@ -0,0 +1,171 @@
+import random
+from typing import List
+
+import numpy as np
+
+from . import state_codec
+from .actions import Action
+from .state import EmotionalState, EngagementLevel, PromptNecessity, VocabularyUsage
+
+# Reward rules, see CompiledEnvironment.rewards.
+ENGAGEMENT_SCORE = {
+    EngagementLevel.HIGH: 1.0,
+    EngagementLevel.MEDIUM: 0.5,
+    EngagementLevel.LOW: 0.0
+}
+# Learning score based on vocabulary usage level; only applies in INTERACTION mode.
+LEARNING_SCORE = {
+    VocabularyUsage.LOW: 0.0,
+    VocabularyUsage.MEDIUM: 0.5,
+    VocabularyUsage.HIGH: 1.0
+}
+# Anger: frustration may rise with complexity. Surprise: suggests confusion.
+EMOTIONAL_PENALTY = {
+    EmotionalState.ANGER: -0.2,
+    EmotionalState.SURPRISE: -0.1
+}
+# When a prompt is needed while engagement is low.
+PROMPT_PENALTY = -0.2
+# Clarification helps at low engagement and is over-prompting otherwise.
+CLARIFICATION_BONUS_LOW_ENGAGEMENT = 0.5
+CLARIFICATION_PENALTY = -0.3
+
+# Next vocabulary usage after a Lexical-Syntactic action: rows are the current
+# LOW, MEDIUM, HIGH usage, columns the probabilities of the next one. Other
+# actions keep the usage. Every other field is redrawn uniformly and the mode is kept.
+VOCABULARY_TRANSITIONS = np.array([
+    [0.7, 0.3, 0.0],
+    [0.3, 0.4, 0.3],
+    [0.0, 0.3, 0.7],
+])
+
+
+def _table(mapping, members, default=0.0):
+    return np.array([mapping.get(member, default) for member in members])
+
+
+def state_fields():
+    """Digit (enum ordinal) of every field for every state index; -1 where a narration state has no such field."""
+    fields = np.full((len(state_codec.INTERACTION_FIELDS), state_codec.N_STATES), -1, dtype=np.int64)
+    narration = np.arange(state_codec.N_NARRATION)
+    fields[:len(state_codec.NARRATION_FIELDS), :state_codec.N_NARRATION] = \
+        state_codec.to_digits(narration, state_codec.NARRATION_RADICES)
+    fields[:, state_codec.INTERACTION_OFFSET:] = \
+        state_codec.to_digits(np.arange(state_codec.N_INTERACTION), state_codec.INTERACTION_RADICES)
+    return {name: fields[i] for i, (name, _) in enumerate(state_codec.INTERACTION_FIELDS)}
+
+
+class CompiledEnvironment:
+    """The environment's rules as arrays over state_codec indices and action indices.
+
+    rewards[s, a] is the reward of taking action a in state s.
+
+    Transitions are kept in factored form. A dense P[s, a, s'] would take
+    2289 x 10 x 2289 float32, about 210 MB. But each next-state distribution
+    depends only on the mode, the vocabulary usage and whether the action is
+    Lexical-Syntactic, so there are just 7 distinct rows: kernels[k] is one
+    row and P[s, a] == kernels[kernel_index[s, a]]. transition_tensor()
+    builds the dense form on request.
+    """
+
+    def __init__(self, actions: List[Action]):
+        self.actions = actions
+        self.action_index = {action: i for i, action in enumerate(actions)}
+        self.n_states = state_codec.N_STATES
+        self.n_actions = len(actions)
+        self.lexical_actions = np.array([action.action_type == "Lexical-Syntactic" for action in actions])
+        self.clarification_actions = np.array([action.action_type == "Clarification" for action in actions])
+
+        fields = state_fields()
+        self.interaction = np.arange(self.n_states) >= state_codec.INTERACTION_OFFSET
+        self.vocabulary = fields["vocabulary_usage"]
+        self.rewards = self._compile_rewards(fields)
+        self.kernels, self.kernel_index = self._compile_transitions()
+        self.cdf = self._compile_cdf()
+
+    def _compile_rewards(self, fields):
+        engagement = fields["engagement_level"]
+        low_engagement = engagement == list(EngagementLevel).index(EngagementLevel.LOW)
+        prompt_needed = fields["prompt_necessity"] == list(PromptNecessity).index(PromptNecessity.YES)
+
+        engagement_score = _table(ENGAGEMENT_SCORE, EngagementLevel)[engagement]
+        learning_score = np.where(self.interaction, _table(LEARNING_SCORE, VocabularyUsage)[self.vocabulary], 0.0)
+        emotional_penalty = _table(EMOTIONAL_PENALTY, EmotionalState)[fields["emotional_state"]]
+        prompt_penalty = np.where(prompt_needed & low_engagement, PROMPT_PENALTY, 0.0)
+        state_reward = 0.5 * engagement_score + 0.5 * learning_score + emotional_penalty + prompt_penalty
+
+        clarification_bonus = np.where(low_engagement, CLARIFICATION_BONUS_LOW_ENGAGEMENT, CLARIFICATION_PENALTY)
+        rewards = state_reward[:, None] + np.outer(clarification_bonus, self.clarification_actions)
+        # Ensure rewards stay within reasonable bounds
+        return np.clip(rewards, -1.0, 1.0)
+
+    def _compile_transitions(self):
+        # Kernel 0: narration, uniform over the narration states.
+        # Kernels 1-3: interaction after other actions, vocabulary kept (LOW, MEDIUM, HIGH).
+        # Kernels 4-6: interaction after a Lexical-Syntactic action, by current vocabulary.
+        vocabulary_rows = np.vstack((np.eye(3), VOCABULARY_TRANSITIONS))
+        other_interaction_fields = state_codec.N_INTERACTION // len(VocabularyUsage)
+        interaction_vocabulary = self.vocabulary[state_codec.INTERACTION_OFFSET:]
+
+        kernels = np.zeros((1 + len(vocabulary_rows), self.n_states))
+        kernels[0, :state_codec.N_NARRATION] = 1.0 / state_codec.N_NARRATION
+        kernels[1:, state_codec.INTERACTION_OFFSET:] = vocabulary_rows[:, interaction_vocabulary] / other_interaction_fields
+
+        kernel_index = np.zeros((self.n_states, self.n_actions), dtype=np.int64)
+        kernel_index[self.interaction] = 1 + self.vocabulary[self.interaction, None] + 3 * self.lexical_actions
+        return kernels, kernel_index
+
+    def _compile_cdf(self):
+        # The cumulative sum ends a few ulps short of 1, so a draw just below 1
+        # would land past the kernel's support (for the narration kernel, in
+        # the interaction block). Pinning each row to 1.0 from its last
+        # reachable state on keeps every draw inside the support.
+        cdf = np.cumsum(self.kernels, axis=1)
+        last_reachable = self.n_states - 1 - np.argmax(self.kernels[:, ::-1] > 0, axis=1)
+        cdf[np.arange(self.n_states) >= last_reachable[:, None]] = 1.0
+        return cdf
+
+    def transition_probabilities(self, state_index: int, action_index: int) -> np.ndarray:
+        """P[state_index, action_index, :], a view of one kernel."""
+        return self.kernels[self.kernel_index[state_index, action_index]]
+
+    def transition_tensor(self, dtype=np.float32) -> np.ndarray:
+        """The dense P[s, a, s'] (about 210 MB as float32); prefer kernels/kernel_index."""
+        return self.kernels.astype(dtype)[self.kernel_index]
+
+    def sample_index(self, state_index: int, action_index: int) -> int:
+        """One next-state index, drawn with the random module like the rest of the sequential path."""
+        cdf = self.cdf[self.kernel_index[state_index, action_index]]
+        return int(np.searchsorted(cdf, random.random(), side="right"))
+
+    def sample(self, states: np.ndarray, actions: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Next-state indices for arrays of state and action indices."""
+        kernels = self.kernel_index[states, actions]
+        draws = rng.random(len(states))
+        next_states = np.empty(len(states), dtype=np.int64)
+        for kernel in np.unique(kernels):
+            selected = kernels == kernel
+            next_states[selected] = np.searchsorted(self.cdf[kernel], draws[selected], side="right")
+        return next_states
+
+    def expected_rewards(self) -> np.ndarray:
+        """E[rewards[s', a]] over s' ~ P[s, a], for the reward-of-the-next-state convention of Trainer."""
+        per_kernel = self.kernels @ self.rewards  # [kernel, action]
+        return per_kernel[self.kernel_index, np.arange(self.n_actions)]
+
+    def value_iteration(self, gamma: float = 0.9, tolerance: float = 1e-6, max_iterations: int = 1000) -> np.ndarray:
+        """
+        Optimal Q[s, a] under the compiled model, with the reward of the next state as in Trainer.
+
+        Each sweep is one [kernels x states] product, since all rows of P are kernels.
+        """
+        expected_rewards = self.expected_rewards()
+        q_values = np.zeros((self.n_states, self.n_actions))
+        for _ in range(max_iterations):
+            expected_values = self.kernels @ q_values.max(axis=1)
+            updated = expected_rewards + gamma * expected_values[self.kernel_index]
+            converged = np.abs(updated - q_values).max() < tolerance
+            q_values = updated
+            if converged:
+                break
+        return q_values
@@ -1,16 +1,20 @@
-import random
 from .state import *
 from .q_learning import *
 from .actions import *
+from . import state_codec
+from .compiled_environment import CompiledEnvironment
 
 
 class Environment:
-    def __init__(self, q_learning: QLearning):
+    def __init__(self, q_learning: QLearning, compiled: CompiledEnvironment = None):
         """
         Initializes the environment with a Q-learning agent.
+        The rules live in a CompiledEnvironment; this class looks States and Actions up in its tables.
         :param q_learning: The Q-learning agent managing action selection and learning.
+        :param compiled: Compiled rules for the agent's actions; built if not given.
         """
         self.q_learning = q_learning
+        self.compiled = compiled if compiled is not None else CompiledEnvironment(q_learning.actions)
 
     def get_reward(self, state: State, action: Action) -> float:
         """
@@ -19,48 +23,7 @@ class Environment:
         :param action: The action taken.
         :return: A reward value.
         """
-        # Engagement score: High, Medium, Low
-        engagement_score = {
-            EngagementLevel.HIGH: 1.0,
-            EngagementLevel.MEDIUM: 0.5,
-            EngagementLevel.LOW: 0.0
-        }[state.engagement_level]
-
-        # Learning score based on vocabulary usage level
-        learning_score = {
-            VocabularyUsage.LOW: 0.0,
-            VocabularyUsage.MEDIUM: 0.5,
-            VocabularyUsage.HIGH: 1.0
-        }[state.vocabulary_usage] if state.mode == Mode.INTERACTION else 0  # Only applies in INTERACTION mode
-
-        emotional_penalty = 0
-        if state.emotional_state == EmotionalState.ANGER:
-            # Penalty if the child is angry (because frustration may rise with complexity)
-            emotional_penalty = -0.2
-        elif state.emotional_state == EmotionalState.SURPRISE:
-            # Mild penalty for surprise (suggests confusion)
-            emotional_penalty = -0.1
-
-        # Penalty if a prompt is needed too frequently when engagement is low
-        prompt_penalty = -0.2 if state.prompt_necessity == PromptNecessity.YES and state.engagement_level == EngagementLevel.LOW else 0
-
-        # Clarification reward/penalty based on the action
-        clarification_bonus = 0
-        if action.action_type == "Clarification":
-            if state.engagement_level == EngagementLevel.LOW:
-                clarification_bonus = 0.5  # Reward if clarification helps in low engagement situations
-            else:
-                # Penalize if clarification is used when engagement is high (over-prompting)
-                clarification_bonus = -0.3
-
-        # Combining all factors: Engagement + Learning + Emotional + Clarification + Prompt
-        total_reward = 0.5 * engagement_score + 0.5 * learning_score + \
-            emotional_penalty + clarification_bonus + prompt_penalty
-
-        # Ensure rewards stay within reasonable bounds
-        total_reward = max(-1.0, min(1.0, total_reward))
-
-        return total_reward
+        return float(self.compiled.rewards[state_codec.encode(state), self.compiled.action_index[action]])
 
     def transition(self, state: State, action: Action) -> State:
         """
@@ -69,58 +32,8 @@ class Environment:
         :param action: The action taken.
         :return: The next state.
         """
-        new_engagement_level = random.choice(list(EngagementLevel))
-        new_emotional_state = random.choice(list(EmotionalState))
-
-        if state.mode == Mode.NARRATION:
-            # In narration mode, only update engagement and emotion.
-            return State(
-                mode=Mode.NARRATION,
-                engagement_level=new_engagement_level,
-                emotional_state=new_emotional_state
-            )
-        else:  # INTERACTION mode
-            new_response_quality = random.choice(list(ResponseQuality))
-            new_prompt_necessity = random.choice(list(PromptNecessity))
-            new_response_length = random.choice(list(ResponseLength))
-
-            if action.action_type == "Lexical-Syntactic":
-                rand = random.random()
-
-                if state.vocabulary_usage == VocabularyUsage.LOW:
-                    if rand < 0.7:
-                        new_vocab_usage = VocabularyUsage.LOW
-                    else:
-                        new_vocab_usage = VocabularyUsage.MEDIUM
-                elif state.vocabulary_usage == VocabularyUsage.MEDIUM:
-                    if rand < 0.4:
-                        new_vocab_usage = VocabularyUsage.MEDIUM
-                    elif 0.4 < rand < 0.7:
-                        new_vocab_usage = VocabularyUsage.LOW
-                    else:
-                        new_vocab_usage = VocabularyUsage.HIGH
-
-                else:  # HIGH vocabulary usage
-                    if rand < 0.7:
-                        new_vocab_usage = VocabularyUsage.HIGH
-                    else:
-                        new_vocab_usage = VocabularyUsage.MEDIUM
-            else:
-                new_vocab_usage = state.vocabulary_usage
-
-            # Simulate WH-question detection (in practice, this is derived from analyzing the child's speech)
-            new_wh_question = random.choice([True, False])
-
-            return State(
-                mode=Mode.INTERACTION,
-                engagement_level=new_engagement_level,
-                emotional_state=new_emotional_state,
-                response_quality=new_response_quality,
-                prompt_necessity=new_prompt_necessity,
-                response_length=new_response_length,
-                vocabulary_usage=new_vocab_usage,
-                wh_question_detected=new_wh_question
-            )
+        next_index = self.compiled.sample_index(state_codec.encode(state), self.compiled.action_index[action])
+        return state_codec.decode(next_index)
 
     def run_episode(self, initial_state: State, num_steps: int = 10):
         """
@@ -2,127 +2,139 @@ import random
 import pickle
 import os
 from typing import List
+
+import numpy as np
+
 from .state import State
 from .actions import Action
+from . import state_codec
+
+
+def load_legacy_q_table(path, n_actions):
+    """
+    Reads a pickled dict Q-table (State.to_tuple() -> list of Q-values) into a dense array.
+    Entries whose key is not a valid state or whose length does not match n_actions are skipped.
+    """
+    with open(path, "rb") as file:
+        legacy = pickle.load(file)
+
+    q_table = np.zeros((state_codec.N_STATES, n_actions), dtype=np.float32)
+    skipped = 0
+    for key, q_values in legacy.items():
+        try:
+            index = state_codec.encode_key(key)
+        except (ValueError, KeyError, IndexError, TypeError):
+            skipped += 1
+            continue
+        if len(q_values) != n_actions:
+            skipped += 1
+            continue
+        q_table[index] = q_values
+    if skipped:
+        print(f"WARNING: Skipped {skipped} Q-table entries that do not fit the current states/actions.")
+    return q_table
 
 
 class QLearning:
-    def __init__(self, actions: List[Action], alpha: float = 0.1, gamma: float = 0.9, epsilon: float = 0.2, q_table_path="rl_framework/table/q_table.pkl"):
+    def __init__(self, actions: List[Action], alpha: float = 0.1, gamma: float = 0.9, epsilon: float = 0.2,
+                 q_table_path="rl_framework/table/q_table.npy", legacy_q_table_path="rl_framework/table/q_table.pkl"):
         """
         Initializes the Q-learning agent.
 
+        The Q-table is a float32 array of shape [n_states, n_actions]; rows are
+        state_codec indices and columns follow the order of actions.
+
         :param actions: List of all possible actions.
         :param alpha: Learning rate.
         :param gamma: Discount factor.
         :param epsilon: Exploration rate (ϵ-greedy strategy).
-        :param q_table_path: Path to saved Q-table.
+        :param q_table_path: Path to saved Q-table (.npy).
+        :param legacy_q_table_path: Pickled dict Q-table, migrated when q_table_path does not exist yet.
         """
         self.actions = actions
+        self.action_index = {action: i for i, action in enumerate(actions)}
         self.alpha = alpha
         self.gamma = gamma
         self.epsilon = epsilon
-        self.q_table = {}
+        self.q_table = np.zeros((state_codec.N_STATES, len(actions)), dtype=np.float32)
         self.q_table_path = q_table_path
+        self.legacy_q_table_path = legacy_q_table_path
         self.load_q_table()  # Load pre-trained Q-values if available
 
-    
-    def _get_q_values(self, state: State) -> List[float]:
+    def state_index(self, state: State) -> int:
+        return state_codec.encode(state)
+
+    def _get_q_values(self, state: State) -> np.ndarray:
         """
-        Returns the list of Q-values for the given state.
-        Ensures Q-values are initialized correctly.
+        Returns the row of Q-values for the given state (a view into the Q-table).
         """
-        state_key = state.to_tuple()
+        return self.q_table[state_codec.encode(state)]
 
-        if state_key not in self.q_table:
-            self.q_table[state_key] = [0.0 for _ in self.actions]
-
-        q_values = self.q_table[state_key]
-
-        # Debugging print
-        # print(f"Getting Q-values for state: {state_key}")
-        # print(f"Actions: {self.actions}")
-        # print(f"Q-values (length {len(q_values)}): {q_values}")
+    def _best_action_index(self, state_index: int) -> int:
+        # Ten Python floats compare faster than a NumPy reduction over a small row.
+        q_values = self.q_table[state_index].tolist()
+        max_q = max(q_values)
+        if q_values.count(max_q) == 1:
+            return q_values.index(max_q)
+        return random.choice([i for i, q in enumerate(q_values) if q == max_q])
 
-        if len(q_values) != len(self.actions):
-            print(f"WARNING: Fixing Q-values length mismatch!")
-            self.q_table[state_key] = [0.0 for _ in self.actions]
-            return self.q_table[state_key]
+    def choose_action_index(self, state_index: int) -> int:
+        """
+        Chooses an action index for a state index using an epsilon-greedy strategy.
+        """
+        if random.random() < self.epsilon:
+            return random.randrange(len(self.actions))  # Exploration step
+        return self._best_action_index(state_index)
 
-        return q_values
+    def update_q_index(self, state_index: int, action_index: int, reward: float, next_state_index: int) -> None:
+        """
+        Q-learning update of one entry, addressed by state and action indices.
+        """
+        q_table = self.q_table
+        current_q = q_table[state_index, action_index]
+        max_next_q = max(q_table[next_state_index].tolist())
+        q_table[state_index, action_index] = current_q + self.alpha * \
+            (reward + self.gamma * max_next_q - current_q)
 
     def choose_action(self, state: State) -> Action:
         """
         Chooses an action using an epsilon-greedy strategy.
         """
-        q_values = self._get_q_values(state)
-
-        if random.random() < self.epsilon:
-            return random.choice(self.actions)  # Exploration step
-
-        max_q = max(q_values)
-        best_actions = [action for action, q in zip(
-            self.actions, q_values) if q == max_q]
-
-        if not best_actions:  # Fallback in case of an empty list
-            return random.choice(self.actions)
-
-        return random.choice(best_actions)
+        return self.actions[self.choose_action_index(state_codec.encode(state))]
 
     def update_q_value(self, state: State, action: Action, reward: float, next_state: State) -> None:
         """
         Updates the Q-value for a state-action pair using the Q-learning update rule.
         """
-        state_key = state.to_tuple()
-
-        if action not in self.actions:
+        action_index = self.action_index.get(action)
+        if action_index is None:
             raise ValueError(
                 f"Action {action} not found in self.actions list.")
 
-        action_index = self.actions.index(action)
-
-        q_values = self._get_q_values(state)
-        if not q_values:
-            # Initialize Q-values if missing
-            q_values = [0] * len(self.actions)
-
-        if action_index >= len(q_values):
-            raise IndexError(
-                f"Action index {action_index} is out of range for Q-values {q_values}")
-
-        current_q = q_values[action_index]
-
-        next_q_values = self._get_q_values(next_state)
-        if not next_q_values:
-            # Initialize Q-values if missing
-            next_q_values = [0] * len(self.actions)
-
-        max_next_q = max(next_q_values)
-
-        new_q = current_q + self.alpha * \
-            (reward + self.gamma * max_next_q - current_q)
-
-        self.q_table[state_key][action_index] = new_q
+        self.update_q_index(state_codec.encode(state), action_index, reward,
+                            state_codec.encode(next_state))
 
     def get_best_action(self, state: State) -> Action:
         """
         Retrieves the best action (the one with the highest Q-value) for a given state.
         """
-        q_values = self._get_q_values(state)
-        max_q = max(q_values)
-        best_actions = [action for action, q in zip(
-            self.actions, q_values) if q == max_q]
-        return random.choice(best_actions)
+        return self.actions[self._best_action_index(state_codec.encode(state))]
 
     def load_q_table(self):
         """
-        Loads the Q-table from the file if available.
+        Loads the Q-table from the file if available, migrating the pickled table otherwise.
         """
+        shape = (state_codec.N_STATES, len(self.actions))
         if os.path.exists(self.q_table_path):
-            with open(self.q_table_path, "rb") as file:
-                self.q_table = pickle.load(file)
+            q_table = np.load(self.q_table_path)
+            if q_table.shape != shape:
+                print(f"WARNING: Q-table in {self.q_table_path} has shape {q_table.shape}, expected {shape}. Starting fresh.")
+                return
+            self.q_table = q_table.astype(np.float32, copy=False)
             print(f"Q-table loaded from {self.q_table_path}")
-            # Debug: Check first 5 keys
-            print(f"Q-table keys: {list(self.q_table.keys())[:5]}")
+        elif self.legacy_q_table_path and os.path.exists(self.legacy_q_table_path):
+            self.q_table = load_legacy_q_table(self.legacy_q_table_path, len(self.actions))
+            print(f"Q-table migrated from {self.legacy_q_table_path}; it is saved to {self.q_table_path} on the next save.")
         else:
             print("No saved Q-table found. Starting fresh.")
 
@@ -130,7 +142,8 @@ class QLearning:
         """
         Saves the Q-table to a file.
         """
-        os.makedirs(os.path.dirname(self.q_table_path), exist_ok=True)
-        with open(self.q_table_path, "wb") as file:
-            pickle.dump(self.q_table, file)
+        directory = os.path.dirname(self.q_table_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.save(self.q_table_path, self.q_table)
         print(f"Q-table saved to {self.q_table_path}")
@@ -0,0 +1,114 @@
+"""Dense integer indices for States, so Q-values can live in one array.
+
+Each state is a mixed-radix number over the ordinals of its enum fields, in
+enum declaration order. The 21 NARRATION states take indices 0-20 and the
+2268 INTERACTION states follow, so every State maps to a distinct index in
+range(N_STATES) and back.
+
+to_digits() and from_digits() work on ints and on NumPy integer arrays
+alike, for code that steps many states at once.
+"""
+from .state import (State, Mode, EngagementLevel, EmotionalState, ResponseQuality,
+                    PromptNecessity, ResponseLength, VocabularyUsage)
+
+WH_QUESTION = (False, True)
+
+# (State attribute, values in digit order), most significant digit first.
+NARRATION_FIELDS = (
+    ("engagement_level", tuple(EngagementLevel)),
+    ("emotional_state", tuple(EmotionalState)),
+)
+INTERACTION_FIELDS = NARRATION_FIELDS + (
+    ("response_quality", tuple(ResponseQuality)),
+    ("prompt_necessity", tuple(PromptNecessity)),
+    ("response_length", tuple(ResponseLength)),
+    ("vocabulary_usage", tuple(VocabularyUsage)),
+    ("wh_question_detected", WH_QUESTION),
+)
+
+NARRATION_RADICES = tuple(len(values) for _, values in NARRATION_FIELDS)
+INTERACTION_RADICES = tuple(len(values) for _, values in INTERACTION_FIELDS)
+
+
+def _size(radices):
+    size = 1
+    for radix in radices:
+        size *= radix
+    return size
+
+
+N_NARRATION = _size(NARRATION_RADICES)
+N_INTERACTION = _size(INTERACTION_RADICES)
+INTERACTION_OFFSET = N_NARRATION
+N_STATES = N_NARRATION + N_INTERACTION
+
+# Digit position of each State attribute, e.g. FIELD_DIGIT["vocabulary_usage"] == 5.
+FIELD_DIGIT = {name: i for i, (name, _) in enumerate(INTERACTION_FIELDS)}
+
+_ORDINALS = [{value: i for i, value in enumerate(values)} for _, values in INTERACTION_FIELDS]
+
+
+def to_digits(index, radices):
+    """Split a mixed-radix index (or array of them) into its digits, most significant first."""
+    digits = []
+    for radix in reversed(radices):
+        digits.append(index % radix)
+        index = index // radix
+    return digits[::-1]
+
+
+def from_digits(digits, radices):
+    """Inverse of to_digits()."""
+    index = 0
+    for digit, radix in zip(digits, radices):
+        index = index * radix + digit
+    return index
+
+
+def encode(state: State) -> int:
+    """Dense index of state in range(N_STATES)."""
+    # Unrolled from_digits(): this runs on every Q-table access.
+    engagement, emotion, quality, prompt, length, vocabulary, wh = _ORDINALS
+    _, r_emotion, r_quality, r_prompt, r_length, r_vocabulary, r_wh = INTERACTION_RADICES
+    index = engagement[state.engagement_level] * r_emotion + emotion[state.emotional_state]
+    if state.mode == Mode.NARRATION:
+        return index
+    index = index * r_quality + quality[state.response_quality]
+    index = index * r_prompt + prompt[state.prompt_necessity]
+    index = index * r_length + length[state.response_length]
+    index = index * r_vocabulary + vocabulary[state.vocabulary_usage]
+    index = index * r_wh + wh[state.wh_question_detected]
+    return INTERACTION_OFFSET + index
+
+
+def decode(index: int) -> State:
+    """A new State for a dense index."""
+    if not 0 <= index < N_STATES:
+        raise IndexError(f"State index {index} is out of range for {N_STATES} states.")
+    if index < INTERACTION_OFFSET:
+        mode, fields, radices = Mode.NARRATION, NARRATION_FIELDS, NARRATION_RADICES
+    else:
+        mode, fields, radices = Mode.INTERACTION, INTERACTION_FIELDS, INTERACTION_RADICES
+        index -= INTERACTION_OFFSET
+    digits = to_digits(index, radices)
+    return State(mode, **{name: values[digit] for (name, values), digit in zip(fields, digits)})
+
+
+def encode_key(key) -> int:
+    """Dense index of a State.to_tuple() key, as stored in the old pickled Q-tables.
+
+    Raises ValueError for keys that do not describe a valid state.
+    """
+    mode = Mode(key[0])
+    fields = NARRATION_FIELDS if mode == Mode.NARRATION else INTERACTION_FIELDS
+    if len(key) != len(fields) + 1:
+        raise ValueError(f"Malformed state key {key!r}")
+    values = {}
+    for (name, members), value in zip(fields, key[1:]):
+        values[name] = value if members is WH_QUESTION else type(members[0])(value)
+    return encode(State(mode, **values))
+
+
+def all_states():
+    """Every State, in index order."""
+    return [decode(index) for index in range(N_STATES)]
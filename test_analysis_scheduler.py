@@ -0,0 +1,56 @@
+import unittest
+
+from detector_model.analysis_scheduler import AnalysisScheduler
+
+
+class TestAnalysisScheduler(unittest.TestCase):
+
+    def scheduler(self, busy=False, **kwargs):
+        self.busy = busy
+        options = dict(min_interval=0.5, max_interval=5.0, interaction_interval=1.0,
+                       cpu_budget=0.25, busy_factor=2.0, busy_fn=lambda: self.busy)
+        options.update(kwargs)
+        return AnalysisScheduler(**options)
+
+    def test_steady_and_interaction(self):
+        scheduler = self.scheduler()
+        self.assertEqual(scheduler.next_interval(), 5.0)
+        scheduler.set_interaction(True)
+        self.assertEqual(scheduler.next_interval(), 1.0)
+        self.assertEqual(scheduler.reasons, {"steady": 1, "interaction": 1})
+
+    def test_busy_backoff(self):
+        scheduler = self.scheduler(busy=True)
+        self.assertEqual(scheduler.next_interval(), 10.0)
+        self.assertEqual(scheduler.last_reason, "busy")
+        self.busy = False
+        self.assertEqual(scheduler.next_interval(), 5.0)
+        self.assertEqual(scheduler.longest_interval(), 10.0)
+
+    def test_cpu_budget_backoff(self):
+        scheduler = self.scheduler()
+        scheduler.set_interaction(True)
+        # 0.6 s per analysis at a 25% budget needs 2.4 s between analyses.
+        scheduler.record(0.6, now=0.0)
+        self.assertAlmostEqual(scheduler.next_interval(), 2.4)
+        self.assertEqual(scheduler.last_reason, "budget")
+
+    def test_changing_labels_shorten_the_interval(self):
+        scheduler = self.scheduler(cpu_budget=None)
+        for step in range(10):
+            scheduler.record(0.01, ("Front", step % 2), now=float(step))
+        interval = scheduler.next_interval()
+        self.assertLess(interval, 1.0)
+        self.assertGreaterEqual(interval, 0.5)
+        self.assertEqual(scheduler.last_reason, "changing")
+
+    def test_due_waits_for_the_interval(self):
+        scheduler = self.scheduler(cpu_budget=None)
+        self.assertTrue(scheduler.due(now=0.0))
+        scheduler.record(0.01, now=0.0)
+        self.assertFalse(scheduler.due(now=4.0))
+        self.assertTrue(scheduler.due(now=5.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from detector_model.blink_detector import BlinkDetector, eye_aspect_ratio
+
+
+def eye(openness, width=30.0):
+    """Six dlib-ordered eye points with lids `openness` pixels apart."""
+    half = openness / 2
+    return [(0, 0), (width / 3, -half), (2 * width / 3, -half),
+            (width, 0), (2 * width / 3, half), (width / 3, half)]
+
+
+class TestBlinkDetector(unittest.TestCase):
+
+    def test_eye_aspect_ratio(self):
+        self.assertAlmostEqual(eye_aspect_ratio(eye(9.0)), 0.3)
+        self.assertEqual(eye_aspect_ratio(eye(0.0)), 0.0)
+
+    def test_calibrates_to_the_child(self):
+        # This child's eyes are narrow: open EAR 0.18 is below the default threshold.
+        detector = BlinkDetector(calibration_seconds=0.9)
+        for i in range(10):
+            detector.update(eye(5.4), eye(5.4), timestamp=i * 0.1)
+        self.assertTrue(detector.calibrated)
+        self.assertAlmostEqual(detector.baseline, 0.18)
+        self.assertFalse(detector.update(eye(5.4), eye(5.4), timestamp=1.0))
+        self.assertTrue(detector.update(eye(1.0), eye(1.0), timestamp=1.1))
+
+    def test_blink_rate_and_closure(self):
+        detector = BlinkDetector(calibration_seconds=0.4, window=60.0)
+        t = 0.0
+        for _ in range(5):
+            detector.update(eye(9.0), eye(9.0), timestamp=t)
+            t += 0.1
+        # One blink (two closed frames) every 3 seconds for 30 seconds.
+        for i in range(300):
+            closed = i % 30 in (0, 1)
+            detector.update(eye(1.0 if closed else 9.0), eye(1.0 if closed else 9.0), timestamp=t)
+            t += 0.1
+        self.assertAlmostEqual(detector.blink_rate(now=t), 10 * 60.0 / t, places=3)
+        self.assertAlmostEqual(detector.closure_fraction(now=t), 20 / 305, places=3)
+
+    def test_calibration_is_timed(self):
+        # One analysis every 5 s: calibrated after 10 s, not after 30 samples.
+        detector = BlinkDetector(calibration_seconds=10.0, min_calibration_samples=3)
+        for t in (0.0, 5.0):
+            detector.update(eye(5.4), eye(5.4), timestamp=t)
+        self.assertFalse(detector.calibrated)
+        detector.update(eye(5.4), eye(5.4), timestamp=10.0)
+        self.assertTrue(detector.calibrated)
+
+    def test_reset_forgets_the_previous_child(self):
+        detector = BlinkDetector(calibration_seconds=0.2)
+        for i in range(5):
+            detector.update(eye(1.0), eye(1.0), timestamp=i * 0.1)
+        detector.reset()
+        self.assertFalse(detector.calibrated)
+        self.assertIsNone(detector.closure_fraction(now=1.0))
+        self.assertIsNone(detector.blink_rate(now=1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+
+from detector_model.emotion_batcher import EmotionBatcher
+from detector_model.state_updater import EMOTION_MAPPING, StateUpdater
+
+LABELS = list(EMOTION_MAPPING)
+
+
+class StubAnalyzer:
+    """EmotionAnalyzer stand-in: the "face" is the emotion code, stamped into the crop."""
+
+    labels = LABELS
+
+    def __init__(self):
+        self.batch_sizes = []
+        self.last_emotion = self.last_score = None
+
+    def preprocess_face(self, gray_frame, face):
+        if face is None:
+            return None
+        return np.full((4, 4, 1), face, dtype=np.float32)
+
+    def classify_faces(self, batch):
+        self.batch_sizes.append(len(batch))
+        scores = np.full((len(batch), len(LABELS)), 0.05, dtype=np.float32)
+        scores[np.arange(len(batch)), batch[:, 0, 0, 0].astype(int)] = 0.7
+        return scores
+
+
+class RecordingUpdater:
+
+    def __init__(self):
+        self.readings = []
+
+    def add_reading(self, horizontal, vertical, gaze, emotion, emotion_conf, timestamp=None):
+        self.readings.append((timestamp, horizontal, emotion, emotion_conf))
+
+
+class TestEmotionBatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.analyzer = StubAnalyzer()
+        self.updater = RecordingUpdater()
+        self.batcher = EmotionBatcher(self.analyzer, self.updater, batch_size=3, max_delay=1.0)
+
+    def submit(self, code, timestamp, horizontal="Front"):
+        return self.batcher.submit(None, code, horizontal, "Front", "Looking Center", timestamp)
+
+    def test_full_batch_keeps_order_and_timestamps(self):
+        self.assertIsNone(self.submit(EMOTION_MAPPING["Sad"], 10.0, "Left"))
+        self.assertIsNone(self.submit(EMOTION_MAPPING["Happy"], 10.2, "Right"))
+        self.assertEqual(self.updater.readings, [])
+        results = self.submit(EMOTION_MAPPING["Fear"], 10.4)
+        self.assertEqual(results, [(10.0, "Sad", 0.7), (10.2, "Happy", 0.7), (10.4, "Fear", 0.7)])
+        self.assertEqual(self.updater.readings, [
+            (10.0, "Left", "Sad", 0.7), (10.2, "Right", "Happy", 0.7), (10.4, "Front", "Fear", 0.7)])
+        self.assertEqual(self.analyzer.batch_sizes, [3])
+        self.assertEqual((self.analyzer.last_emotion, self.analyzer.last_score), ("Fear", 0.7))
+
+    def test_partial_batch_runs_after_max_delay(self):
+        self.submit(EMOTION_MAPPING["Angry"], 5.0)
+        self.assertIsNone(self.batcher.poll(now=5.9))
+        self.assertEqual(self.batcher.poll(now=6.0), [(5.0, "Angry", 0.7)])
+        self.assertIsNone(self.batcher.poll(now=7.0))
+        # A crop arriving max_delay after the oldest queued one flushes both.
+        self.submit(EMOTION_MAPPING["Neutral"], 8.0)
+        results = self.submit(EMOTION_MAPPING["Surprise"], 9.0)
+        self.assertEqual([timestamp for timestamp, _, _ in results], [8.0, 9.0])
+        self.assertEqual(self.analyzer.batch_sizes, [1, 2])
+        self.assertEqual(self.batcher.stats()["crops_classified"], 3)
+
+    def test_crops_without_a_face_are_not_queued(self):
+        self.assertIsNone(self.submit(None, 1.0))
+        self.assertEqual(self.batcher.flush(), [])
+        self.assertEqual(self.analyzer.batch_sizes, [])
+
+    def test_readings_reach_the_state_updater_at_capture_time(self):
+        updater = StateUpdater(window_seconds=10.0)
+        batcher = EmotionBatcher(self.analyzer, updater, batch_size=4, max_delay=1.0)
+        for t, emotion in ((0.0, "Sad"), (0.3, "Sad"), (0.6, "Happy")):
+            batcher.submit(None, EMOTION_MAPPING[emotion], "Front", "Front", "Looking Center", t)
+        batcher.poll(now=1.0)
+        rows = updater.readings.rows()
+        self.assertEqual(rows["timestamp"].tolist(), [0.0, 0.3, 0.6])
+        self.assertEqual(rows["emotion"].tolist(),
+                         [EMOTION_MAPPING["Sad"], EMOTION_MAPPING["Sad"], EMOTION_MAPPING["Happy"]])
+        self.assertEqual(updater.aggregate_emotion()[0], EMOTION_MAPPING["Sad"])
+
+
+if __name__ == "__main__":
+    unittest.main()
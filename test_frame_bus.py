@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from detector_model.frame_bus import FrameRing
+
+
+class TestFrameRing(unittest.TestCase):
+
+    def publish(self, ring, seq):
+        ring.slot_for(seq)[:] = seq % 256
+        ring.commit(seq, timestamp=seq * 0.1)
+
+    def test_latest_is_newest_commit(self):
+        ring = FrameRing(size=4, shape=(2, 2, 3))
+        self.assertIsNone(ring.latest())
+        for seq in range(6):
+            self.publish(ring, seq)
+        packet = ring.latest()
+        self.assertEqual(packet.seq, 5)
+        self.assertAlmostEqual(packet.timestamp, 0.5)
+        self.assertTrue(np.all(packet.frame == 5))
+        self.assertFalse(packet.frame.flags.writeable)
+
+    def test_is_current_across_wraparound(self):
+        ring = FrameRing(size=4, shape=(2, 2, 3))
+        for seq in range(10):
+            self.publish(ring, seq)
+            # The slot of seq - 3 is written next, so only the newest 3 are safe.
+            for back in range(4):
+                if seq - back >= 0:
+                    self.assertEqual(ring.is_current(seq - back), back < 3, (seq, back))
+
+    def test_reader_detects_torn_frame(self):
+        ring = FrameRing(size=4, shape=(2, 2, 3))
+        self.publish(ring, 0)
+        packet = ring.latest()
+        for seq in range(1, 4):
+            self.publish(ring, seq)
+        # Slot 0 now holds seq 4's pixels under the reader's view.
+        self.publish(ring, 4)
+        self.assertFalse(ring.is_current(packet.seq))
+        self.assertTrue(np.all(packet.frame == 4))
+
+    def test_needs_two_slots(self):
+        with self.assertRaises(ValueError):
+            FrameRing(size=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
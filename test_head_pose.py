@@ -0,0 +1,94 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from detector_model.head_pose import POSE_LANDMARKS, HeadPoseTracker
+
+# FaceAnalyzer.model_points
+MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0),
+    (0.0, -330.0, -65.0),
+    (-225.0, 170.0, -135.0),
+    (225.0, 170.0, -135.0),
+    (-150.0, -150.0, -125.0),
+    (150.0, -150.0, -125.0),
+])
+FRAME_SIZE = (480, 640)
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x, self.y = x, y
+
+
+class Landmarks:
+    """The part(i).x/.y accessors of a dlib full_object_detection."""
+
+    def __init__(self, points):
+        self._points = {index: Point(x, y) for index, (x, y) in zip(POSE_LANDMARKS, points)}
+
+    def part(self, index):
+        return self._points[index]
+
+
+def horizontal_label(yaw):
+    if yaw < -15:
+        return "Left"
+    if yaw > 15:
+        return "Right"
+    return "Front"
+
+
+def vertical_label(pitch):
+    return "Front"
+
+
+def landmarks_at(tracker, yaw):
+    """Exact 2D landmarks of the model turned by yaw degrees."""
+    rotation = np.array([[0.0], [np.radians(yaw)], [0.0]])
+    translation = np.array([[0.0], [0.0], [3000.0]])
+    points, _ = cv2.projectPoints(MODEL_POINTS, rotation, translation,
+                                  tracker.camera_matrix(FRAME_SIZE), np.zeros((4, 1)))
+    return Landmarks(points.reshape(-1, 2))
+
+
+class TestHeadPoseTracker(unittest.TestCase):
+
+    def tracker(self, **kwargs):
+        return HeadPoseTracker(MODEL_POINTS, horizontal_label, vertical_label, **kwargs)
+
+    def test_recovers_yaw(self):
+        tracker = self.tracker(alpha=1.0)
+        yaw, _, label, _ = tracker.update(landmarks_at(tracker, 25.0), FRAME_SIZE, timestamp=0.0)
+        self.assertAlmostEqual(yaw, 25.0, places=1)
+        self.assertEqual(label, "Right")
+
+    def test_label_hysteresis(self):
+        tracker = self.tracker(alpha=1.0, hysteresis=3.0)
+        labels = []
+        for step, yaw in enumerate([14, 16, 17, 19, 14, 11]):
+            pose = tracker.update(landmarks_at(tracker, yaw), FRAME_SIZE, timestamp=step * 0.1)
+            labels.append(pose[2])
+        # Right only once 3 degrees past the 15 degree boundary, and back alike.
+        self.assertEqual(labels, ["Front", "Front", "Front", "Right", "Right", "Front"])
+
+    def test_smoothing_within_max_gap_only(self):
+        tracker = self.tracker(alpha=0.5, max_gap=6.0)
+        tracker.update(landmarks_at(tracker, 0.0), FRAME_SIZE, timestamp=0.0)
+        yaw = tracker.update(landmarks_at(tracker, 20.0), FRAME_SIZE, timestamp=5.0)[0]
+        self.assertAlmostEqual(yaw, 10.0, places=1)
+        # A longer gap starts over from the new measurement.
+        yaw = tracker.update(landmarks_at(tracker, 30.0), FRAME_SIZE, timestamp=12.0)[0]
+        self.assertAlmostEqual(yaw, 30.0, places=1)
+
+    def test_reset_clears_labels(self):
+        tracker = self.tracker()
+        tracker.update(landmarks_at(tracker, 25.0), FRAME_SIZE, timestamp=0.0)
+        tracker.reset()
+        self.assertIsNone(tracker.horizontal_label)
+        self.assertIsNone(tracker.rotation_vector)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+from detector_model.motion_gate import MotionGate
+
+
+def still_frame(value=100):
+    return np.full((120, 160), value, dtype=np.uint8)
+
+
+class TestMotionGate(unittest.TestCase):
+
+    def test_still_frames_are_skipped(self):
+        gate = MotionGate(threshold=4.0, max_reuse=10.0)
+        self.assertTrue(gate.should_process(still_frame(), now=0.0))
+        for t in range(1, 5):
+            self.assertFalse(gate.should_process(still_frame(), now=float(t)))
+        self.assertAlmostEqual(gate.skip_rate(), 0.8)
+
+    def test_max_reuse_forces_analysis(self):
+        gate = MotionGate(threshold=4.0, max_reuse=2.0)
+        decisions = [gate.should_process(still_frame(), now=t * 0.5) for t in range(9)]
+        # Analyzed at 0 s, then every 2 s even though nothing moved.
+        self.assertEqual(decisions, [True, False, False, False, True, False, False, False, True])
+
+    def test_motion_in_face_region(self):
+        gate = MotionGate(threshold=4.0, max_reuse=10.0)
+        face_box = (40, 40, 80, 80)
+        gate.should_process(still_frame(), face_box, now=0.0)
+        # A change outside the padded face box does not count...
+        outside = still_frame()
+        outside[:, 120:] = 255
+        self.assertFalse(gate.should_process(outside, face_box, now=1.0))
+        # ...one inside it does, and becomes the new reference.
+        inside = still_frame()
+        inside[40:80, 40:80] = 140
+        self.assertTrue(gate.should_process(inside, face_box, now=2.0))
+        self.assertFalse(gate.should_process(inside, face_box, now=3.0))
+
+    def test_reset_forces_next_frame(self):
+        gate = MotionGate(max_reuse=10.0)
+        gate.should_process(still_frame(), now=0.0)
+        gate.reset()
+        self.assertTrue(gate.should_process(still_frame(), now=1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from detector_model.label_codes import EMOTION_MAPPING, GAZE_MAPPING, HEAD_POSE_MAPPING, UNKNOWN
+from detector_model.perception_snapshot import PerceptionSnapshot
+
+DETECTION = {
+    "horizontal": "Slight Left",
+    "vertical": "Front",
+    "gaze": "looking left",
+    "emotion": "happy",
+    "emotion_confidence": 0.8,
+    "blink_rate": 12.0,
+    "eye_closure": 0.1,
+}
+
+
+class TestPerceptionSnapshot(unittest.TestCase):
+
+    def test_encodes_detection(self):
+        snapshot = PerceptionSnapshot.from_detection(DETECTION, seq=7, timestamp=100.0)
+        self.assertTrue(snapshot.face_found)
+        self.assertEqual(snapshot.labels(), (HEAD_POSE_MAPPING["Slight Left"], HEAD_POSE_MAPPING["Front"],
+                                             GAZE_MAPPING["Looking Left"], EMOTION_MAPPING["Happy"]))
+        self.assertEqual(snapshot.emotion_label, "Happy")
+        self.assertAlmostEqual(snapshot.age(now=102.5), 2.5)
+
+    def test_no_face_keeps_previous_labels(self):
+        previous = PerceptionSnapshot.from_detection(DETECTION, seq=7, timestamp=100.0)
+        snapshot = PerceptionSnapshot.from_detection(None, seq=8, timestamp=101.0, previous=previous)
+        self.assertFalse(snapshot.face_found)
+        self.assertEqual(snapshot.seq, 8)
+        self.assertEqual(snapshot.labels(), previous.labels())
+        self.assertEqual(snapshot.eye_closure, 0.1)
+        first = PerceptionSnapshot.from_detection(None, seq=0, timestamp=99.0)
+        self.assertEqual(first.emotion, UNKNOWN)
+        self.assertEqual(first.emotion_label, "Neutral")
+
+    def test_immutable(self):
+        snapshot = PerceptionSnapshot.from_detection(DETECTION, seq=7, timestamp=100.0)
+        with self.assertRaises(AttributeError):
+            snapshot.emotion = EMOTION_MAPPING["Sad"]
+        with self.assertRaises(AttributeError):
+            del snapshot.seq
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import contextlib
+import io
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from rl_framework import state_codec
+from rl_framework.batch_trainer import BatchTrainer
+from rl_framework.compiled_environment import CompiledEnvironment
+from rl_framework.constant_actions import get_all_actions
+from rl_framework.environment import Environment
+from rl_framework.q_learning import QLearning
+from rl_framework.state import (EmotionalState, EngagementLevel, Mode, PromptNecessity, ResponseLength,
+                                ResponseQuality, State, VocabularyUsage)
+
+
+def quiet_agent(**kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return QLearning(get_all_actions(), **kwargs)
+
+
+class TestStateCodec(unittest.TestCase):
+
+    def test_every_state_has_a_distinct_index(self):
+        states = state_codec.all_states()
+        self.assertEqual(len(states), 2289)
+        self.assertEqual(len(set(states)), len(states))
+        for index, state in enumerate(states):
+            self.assertEqual(state_codec.encode(state), index)
+            self.assertEqual(state_codec.encode_key(state.to_tuple()), index)
+
+    def test_array_digits(self):
+        indices = np.arange(state_codec.N_INTERACTION)
+        digits = state_codec.to_digits(indices, state_codec.INTERACTION_RADICES)
+        np.testing.assert_array_equal(state_codec.from_digits(digits, state_codec.INTERACTION_RADICES), indices)
+
+
+class TestQLearning(unittest.TestCase):
+
+    def test_migrates_pickled_table(self):
+        state = State(Mode.NARRATION, EngagementLevel.LOW, EmotionalState.SAD)
+        legacy = {state.to_tuple(): [float(i) for i in range(10)], ("Unknown", "x", "y"): [0.0] * 10}
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy_path = os.path.join(tmp, "q_table.pkl")
+            npy_path = os.path.join(tmp, "q_table.npy")
+            with open(legacy_path, "wb") as file:
+                pickle.dump(legacy, file)
+
+            agent = quiet_agent(q_table_path=npy_path, legacy_q_table_path=legacy_path)
+            self.assertEqual(agent.q_table.dtype, np.float32)
+            self.assertEqual(agent._get_q_values(state).tolist(), list(range(10)))
+            self.assertIs(agent.get_best_action(state), agent.actions[9])
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent.save_q_table()
+            reloaded = quiet_agent(q_table_path=npy_path, legacy_q_table_path=None)
+            np.testing.assert_array_equal(reloaded.q_table, agent.q_table)
+
+    def test_update_rule(self):
+        agent = quiet_agent(q_table_path="", legacy_q_table_path=None, alpha=0.5, gamma=0.9)
+        state = State(Mode.NARRATION, EngagementLevel.HIGH, EmotionalState.HAPPY)
+        next_state = State(Mode.NARRATION, EngagementLevel.LOW, EmotionalState.ANGER)
+        agent.q_table[state_codec.encode(next_state), 2] = 1.0
+        agent.update_q_value(state, agent.actions[4], 0.5, next_state)
+        self.assertAlmostEqual(float(agent._get_q_values(state)[4]), 0.5 * (0.5 + 0.9 * 1.0))
+
+
+class TestBatchTrainer(unittest.TestCase):
+
+    def setUp(self):
+        self.agent = quiet_agent(q_table_path="", legacy_q_table_path=None)
+        self.trainer = BatchTrainer(self.agent, Environment(self.agent), seed=3)
+
+    def test_vocabulary_transition_probabilities(self):
+        state = State(Mode.INTERACTION, EngagementLevel.HIGH, EmotionalState.FEAR, ResponseQuality.AVERAGE,
+                      PromptNecessity.NO, ResponseLength.LONG, VocabularyUsage.MEDIUM)
+        states = np.full(100000, state_codec.encode(state))
+        radices = state_codec.INTERACTION_RADICES
+        vocabulary = state_codec.FIELD_DIGIT["vocabulary_usage"]
+
+        lexical = self.trainer.transition(states, np.zeros_like(states))
+        shares = np.bincount(state_codec.to_digits(lexical - state_codec.INTERACTION_OFFSET, radices)[vocabulary]) / len(states)
+        np.testing.assert_allclose(shares, [0.3, 0.4, 0.3], atol=0.01)
+
+        no_intervention = self.trainer.transition(states, np.full_like(states, 9))
+        unchanged = state_codec.to_digits(no_intervention - state_codec.INTERACTION_OFFSET, radices)[vocabulary]
+        self.assertTrue((unchanged == 1).all())
+
+        narration = self.trainer.transition(np.full(1000, 5), np.zeros(1000, dtype=np.int64))
+        self.assertTrue((narration < state_codec.N_NARRATION).all())
+
+    def test_batch_update_matches_sequential_updates(self):
+        states = np.array([3, 3, 40])
+        actions = np.array([1, 1, 2])
+        next_states = np.array([7, 7, 50])
+        self.trainer.update(states, actions, np.array([0.5, 0.5, 1.0]), next_states)
+
+        sequential = quiet_agent(q_table_path="", legacy_q_table_path=None)
+        for s, a, r, n in zip(states, actions, (0.5, 0.5, 1.0), next_states):
+            sequential.update_q_index(s, a, r, n)
+        np.testing.assert_allclose(self.agent.q_table, sequential.q_table, atol=1e-6)
+
+
+class TestCompiledEnvironment(unittest.TestCase):
+
+    def setUp(self):
+        self.actions = get_all_actions()
+        self.compiled = CompiledEnvironment(self.actions)
+
+    def test_rewards(self):
+        sad_and_lost = State(Mode.INTERACTION, EngagementLevel.LOW, EmotionalState.ANGER, ResponseQuality.WEAK,
+                             PromptNecessity.YES, ResponseLength.SHORT, VocabularyUsage.MEDIUM)
+        rewards = self.compiled.rewards[state_codec.encode(sad_and_lost)]
+        self.assertAlmostEqual(rewards[0], 0.25 - 0.2 - 0.2)
+        self.assertAlmostEqual(rewards[6], 0.25 - 0.2 - 0.2 + 0.5)
+        happy = State(Mode.NARRATION, EngagementLevel.HIGH, EmotionalState.HAPPY)
+        self.assertAlmostEqual(self.compiled.rewards[state_codec.encode(happy), 6], 0.5 - 0.3)
+
+    def test_transition_kernels(self):
+        np.testing.assert_allclose(self.compiled.kernels.sum(axis=1), 1.0)
+        state = State(Mode.INTERACTION, EngagementLevel.HIGH, EmotionalState.HAPPY, ResponseQuality.STRONG,
+                      PromptNecessity.NO, ResponseLength.LONG, VocabularyUsage.LOW)
+        probabilities = self.compiled.transition_probabilities(state_codec.encode(state), 0)
+        vocabulary = state_codec.to_digits(np.arange(state_codec.N_INTERACTION), state_codec.INTERACTION_RADICES)[5]
+        interaction = probabilities[state_codec.INTERACTION_OFFSET:]
+        self.assertAlmostEqual(interaction[vocabulary == 0].sum(), 0.7)
+        self.assertAlmostEqual(interaction[vocabulary == 1].sum(), 0.3)
+        self.assertEqual(probabilities[:state_codec.N_NARRATION].sum(), 0.0)
+
+        next_state = Environment(quiet_agent(q_table_path="", legacy_q_table_path=None)).transition(state, self.actions[9])
+        self.assertEqual(next_state.vocabulary_usage, VocabularyUsage.LOW)
+
+    def test_draws_near_one_stay_in_the_kernel_support(self):
+        class AlmostOne:
+            def random(self, n):
+                return np.full(n, np.nextafter(1.0, 0.0))
+
+        narration = state_codec.encode(State(Mode.NARRATION, EngagementLevel.HIGH, EmotionalState.HAPPY))
+        states = np.full(self.compiled.n_actions, narration)
+        next_states = self.compiled.sample(states, np.arange(self.compiled.n_actions), AlmostOne())
+        np.testing.assert_array_equal(next_states, state_codec.N_NARRATION - 1)
+        for kernel, cdf in zip(self.compiled.kernels, self.compiled.cdf):
+            self.assertEqual(cdf[np.flatnonzero(kernel)[-1]], 1.0)
+
+    def test_value_iteration_is_a_fixed_point(self):
+        q_values = self.compiled.value_iteration(gamma=0.9, tolerance=1e-9)
+        dense = self.compiled.kernels[self.compiled.kernel_index]
+        backup = self.compiled.expected_rewards() + 0.9 * dense @ q_values.max(axis=1)
+        np.testing.assert_allclose(backup, q_values, atol=1e-7)
+
+
+if __name__ == "__main__":
+    unittest.main()
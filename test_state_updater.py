@@ -0,0 +1,196 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+
+from detector_model.reading_ring import ReadingRing, aggregate_readings
+from detector_model.state_updater import EMOTION_MAPPING, GAZE_MAPPING, HEAD_POSE_MAPPING, StateUpdater
+from rl_framework.state import EmotionalState, EngagementLevel, Mode
+
+
+class TestStateUpdaterWindows(unittest.TestCase):
+
+    def test_time_window_expires_old_readings(self):
+        updater = StateUpdater(window_seconds=10.0)
+        for t in range(0, 100):
+            updater.add_reading("Front", "Front", "Looking Center", "Sad" if t < 60 else "Happy",
+                                0.5, timestamp=t * 0.1)
+        self.assertEqual(updater.aggregate_emotion()[0], EMOTION_MAPPING["Sad"])
+        updater.add_reading("Front", "Front", "Looking Center", "Happy", 0.5, timestamp=16.0)
+        # Only readings from 6 s on are left: the last 41 "Happy" ones.
+        self.assertEqual(len(updater.window()), 41)
+        self.assertEqual(updater.aggregate_emotion()[0], EMOTION_MAPPING["Happy"])
+        self.assertEqual(len(updater.window(now=30.0)), 0)
+        self.assertEqual(updater.aggregate_emotion(now=30.0), (EMOTION_MAPPING["Neutral"], 0.0))
+
+    def test_decay_follows_a_change(self):
+        updater = StateUpdater(half_life=5.0)
+        for t in range(60):
+            updater.add_reading("Front", "Front", "Looking Center", "Sad", 0.4, timestamp=t)
+        for t in range(60, 66):
+            updater.add_reading("Front", "Front", "Looking Center", "Happy", 0.8, timestamp=t)
+        # Six recent readings outweigh a minute of older ones.
+        emotion, conf = updater.aggregate_emotion()
+        self.assertEqual(emotion, EMOTION_MAPPING["Happy"])
+        self.assertAlmostEqual(conf, 0.8, places=5)
+        # Readings older than DECAY_HORIZON half-lives are left out.
+        self.assertEqual(updater.window()["timestamp"].min(), 15.0)
+
+    def test_count_window_restarts_after_maybe_update(self):
+        updater = StateUpdater(update_interval=0, window_size=10)
+        for _ in range(5):
+            updater.add_reading("Left", "Front", "Looking Center", "Sad", 0.4)
+        updater.maybe_update()
+        self.assertEqual(len(updater.window()), 0)
+        updater.add_reading("Right", "Front", "Looking Center", "Happy", 0.9)
+        self.assertEqual(updater.aggregate_head_pose()[0], HEAD_POSE_MAPPING["Right"])
+        self.assertEqual(len(updater.readings), 6)
+
+    def test_state_matches_summary_of_the_window(self):
+        updater = StateUpdater(half_life=10.0)
+        rng = random.Random(3)
+        for t in range(200):
+            updater.add_reading(rng.choice(list(HEAD_POSE_MAPPING)), "Front",
+                                rng.choice(list(GAZE_MAPPING)), rng.choice(list(EMOTION_MAPPING)),
+                                rng.random(), timestamp=t * 0.5, eye_closure=rng.random())
+        now = 99.5
+        summary = updater.summary(since=now - 100.0, half_life=10.0, now=now)
+        aggregate = updater.aggregate(now)
+        self.assertEqual(aggregate.keys(), summary.keys())
+        # Running sums and the vectorized pass agree up to float rounding.
+        for key, value in summary.items():
+            self.assertAlmostEqual(aggregate[key], value, places=9, msg=key)
+
+    def test_running_counts_follow_the_window(self):
+        # The running counts must match a fresh pass over the window after
+        # appends, evictions by count, by time, by decay and by ring wraparound.
+        rng = random.Random(7)
+        for options in ({"window_size": 20}, {"window_seconds": 5.0}, {"half_life": 1.0},
+                        {"half_life": 0.05}, {"window_seconds": 1e6, "session_capacity": 64}):
+            updater = StateUpdater(**options)
+            t = 0.0
+            for _ in range(500):
+                t += rng.choice((0.05, 0.3, 2.0))
+                updater.add_reading(rng.choice(list(HEAD_POSE_MAPPING) + ["Tilted"]), "Front",
+                                    rng.choice(list(GAZE_MAPPING)), rng.choice(list(EMOTION_MAPPING)),
+                                    rng.choice((None, rng.random())), timestamp=t,
+                                    blink_rate=rng.choice((None, 15.0)))
+                half_life = options.get("half_life")
+                expected = aggregate_readings(updater.window(), half_life, t)
+                aggregate = updater.aggregate()
+                for key, value in expected.items():
+                    if value is None:
+                        self.assertIsNone(aggregate[key], (options, key))
+                    else:
+                        self.assertAlmostEqual(aggregate[key], value, places=6, msg=(options, key))
+
+
+class TestStateUpdater(unittest.TestCase):
+
+    def test_aggregates_last_window(self):
+        updater = StateUpdater(window_size=4)
+        for _ in range(4):
+            updater.add_reading("Left", "Up", "Looking Center", "Sad", 0.4)
+        for conf in (0.8, 0.6, 0.7):
+            updater.add_reading("Slight Right", "Front", "Looking Center", "Happy", conf)
+        # Only one "Left" reading is left in the window.
+        self.assertEqual(updater.aggregate_head_pose(),
+                         (HEAD_POSE_MAPPING["Slight Right"], HEAD_POSE_MAPPING["Front"]))
+        emotion, conf = updater.aggregate_emotion()
+        self.assertEqual(emotion, EMOTION_MAPPING["Happy"])
+        self.assertAlmostEqual(conf, 0.7)
+
+    def test_labels_are_encoded_case_insensitively(self):
+        updater = StateUpdater()
+        # Detector and FER spellings, as produced at runtime.
+        updater.add_reading("Front", "Front", "Looking Left", "happy", 0.9)
+        updater.add_reading("Front", "Front", "Looking Left", "happy", 0.7)
+        self.assertEqual(updater.aggregate_gaze(), GAZE_MAPPING["Looking Left"])
+        self.assertEqual(updater.aggregate_emotion()[0], EMOTION_MAPPING["Happy"])
+        summary = updater.summary()
+        self.assertEqual(summary["gaze"], GAZE_MAPPING["Looking Left"])
+        self.assertAlmostEqual(summary["emotion_conf"], 0.8, places=5)
+
+    def test_dump_session(self):
+        updater = StateUpdater(session_capacity=4)
+        for t in range(6):
+            updater.add_reading("Left", "Up", "Blinking", "Sad", 0.5, timestamp=float(t))
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = ReadingRing.load(updater.dump_session(os.path.join(tmp, "session.npy")))
+        self.assertEqual(rows["timestamp"].tolist(), [2.0, 3.0, 4.0, 5.0])
+        self.assertTrue((rows["gaze"] == GAZE_MAPPING["Blinking"]).all())
+
+    def test_subscribers_get_debounced_changes(self):
+        updater = StateUpdater(half_life=5.0, debounce=1.0, min_dwell=3.0)
+        changes = []
+        updater.subscribe(changes.append)
+        t = 0.0
+        for _ in range(10):
+            updater.add_reading("Front", "Front", "Looking Center", "Happy", 0.9, timestamp=t)
+            t += 0.5
+        self.assertEqual(len(changes), 1)  # Held for 1 s, then accepted
+        self.assertEqual(changes[0].timestamp, 1.0)
+
+        # A single distracted reading does not outweigh the history.
+        updater.add_reading("Left", "Front", "Looking Center", "Sad", 0.2, timestamp=t)
+        self.assertEqual(len(changes), 1)
+
+        # Sustained sadness wins once it has held for the debounce time.
+        for _ in range(20):
+            t += 0.5
+            updater.add_reading("Left", "Front", "Looking Center", "Sad", 0.2, timestamp=t)
+        self.assertEqual(len(changes), 2)
+        self.assertEqual(changes[1].current.emotional_state.value, "Sad")
+        self.assertGreaterEqual(changes[1].timestamp - changes[0].timestamp, 3.0)
+        self.assertIs(updater.get_current_state(), changes[1].current)
+
+    def test_perception_keeps_the_response_fields(self):
+        updater = StateUpdater(half_life=5.0, debounce=1.0, min_dwell=0.0)
+        changes = []
+        updater.subscribe(changes.append)
+        story = updater.update_state_from_story(
+            Mode.INTERACTION, "why did the big dog drop his meat into the river water today")
+        self.assertTrue(story.wh_question_detected)
+        t = time.time()
+        for _ in range(6):
+            # Looking away: on its own this would be an INTERACTION placeholder State.
+            updater.add_reading("Front", "Front", "Looking Left", "Happy", 0.9, timestamp=t)
+            t += 0.5
+        state = updater.get_current_state()
+        self.assertEqual(changes[-1].source, "perception")
+        self.assertEqual(state.emotional_state, EmotionalState.HAPPY)
+        self.assertEqual(state.engagement_level, EngagementLevel.HIGH)
+        self.assertEqual(state.mode, Mode.INTERACTION)
+        for field in ("response_quality", "prompt_necessity", "response_length",
+                      "vocabulary_usage", "wh_question_detected"):
+            self.assertEqual(getattr(state, field), getattr(story, field), field)
+
+    def test_reset_starts_a_new_session(self):
+        updater = StateUpdater(half_life=5.0, debounce=1.0)
+        changes = []
+        updater.subscribe(changes.append)
+        for t in range(10):
+            updater.add_reading("Front", "Front", "Looking Center", "Sad", 0.9, timestamp=float(t))
+        updater.add_reading("Front", "Front", "Looking Center", "Happy", 0.9, timestamp=10.0)
+        self.assertIsNotNone(updater.current_state)
+        updater.reset()
+        self.assertIsNone(updater.current_state)
+        self.assertEqual(len(updater.readings), 0)
+        self.assertEqual(updater.aggregate()["readings"], 0)
+        # The next child's first readings are not held against the last one's
+        # pending candidate, and subscribers are still called.
+        for t in range(20, 23):
+            updater.add_reading("Front", "Front", "Looking Center", "Happy", 0.9, timestamp=float(t))
+        self.assertEqual(changes[-1].previous, None)
+        self.assertEqual(changes[-1].timestamp, 21.0)
+        self.assertEqual(updater.aggregate()["readings"], 3)
+
+    def test_update_on_reading(self):
+        updater = StateUpdater(update_on_reading=True)
+        updater.add_reading("Front", "Front", "Looking Center", "Neutral", 0.9)
+        self.assertIsNotNone(updater.current_state)
+
+
+if __name__ == "__main__":
+    unittest.main()
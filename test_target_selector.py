@@ -0,0 +1,79 @@
+import unittest
+
+from detector_model.target_selector import TargetSelector
+
+FRAME_SHAPE = (480, 640)
+
+
+class Box:
+    """The dlib.rectangle accessors TargetSelector uses."""
+
+    def __init__(self, left, top, right, bottom):
+        self._box = (left, top, right, bottom)
+
+    def left(self):
+        return self._box[0]
+
+    def top(self):
+        return self._box[1]
+
+    def right(self):
+        return self._box[2]
+
+    def bottom(self):
+        return self._box[3]
+
+
+CHILD = Box(100, 100, 200, 200)
+CHILD_MOVED = Box(300, 120, 400, 220)  # No overlap with CHILD
+TEACHER = Box(400, 50, 560, 210)  # Larger than the child
+
+
+class TestTargetSelector(unittest.TestCase):
+
+    def test_largest_and_central(self):
+        self.assertIs(TargetSelector("largest").select([CHILD, TEACHER], FRAME_SHAPE), TEACHER)
+        central = Box(270, 190, 370, 290)
+        self.assertIs(TargetSelector("central").select([TEACHER, central], FRAME_SHAPE), central)
+
+    def test_tracked_keeps_the_child_when_someone_larger_enters(self):
+        selector = TargetSelector("tracked")
+        self.assertIs(selector.select([CHILD], FRAME_SHAPE, timestamp=0.0), CHILD)
+        nudged = Box(110, 105, 210, 205)
+        self.assertIs(selector.select([TEACHER, nudged], FRAME_SHAPE, timestamp=1.0), nudged)
+        self.assertEqual(selector.acquisitions, 1)
+
+    def test_single_face_is_taken_after_a_jump(self):
+        # Samples are seconds apart: the child moved, and is the only face.
+        selector = TargetSelector("tracked")
+        selector.select([CHILD], FRAME_SHAPE, timestamp=0.0)
+        self.assertIs(selector.select([CHILD_MOVED], FRAME_SHAPE, timestamp=5.0), CHILD_MOVED)
+        self.assertEqual(selector.target_box, (300, 120, 400, 220))
+
+    def test_lost_then_reacquired_after_lost_seconds(self):
+        selector = TargetSelector("tracked", lost_seconds=3.0)
+        selector.select([CHILD], FRAME_SHAPE, timestamp=0.0)
+        # Child gone, two other people in frame: wait for the child...
+        others = [TEACHER, CHILD_MOVED]
+        self.assertIsNone(selector.select(others, FRAME_SHAPE, timestamp=1.0))
+        self.assertIsNone(selector.select([], FRAME_SHAPE, timestamp=2.0))
+        self.assertIsNone(selector.select(others, FRAME_SHAPE, timestamp=3.5))
+        # ...until lost_seconds have passed since the first miss.
+        self.assertIs(selector.select(others, FRAME_SHAPE, timestamp=4.5), TEACHER)
+        self.assertEqual(selector.acquisitions, 2)
+
+    def test_match_clears_the_lost_timer(self):
+        selector = TargetSelector("tracked", lost_seconds=3.0)
+        selector.select([CHILD], FRAME_SHAPE, timestamp=0.0)
+        selector.select([TEACHER, CHILD_MOVED], FRAME_SHAPE, timestamp=1.0)
+        selector.select([TEACHER, CHILD], FRAME_SHAPE, timestamp=2.0)
+        self.assertIsNone(selector.lost_since)
+        self.assertIsNone(selector.select([TEACHER, CHILD_MOVED], FRAME_SHAPE, timestamp=4.5))
+
+    def test_rejects_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            TargetSelector("nearest")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,7 @@
 import random
 from rl_framework.q_learning import QLearning
 from rl_framework.environment import Environment
-from rl_framework.trainer import Trainer
+from rl_framework.batch_trainer import BatchTrainer
 from rl_framework.constant_actions import get_all_actions
 
 all_actions = get_all_actions()
@@ -12,9 +12,9 @@ q_learning_agent = QLearning(all_actions)
 # Create the environment
 environment = Environment(q_learning_agent)
 
-# Initialize Trainer with the agent and environment
-trainer = Trainer(q_learning_agent, environment,
-                  num_episodes=100000, steps_per_episode=10)
+# Initialize the batched Trainer with the agent and environment
+trainer = BatchTrainer(q_learning_agent, environment,
+                       num_episodes=100000, steps_per_episode=10, batch_size=1000)
 
 # Load previous Q-table if available
 print("\nLoading existing Q-table (if available)...")
@@ -4,6 +4,7 @@ import requests
 import time
 import random
 import json
+import os
 
 from .login import build_teacher_verification_frame
 from .std_selection import build_student_selection_frame
@@ -19,13 +20,26 @@ from rl_framework.state import EngagementLevel, Mode, PromptNecessity
 from rl_framework.q_learning import QLearning
 from rl_framework.constant_actions import get_all_actions
 from rl_framework.environment import Environment
-from .speech_text import listen_for_child_response
+from .speech_text import listen_for_child_response, load_model as load_speech_model
+from .model_loader import ModelLoader
 from .triall import speak_text
 
 from ui_assets.evaluator import ResponseEvaluator
 from detector_model.state_updater import StateUpdater
 from serial_communication.robot_comm import execute_combo, init_serial
 
+# Perception snapshots older than this (seconds since capture) are not fed to
+# the state updater; the analysis interval can reach 2 x 5 s while TTS runs.
+SNAPSHOT_MAX_AGE = 12.0
+# Perception state: decayed evidence (half-life in seconds); a new State must
+# hold for STATE_DEBOUNCE seconds and the previous one for STATE_MIN_DWELL.
+STATE_HALF_LIFE = 10.0
+STATE_DEBOUNCE = 2.0
+STATE_MIN_DWELL = 5.0
+# Each session's perception readings are saved here as a .npy file (see
+# StateUpdater.dump_session); None disables it.
+SESSION_READINGS_DIR = "session_readings"
+
 
 def speak_and_execute_async(text, combo_name, ser):
         # threading.Thread(target=speak_text, args=(text,), daemon=True).start()
@@ -43,13 +57,25 @@ def speak_and_execute_async(text, combo_name, ser):
         t_combo.join()
 
 class MyApp:
-    def __init__(self, page: ft.Page):
+    def __init__(self, page: ft.Page, started_at=None):
+        # started_at: time.perf_counter() taken when the process started, so
+        # the startup report includes import time.
+        self.startup_started = started_at if started_at is not None else time.perf_counter()
+        self.startup_reported = False
         self.page = page
+        self.page.on_disconnect = self.on_close
         self.frames = {}
         self.current_frame = None
         self.teacher_id = None
         self.username = None
         self.create_frames()
+
+        # Heavy models load in the background while the teacher logs in and
+        # picks a student; the Loading frame waits on self.models.
+        self.models = ModelLoader()
+        self.models.register("speech", load_speech_model)
+        self.models.register("perception", self.frames["Storytelling"].load_models)
+        self.models.start()
         all_actions = get_all_actions()
 
         # Load Story and Prompts
@@ -59,7 +85,17 @@ class MyApp:
         with open("dataset/prompts.json", "r", encoding="utf-8") as f:
             self.prompt_manager = PromptManager(json.load(f))
 
-        self.state_updater = StateUpdater(update_interval=2)
+        # Perception readings refine engagement and emotion of the State that
+        # update_state_from_story builds from the child's answers.
+        self.state_updater = StateUpdater(
+            update_interval=2, half_life=STATE_HALF_LIFE, debounce=STATE_DEBOUNCE,
+            min_dwell=STATE_MIN_DWELL)
+        self.last_snapshot_seq = None
+        self.snapshot_lock = threading.Lock()
+        # Set by on_state_change; the storytelling loop waits on it between
+        # sentences instead of sleeping, so a change is acted on at once.
+        self.state_changed = threading.Event()
+        self.state_updater.subscribe(self.on_state_change)
 
         self.q_learning_agent = QLearning(all_actions)
         self.environment = Environment(self.q_learning_agent)
@@ -75,6 +111,9 @@ class MyApp:
         self.serial_conn = init_serial()
 
 
+    def on_close(self, e=None):
+        """Stop the perception worker when the window closes, so its shared memory is freed."""
+        self.frames["Storytelling"].shutdown()
 
     def create_frames(self):
         self.frames["TeacherVerification"] = build_teacher_verification_frame(
@@ -93,6 +132,12 @@ class MyApp:
             frame.visible = (name == frame_name)
         self.current_frame = frame_name
         self.page.update()
+        if not self.startup_reported:
+            # The first screen is usable from here on; the rest of __init__
+            # and the model loading continue behind it.
+            self.startup_reported = True
+            print(f"Startup: first interactive screen after "
+                  f"{time.perf_counter() - self.startup_started:.2f}s")
         frame_obj = self.frames[frame_name]
         if hasattr(frame_obj, "on_mount") and callable(getattr(frame_obj, "on_mount", None)):
             frame_obj.on_mount()
@@ -182,6 +227,7 @@ class MyApp:
     def initial_interaction(self, storytelling_frame, total_prompts_given, total_prompts_answered, all_states):
         print("Inside getting to know you")
         """Initial interaction where TellO asks for the child's name and how they are."""
+        self.set_analysis_mode(Mode.INTERACTION)
 
         intro_interaction_prompt = self.prompt_manager.get_random_prompt(
             "Getting to Know You")
@@ -228,6 +274,7 @@ class MyApp:
             all_states.append(current_state)
 
         execute_combo(self.serial_conn, "narration")
+        self.set_analysis_mode(Mode.NARRATION)
         time.sleep(1)
         return total_prompts_given, total_prompts_answered
 
@@ -245,7 +292,7 @@ class MyApp:
             # Narrate the sentence
             speak_text(sentence["Text"])
             current_sentence = sentence["Text"]
-            time.sleep(1)
+            self.state_changed.wait(timeout=1)
 
             # RL-based decision-making
             total_prompts_given, total_prompts_answered = self.handle_rl_decision(
@@ -254,16 +301,62 @@ class MyApp:
             # Move to the next sentence
             sentence = self.story.get_next_sentence()
 
+    def set_analysis_mode(self, mode):
+        """Tell the perception scheduler whether a prompt or narration is running."""
+        storytelling_frame = self.frames.get("Storytelling")
+        if storytelling_frame is not None:
+            storytelling_frame.scheduler.set_interaction(mode == Mode.INTERACTION)
+
     def update_engagement_state(self, storytelling_frame, all_states):
-        """Updates the state based on head pose, gaze, and emotions."""
-        horizontal, vertical = storytelling_frame.get_head_pose()
-        gaze = storytelling_frame.get_gaze()
-        emotion_idx, emotion_conf = storytelling_frame.get_emotion()
+        """Updates the state based on head pose, gaze, and emotions.
 
-        self.state_updater.add_reading(
-            horizontal, vertical, gaze, emotion_idx, emotion_conf)
+        Snapshots are normally pushed by update_storytelling_state as they are
+        analyzed; this only catches one that was not fed yet.
+        """
+        snapshot = storytelling_frame.get_snapshot()
+        if snapshot is None:
+            print("No perception snapshot yet; engagement reading skipped.")
+        else:
+            self.feed_snapshot(snapshot)
         all_states.append(self.state_updater.get_current_state())
 
+    def feed_snapshot(self, snapshot):
+        """Adds one perception snapshot to the state updater; False if skipped.
+
+        Reads one snapshot, so all labels come from the same frame. Snapshots
+        without a face (whose labels are the last face's), already fed or
+        older than SNAPSHOT_MAX_AGE are skipped.
+        """
+        if not snapshot.face_found:
+            return False
+        with self.snapshot_lock:
+            if snapshot.seq == self.last_snapshot_seq:
+                return False
+            if snapshot.age() > SNAPSHOT_MAX_AGE:
+                print(f"Perception snapshot {snapshot.seq} is stale ({snapshot.age():.1f}s); skipped.")
+                return False
+            self.last_snapshot_seq = snapshot.seq
+        self.state_updater.add_codes(
+            snapshot.horizontal, snapshot.vertical, snapshot.gaze, snapshot.emotion,
+            snapshot.emotion_confidence, snapshot.timestamp, snapshot.blink_rate,
+            snapshot.eye_closure)
+        return True
+
+    def reset_session_readings(self):
+        """Start a new child's session with no readings, State or fed snapshot.
+
+        The app and its StateUpdater outlive a session, so without this the
+        next child's saved readings and State would start from the previous one's.
+        """
+        self.state_updater.reset()
+        with self.snapshot_lock:
+            self.last_snapshot_seq = None
+        self.state_changed.clear()
+
+    def on_state_change(self, change):
+        """StateUpdater subscriber; runs on the thread that fed the reading."""
+        self.state_changed.set()
+
     def update_story_image(self, storytelling_frame):
         """Updates the UI with the current story image."""
         image_file = self.story.get_current_image()
@@ -273,13 +366,18 @@ class MyApp:
 
     def handle_rl_decision(self, storytelling_frame, all_states, total_prompts_given, total_prompts_answered, current_sentence):
         """Handles RL-based decision making for interaction."""
+        # The state updater pushes every change, so this is the latest State.
+        self.state_changed.clear()
         current_state = self.state_updater.get_current_state()
+        if current_state is None:
+            current_state = self.state_updater.update_state_from_story(Mode.NARRATION, "")
         chosen_action = self.q_learning_agent.get_best_action(current_state)
 
         if chosen_action.action_type == "No-Intervention":
             print("RL Decision: Continue narration.")
 
         elif chosen_action.action_type == "Clarification":
+            self.set_analysis_mode(Mode.INTERACTION)
             total_prompts_given += 1
             # execute_combo(self.serial_conn, "agree")
             # speak_text("Do you understand this part?")
@@ -313,6 +411,7 @@ class MyApp:
                 speak_and_execute_async(text, "motivation", self.serial_conn)
 
             execute_combo(self.serial_conn, "narration")
+            self.set_analysis_mode(Mode.NARRATION)
             self.update_interaction_state(response, all_states)
 
         elif chosen_action.action_type == "Lexical-Syntactic":
@@ -341,6 +440,7 @@ class MyApp:
             # Proceed to fun questions if no new vocab word to explain
             fun_questions = self.story.get_fun_questions()
             if fun_questions:
+                self.set_analysis_mode(Mode.INTERACTION)
                 selected_question = random.choice(fun_questions)
                 # execute_combo(self.serial_conn, "prompt")
                 # speak_text(selected_question)
@@ -375,12 +475,14 @@ class MyApp:
                     speak_and_execute_async(text, "disagree", self.serial_conn)
 
                 execute_combo(self.serial_conn, "narration")
+                self.set_analysis_mode(Mode.NARRATION)
                 self.update_interaction_state(response, all_states)
 
         return total_prompts_given, total_prompts_answered
 
     def collect_child_understanding(self):
         """Collects the final understanding of the child after storytelling."""
+        self.set_analysis_mode(Mode.INTERACTION)
         # execute_combo(self.serial_conn, "prompt")
         # speak_text("Can you tell me what you understood about the story?")
         text = "Can you tell me what you understood about the story?"
@@ -418,6 +520,7 @@ class MyApp:
                     final_understanding.append(response)
 
         execute_combo(self.serial_conn, "narration")
+        self.set_analysis_mode(Mode.NARRATION)
         return " ".join(final_understanding)
 
     def perform_closure(self, storytelling_frame, all_states):
@@ -440,8 +543,20 @@ class MyApp:
         self.update_vocabulary_from_understanding(
             final_understanding_text, self.selected_student_id, self.session_id)
         self.save_report_to_db(evaluation_report, total_prompts_answered)
+        self.save_session_readings()
         # self.print_evaluation_summary(evaluation_report)
 
+    def save_session_readings(self):
+        """Dumps the session's perception readings to SESSION_READINGS_DIR."""
+        if SESSION_READINGS_DIR is None:
+            return
+        name = f"student{self.selected_student_id}_{time.strftime('%Y%m%d_%H%M%S')}.npy"
+        try:
+            path = self.state_updater.dump_session(os.path.join(SESSION_READINGS_DIR, name))
+            print("Session readings saved to", path)
+        except OSError as e:
+            print("Error saving session readings:", e)
+
     def update_interaction_state(self, response, all_states):
         """Updates the state based on the child's response."""
         current_state = self.state_updater.update_state_from_story(
@@ -522,7 +637,10 @@ class MyApp:
                     )  # Convert to set to avoid duplicates
         self.save_words_to_db(student_id, session_id, words)
 
-    def update_storytelling_state(self, detected_state):
-        """Update state in response to detected emotions, gaze, and head pose."""
-        # print("Updated Storytelling State:", detected_state)
-        # Here, you can use `detected_state` to update a state manager, log data, or adjust the RL system
+    def update_storytelling_state(self, snapshot):
+        """Update state in response to a new PerceptionSnapshot (emotion, gaze, head pose).
+
+        Called by the storytelling frame for every analysis with a face; the
+        state updater recomputes and notifies on_state_change if the State changed.
+        """
+        self.feed_snapshot(snapshot)
@@ -173,21 +173,30 @@ def build_loading_frame(app):
         visible=False
     )
 
-    # Define a synchronous on_show handler that schedules a frame transition after 3 seconds.
+    # Define a synchronous on_show handler that starts the session once the
+    # background models are ready.
     def on_show_sync():
-        app.frames["Storytelling"].start_video()
-        threading.Thread(
-            target=app.run_storytelling, 
-            args=(app.frames["Storytelling"],), 
-            daemon=True
-        ).start()
-
         # This function runs in a separate thread so as not to block the UI.
-        def switch_frame_after_delay():
-            time.sleep(2)
+        def start_when_ready():
+            start = time.perf_counter()
+            while not app.models.wait_ready(timeout=0.5):
+                if app.models.errors:
+                    text.value = "Could not load: " + ", ".join(app.models.errors)
+                    app.page.update()
+                    return
+                text.value = "Loading " + ", ".join(app.models.pending()) + "......"
+                app.page.update()
+            print(f"Loading frame waited {time.perf_counter() - start:.2f}s for models")
+
+            app.frames["Storytelling"].start_video()
+            threading.Thread(
+                target=app.run_storytelling,
+                args=(app.frames["Storytelling"],),
+                daemon=True
+            ).start()
             app.next_frame()
             app.page.update()
-        threading.Thread(target=switch_frame_after_delay, daemon=True).start()
+        threading.Thread(target=start_when_ready, daemon=True).start()
 
     full_screen_center.on_show = on_show_sync
 
@@ -0,0 +1,74 @@
+import threading
+import time
+
+
+class ModelLoader:
+    """Loads heavy models in background threads while login and student selection run.
+
+    Each model is registered with a zero-argument load function. start() runs
+    every loader on its own daemon thread; the Loading frame blocks on
+    wait_ready() instead of the app paying for the models at startup.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._events = {}
+        self._started = set()
+        self._lock = threading.Lock()
+        self.results = {}
+        self.errors = {}
+        self.load_times = {}
+
+    def register(self, name, load_fn):
+        """Add a model to load; load_fn's return value is kept in results[name]."""
+        with self._lock:
+            self._loaders[name] = load_fn
+            self._events[name] = threading.Event()
+
+    def start(self):
+        """Start loading every registered model that is not loading yet."""
+        with self._lock:
+            pending = [name for name in self._loaders if name not in self._started]
+            self._started.update(pending)
+        for name in pending:
+            threading.Thread(target=self._load, args=(name,), daemon=True).start()
+
+    def _load(self, name):
+        start = time.perf_counter()
+        try:
+            self.results[name] = self._loaders[name]()
+        except Exception as e:
+            print(f"Error loading model '{name}':", e)
+            self.errors[name] = e
+        finally:
+            self.load_times[name] = time.perf_counter() - start
+            print(f"Model '{name}' finished loading in {self.load_times[name]:.2f}s")
+            self._events[name].set()
+
+    def _names(self, names):
+        return list(self._events) if names is None else list(names)
+
+    def is_ready(self, names=None):
+        """True once the given models (all by default) loaded without error."""
+        return all(self._events[name].is_set() and name not in self.errors
+                   for name in self._names(names))
+
+    def pending(self, names=None):
+        """Names of the given models that are still loading."""
+        return [name for name in self._names(names) if not self._events[name].is_set()]
+
+    def wait_ready(self, names=None, timeout=None):
+        """Block until the given models finished loading or timeout expires.
+
+        Returns is_ready(names), so a model that failed to load gives False.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in self._names(names):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._events[name].wait(remaining):
+                return False
+        return self.is_ready(names)
+
+    def get(self, name):
+        """Result of a loaded model, or None if it is not ready."""
+        return self.results.get(name)
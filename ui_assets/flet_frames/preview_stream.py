@@ -0,0 +1,127 @@
+import base64
+import threading
+import time
+
+import cv2
+
+ENCODINGS = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+    "png": (".png", cv2.IMWRITE_PNG_COMPRESSION),
+}
+
+
+class PreviewStream:
+    """Low-overhead preview channel for the Flet video card.
+
+    Frames are mirrored and downscaled into reused buffers, encoded as JPEG or
+    WebP, and handed to a sender thread that runs page.update(). A frame is
+    dropped without being encoded if it comes sooner than max_fps allows or if
+    the previous page.update() has not finished.
+    """
+
+    def __init__(self, image_control, page, width=250, fmt="jpeg", quality=70, max_fps=15):
+        """
+        :param image_control: ft.Image whose src_base64 shows the preview.
+        :param page: Flet page to update.
+        :param width: Preview width in pixels; height follows the frame's aspect ratio.
+        :param fmt: "jpeg", "webp" or "png" (png only to compare against the old path).
+        :param quality: Encoder quality (0-100 for jpeg/webp, compression 0-9 for png).
+        :param max_fps: Preview rate cap, independent of the capture rate.
+        """
+        if fmt not in ENCODINGS:
+            raise ValueError(f"Unsupported preview format: {fmt}")
+        self.image_control = image_control
+        self.page = page
+        self.width = width
+        self.extension, quality_flag = ENCODINGS[fmt]
+        self.params = [quality_flag, quality]
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+
+        self._resized = None  # Reused downscale buffer
+        self._mirrored = None  # Reused mirror buffer
+        self._pending = None
+        self._last_sent = 0.0
+        self._in_flight = threading.Event()
+        self._wakeup = threading.Condition()
+        self.closed = False
+        self.frames_encoded = 0
+        self.frames_sent = 0
+        self.dropped_rate = 0
+        self.dropped_busy = 0
+        self.encode_cpu_time = 0.0
+        self._sender = threading.Thread(target=self._send_loop, daemon=True)
+        self._sender.start()
+
+    def push(self, frame):
+        """Offer a BGR frame to the preview; returns True if it was sent."""
+        now = time.monotonic()
+        if now - self._last_sent < self.min_interval:
+            self.dropped_rate += 1
+            return False
+        if self._in_flight.is_set():
+            self.dropped_busy += 1
+            return False
+
+        cpu_start = time.thread_time()
+        img_str = self._encode(frame)
+        self.encode_cpu_time += time.thread_time() - cpu_start
+        self.frames_encoded += 1
+        if img_str is None:
+            return False
+
+        self._last_sent = now
+        self._in_flight.set()
+        with self._wakeup:
+            self._pending = img_str
+            self._wakeup.notify()
+        return True
+
+    def _encode(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, int(self.width * height / width))
+        if self._resized is None or self._resized.shape[:2] != (size[1], size[0]):
+            self._resized = None
+            self._mirrored = None
+        # Downscale first so the mirror only touches the small image.
+        self._resized = cv2.resize(frame, size, dst=self._resized, interpolation=cv2.INTER_AREA)
+        self._mirrored = cv2.flip(self._resized, 1, dst=self._mirrored)
+        ok, encoded = cv2.imencode(self.extension, self._mirrored, self.params)
+        if not ok:
+            print("Warning: Preview frame could not be encoded.")
+            return None
+        return base64.b64encode(encoded).decode("ascii")
+
+    def _send_loop(self):
+        while not self.closed:
+            with self._wakeup:
+                while self._pending is None and not self.closed:
+                    self._wakeup.wait(0.5)
+                img_str, self._pending = self._pending, None
+            if img_str is None:
+                continue
+            try:
+                self.image_control.src_base64 = img_str
+                self.page.update()
+                self.frames_sent += 1
+            except RuntimeError as e:
+                print("RuntimeError during page.update() in preview:", e)
+                self.closed = True
+            finally:
+                self._in_flight.clear()
+
+    def close(self):
+        """Stop the sender thread."""
+        self.closed = True
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def stats(self):
+        """Frames sent and dropped, and encode CPU time per encoded frame in ms."""
+        encoded = self.frames_encoded or 1
+        return {
+            "frames_sent": self.frames_sent,
+            "dropped_rate_cap": self.dropped_rate,
+            "dropped_update_busy": self.dropped_busy,
+            "encode_cpu_ms_per_frame": round(self.encode_cpu_time * 1000 / encoded, 3),
+        }
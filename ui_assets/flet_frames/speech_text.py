@@ -34,12 +34,23 @@ def speak_text(text):
     print("Queued:", text)
     speech_queue.put(text)
 
-# Initialize Speech-to-Text (STT) using Vosk
+# Speech-to-Text (STT) using Vosk. The model is loaded on first use (or
+# ahead of time by the app's ModelLoader), not at import.
 MODEL_PATH = "speech_work/Resources/vosk-model-small-en-us-0.15"
-if not os.path.exists(MODEL_PATH):
-    raise FileNotFoundError(f"Model folder not found: {MODEL_PATH}")
-model = vosk.Model(MODEL_PATH)
+model = None
+_model_lock = threading.Lock()
 samplerate = 16000
+
+def load_model():
+    """Load the Vosk model once and return it; safe to call from any thread."""
+    global model
+    with _model_lock:
+        if model is None:
+            if not os.path.exists(MODEL_PATH):
+                raise FileNotFoundError(f"Model folder not found: {MODEL_PATH}")
+            model = vosk.Model(MODEL_PATH)
+    return model
+
 q = queue.Queue()
 
 def stt_callback(indata, frames, time_info, status):
@@ -57,7 +68,7 @@ def listen_for_child_response(timeout=60):
     while not q.empty():
         q.get()  
     
-    rec = vosk.KaldiRecognizer(model, samplerate)
+    rec = vosk.KaldiRecognizer(load_model(), samplerate)
     start_time = time.time()
     transcript = ""
 
@@ -8,7 +8,47 @@ from io import BytesIO
 from PIL import Image
 import requests
 import flet as ft
-from detector_model.head_gaze_emotion_detector import FaceAnalyzer, EmotionAnalyzer
+from detector_model.analysis_scheduler import AnalysisScheduler
+from detector_model.frame_bus import FrameBus
+from detector_model.perception_snapshot import PerceptionSnapshot
+from detector_model.perception_worker import PerceptionWorker, analyze_gray_frame
+from detector_model.motion_gate import MotionGate
+from detector_model.target_selector import TargetSelector
+from .preview_stream import PreviewStream
+from .triall import is_speaking
+
+PREDICTOR_PATH = "./detector_model/assets/shape_predictor_68_face_landmarks.dat"
+# Face detector backend: "hog" (dlib), "haar", "yunet" or "dnn". Compare them
+# on a classroom clip with python -m detector_model.benchmark --detectors ...
+FACE_DETECTOR = "hog"
+# Emotion CNN runtime: "keras" (FER, loads TensorFlow), or "onnx"/"opencv" once
+# the model was exported with python -m detector_model.export_emotion_model.
+EMOTION_RUNTIME = "keras"
+# Face analyzed when several people are in frame: "largest", "central" or
+# "tracked" (the child found first in the session).
+TARGET_POLICY = "tracked"
+# Skip analysis while nothing moves in the face region (mean grayscale
+# difference below MOTION_THRESHOLD), but never reuse labels for longer than
+# MOTION_MAX_REUSE seconds. Set MOTION_THRESHOLD to None to analyze every sample.
+MOTION_THRESHOLD = 4.0
+MOTION_MAX_REUSE = 15.0
+# Analysis rate (see AnalysisScheduler): ANALYSIS_INTERVAL seconds between
+# analyses during steady narration, faster during prompts or while labels
+# change, slower while TTS/STT run, and never above the CPU budget.
+ANALYSIS_INTERVAL = 5
+ANALYSIS_MIN_INTERVAL = 0.5
+ANALYSIS_INTERACTION_INTERVAL = 1.0
+ANALYSIS_CPU_BUDGET = 0.25  # Share of one core
+# Head pose is warm-started and smoothed across analyses up to the scheduler's
+# longest interval plus this slack for the analysis itself.
+POSE_GAP_SLACK = 1.0
+# Run dlib/FER in a worker process so they never compete with page.update(),
+# the TTS queue and the storytelling loop for the GIL.
+USE_PERCEPTION_PROCESS = True
+# Video card preview: encoding, quality and rate cap (independent of capture).
+PREVIEW_FORMAT = "jpeg"
+PREVIEW_QUALITY = 70
+PREVIEW_FPS = 15
 
 
 class StorytellingEmotionFrame(ft.Container):
@@ -19,20 +59,37 @@ class StorytellingEmotionFrame(ft.Container):
 
         # Video & detection state
         self.video_running = False
-        self.cap = None
 
-        self.last_horizontal_movement = "Center"
-        self.last_vertical_movement = "Center"
-        self.last_gaze_direction = "Forward"
-        self.last_emotion = "Neutral"
-        self.last_emotion_confidence = 0.0
-
-        # Shared variable for the latest frame.
-        self._latest_img_str = None
-
-        predictor_path = "./detector_model/assets/shape_predictor_68_face_landmarks.dat"
-        self.face_analyzer = FaceAnalyzer(predictor_path)
-        self.emotion_analyzer = EmotionAnalyzer()
+        # Latest analysis result. Replaced, never modified, so readers on other
+        # threads always see the labels of one frame; None until the first one.
+        self.snapshot = None
+
+        # Encodes and sends the video card preview; created by start_video.
+        self.preview = None
+
+        # One capture thread feeds both the preview and the analysis.
+        # The analyzers themselves are loaded by load_models(), which the app
+        # runs in the background while the teacher logs in.
+        self.face_analyzer = None
+        self.emotion_analyzer = None
+        self.target_selector = None
+        self.motion_gate = None
+        if MOTION_THRESHOLD is not None:
+            self.motion_gate = MotionGate(MOTION_THRESHOLD, max_reuse=MOTION_MAX_REUSE)
+        self.last_skip_rate = None
+        self.scheduler = AnalysisScheduler(
+            min_interval=ANALYSIS_MIN_INTERVAL, max_interval=ANALYSIS_INTERVAL,
+            interaction_interval=ANALYSIS_INTERACTION_INTERVAL,
+            cpu_budget=ANALYSIS_CPU_BUDGET, busy_fn=self.speech_busy)
+        if USE_PERCEPTION_PROCESS:
+            self.perception_worker = PerceptionWorker(
+                PREDICTOR_PATH, min_interval=ANALYSIS_INTERVAL, detector=FACE_DETECTOR,
+                emotion_runtime=EMOTION_RUNTIME, target_policy=TARGET_POLICY,
+                motion_gate=self.motion_gate, pose_max_gap=self.pose_max_gap())
+            self.frame_bus = FrameBus(source=1, ring=self.perception_worker.ring)
+        else:
+            self.perception_worker = None
+            self.frame_bus = FrameBus(source=1)
 
         # UI Widgets
         self.video_image = ft.Image(
@@ -51,17 +108,74 @@ class StorytellingEmotionFrame(ft.Container):
 
         self.content = self.build()
 
+    def load_models(self):
+        """Load the face and emotion models; blocks, so run it off the UI thread."""
+        if self.perception_worker is not None:
+            # The worker process loads dlib/FER itself and idles until frames arrive.
+            self.perception_worker.start()
+            if not self.perception_worker.wait_ready():
+                raise RuntimeError("Perception worker exited before loading its models.")
+            return self.perception_worker
+        # Imported here so the UI process only loads dlib/FER when it
+        # runs the analysis itself.
+        from detector_model.head_gaze_emotion_detector import FaceAnalyzer, EmotionAnalyzer
+        self.face_analyzer = FaceAnalyzer(PREDICTOR_PATH, detector=FACE_DETECTOR,
+                                          pose_max_gap=self.pose_max_gap())
+        self.emotion_analyzer = EmotionAnalyzer(mode="face", runtime=EMOTION_RUNTIME)
+        self.target_selector = TargetSelector(TARGET_POLICY)
+        return self.face_analyzer, self.emotion_analyzer
+
+    def pose_max_gap(self):
+        """Seconds between analyses over which head pose keeps its state."""
+        return self.scheduler.longest_interval() + POSE_GAP_SLACK
+
+    def reset_session(self):
+        """Forget the previous child's readings, blink calibration, head pose and target face."""
+        self.snapshot = None
+        self.app.reset_session_readings()
+        if self.perception_worker is not None:
+            self.perception_worker.reset_session()
+            return
+        if self.face_analyzer is not None:
+            self.face_analyzer.reset_session()
+        if self.target_selector is not None:
+            self.target_selector.reset()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+
+    def speech_busy(self):
+        """True while TTS is speaking or STT is listening."""
+        return is_speaking() or self.app.state == "listening"
+
+    @staticmethod
+    def detection_labels(detected_state):
+        if detected_state is None:
+            return None
+        return (detected_state["horizontal"], detected_state["vertical"],
+                detected_state["gaze"], detected_state["emotion"])
+
+    def get_snapshot(self):
+        """Returns the latest PerceptionSnapshot, or None before the first analysis."""
+        return self.snapshot
+
     def get_head_pose(self):
         """Returns the last detected head movement."""
-        return self.last_horizontal_movement, self.last_vertical_movement
+        snapshot = self.snapshot
+        if snapshot is None:
+            return "Front", "Front"
+        return snapshot.horizontal_label, snapshot.vertical_label
 
     def get_gaze(self):
         """Returns the last detected gaze direction."""
-        return self.last_gaze_direction
+        snapshot = self.snapshot
+        return "Looking Center" if snapshot is None else snapshot.gaze_label
 
     def get_emotion(self):
         """Returns the last detected emotion and its confidence."""
-        return self.last_emotion, self.last_emotion_confidence
+        snapshot = self.snapshot
+        if snapshot is None:
+            return "Neutral", 0.0
+        return snapshot.emotion_label, snapshot.emotion_confidence
 
     def monitor_app_state(self):
         prev_state = None
@@ -236,108 +350,112 @@ class StorytellingEmotionFrame(ft.Container):
 
     def start_video(self):
         if not self.video_running:
-            self.cap = cv2.VideoCapture(1)
-            if not self.cap.isOpened():
+            if self.perception_worker is not None:
+                # A worker stopped by end_storytelling restarts with a new ring.
+                self.perception_worker.start()
+                self.frame_bus.ring = self.perception_worker.ring
+            if not self.frame_bus.start():
                 print("Error: Unable to open webcam.")
                 return
+            self.reset_session()
             self.video_running = True
             print("Video capture started.")
-            threading.Thread(target=self.analyze_video_frame,
-                             daemon=True).start()
+            if self.perception_worker is not None:
+                analysis_target = self.consume_perception_results
+            else:
+                analysis_target = self.analyze_video_frame
+            threading.Thread(target=analysis_target, daemon=True).start()
+            self.preview = PreviewStream(
+                self.video_image, self.page, width=250, fmt=PREVIEW_FORMAT,
+                quality=PREVIEW_QUALITY, max_fps=PREVIEW_FPS)
             threading.Thread(target=self.update_video, daemon=True).start()
             threading.Thread(target=self.monitor_app_state,daemon=True).start()
             
     def update_video(self):
-        while self.video_running and self.cap:
-            ret, frame = self.cap.read()
-            if ret:
-                frame = cv2.flip(frame, 1)
-                height, width, _ = frame.shape
-                new_width = 250
-                aspect_ratio = height / width
-                new_height = int(new_width * aspect_ratio)
-                frame = cv2.resize(frame, (new_width, new_height),
-                                   interpolation=cv2.INTER_LINEAR)
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                im = Image.fromarray(frame)
-                buffer = BytesIO()
-                im.save(buffer, format="PNG")
-                img_str = base64.b64encode(buffer.getvalue()).decode("utf-8")
-                self._latest_img_str = img_str
-                try:
-                    self.video_image.src_base64 = self._latest_img_str
-                    self.page.update()
-                except RuntimeError as e:
-                    print("RuntimeError during page.update():", e)
-                    break  # Break out of the loop if event loop is closed.
+        last_seq = -1
+        while self.video_running and not self.preview.closed:
+            packet = self.frame_bus.wait_for_frame(last_seq, timeout=1.0)
+            if packet is not None:
+                last_seq = packet.seq
+                self.preview.push(packet.frame)
             else:
                 print("Warning: Frame not captured.")
-            time.sleep(0.03)
 
     def analyze_video_frame(self):
-        # Analyze a frame every 5 seconds.
+        # Analyze frames in this process at the rate the scheduler picks.
+        last_seq = -1
+        detected_state = None
         while self.video_running:
-            if self.cap:
-                ret, frame = self.cap.read()
-            else:
-                ret = False
-            if ret:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = self.face_analyzer.detect_faces(gray)
-                if faces:
-                    landmarks = self.face_analyzer.get_landmarks(
-                        gray, faces[0])
-                    rotation_vector = self.face_analyzer.get_head_pose(
-                        landmarks, frame.shape[:2])
-                    if rotation_vector is not None:
-                        yaw, pitch, roll = self.face_analyzer.rotation_vector_to_euler_angles(
-                            rotation_vector)
-                        self.last_horizontal_movement = self.face_analyzer.get_horizontal_movement_label(
-                            yaw)
-                        self.last_vertical_movement = self.face_analyzer.get_vertical_movement_label(
-                            pitch)
-                        self.last_gaze_direction = self.face_analyzer.get_gaze_direction(
-                            frame)
-                        self.last_emotion, self.last_emotion_confidence = self.emotion_analyzer.detect_emotion(
-                            frame)
-                        detected_state = {
-                            "horizontal": self.last_horizontal_movement,
-                            "vertical": self.last_vertical_movement,
-                            "gaze": self.last_gaze_direction,
-                            "emotion": self.last_emotion,
-                            "emotion_confidence": self.last_emotion_confidence,
-                        }
-                        self.app.update_storytelling_state(detected_state)
-                        analysis_text = (
-                            f"Emotion: {self.last_emotion} ({self.last_emotion_confidence * 100:.1f}%) | "
-                            f"Head: H {self.last_horizontal_movement}, V {self.last_vertical_movement} | "
-                            f"Gaze: {self.last_gaze_direction}"
-                        )
-                        
-                        self.status_text.value = analysis_text
-                        try:
-                            self.page.update()
-                        except RuntimeError as e:
-                            print(
-                                "RuntimeError during page.update() in analyze_video_frame:", e)
-                            break
-                else:
-                    self.status_text.value = "No face detected"
-                    try:
-                        self.page.update()
-                    except RuntimeError as e:
-                        print("RuntimeError during page.update() (no face):", e)
-                        break
+            packet = self.frame_bus.wait_for_frame(last_seq, timeout=1.0)
+            if packet is not None:
+                last_seq = packet.seq
+                gray = cv2.cvtColor(packet.frame, cv2.COLOR_BGR2GRAY)
+                face_box = detected_state["face_box"] if detected_state else None
+                start = time.perf_counter()
+                # Without motion in the face region the previous labels still hold.
+                reused = not (self.motion_gate is None or self.motion_gate.should_process(
+                    gray, face_box, packet.timestamp))
+                if not reused:
+                    detected_state = analyze_gray_frame(
+                        self.face_analyzer, self.emotion_analyzer, gray, self.target_selector,
+                        packet.timestamp)
+                self.scheduler.record(time.perf_counter() - start,
+                                      self.detection_labels(detected_state))
+                if not self.show_detection(detected_state, packet.seq, packet.timestamp, reused):
+                    break
             else:
                 print("Warning: Unable to capture frame for analysis.")
-            
-            time.sleep(5)
+
+            time.sleep(self.scheduler.next_interval())
+
+    def consume_perception_results(self):
+        # The worker process analyzes frames from the shared ring; only its
+        # small label records cross into the UI process.
+        while self.video_running:
+            record = self.perception_worker.get_result(timeout=1.0)
+            if record is None:
+                continue
+            detected_state = record if record["face_found"] else None
+            self.last_skip_rate = record.get("skip_rate")
+            self.scheduler.record(record["latency_ms"] / 1000.0,
+                                  self.detection_labels(detected_state))
+            self.perception_worker.set_interval(self.scheduler.next_interval())
+            if not self.show_detection(detected_state, record["seq"], record["timestamp"],
+                                       record.get("reused", False)):
+                break
+
+    def show_detection(self, detected_state, seq, timestamp, reused=False):
+        """Publish and display one analysis result; False if the page is gone."""
+        snapshot = PerceptionSnapshot.from_detection(
+            detected_state, seq, timestamp, self.snapshot, reused)
+        self.snapshot = snapshot  # Single reference swap; readers never see a mix.
+        if snapshot.face_found:
+            self.app.update_storytelling_state(snapshot)
+            self.status_text.value = (
+                f"Emotion: {snapshot.emotion_label} ({snapshot.emotion_confidence * 100:.1f}%) | "
+                f"Head: H {snapshot.horizontal_label}, V {snapshot.vertical_label} | "
+                f"Gaze: {snapshot.gaze_label}"
+            )
+        else:
+            self.status_text.value = "No face detected"
+        try:
+            self.page.update()
+        except RuntimeError as e:
+            print("RuntimeError during page.update() in show_detection:", e)
+            return False
+        return True
 
     def pause_video(self):
         self.video_running = False
-        if self.cap:
-            self.cap.release()
-            self.cap = None
+        self.frame_bus.stop()
+        if self.preview is not None:
+            self.preview.close()
+            print("Preview stats:", self.preview.stats())
+        if self.perception_worker is None and self.motion_gate is not None:
+            self.last_skip_rate = self.motion_gate.skip_rate()
+        if self.last_skip_rate is not None:
+            print(f"Motion gate skipped {self.last_skip_rate:.1%} of analyses.")
+        print("Analysis scheduler:", self.scheduler.stats())
         print("Video capture paused.")
 
     def load_story_image(self, image_path):
@@ -352,8 +470,20 @@ class StorytellingEmotionFrame(ft.Container):
         except Exception as e:
             print("Error loading story image:", e)
 
+    def stop_perception(self):
+        """Stop the perception worker and free its shared frame ring."""
+        if self.perception_worker is not None:
+            self.perception_worker.stop()
+
+    def shutdown(self):
+        """Release the camera, the worker process and its shared memory (app close)."""
+        if self.video_running:
+            self.pause_video()
+        self.stop_perception()
+
     def end_storytelling(self):
         self.pause_video()
+        self.stop_perception()
         end_time = datetime.datetime.now().isoformat()
         payload = {
             "student_id": self.app.selected_student_id,
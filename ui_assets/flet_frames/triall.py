@@ -6,6 +6,10 @@ import threading
 # Global lock to ensure only one speech is processed at a time.
 _speak_lock = threading.Lock()
 
+def is_speaking():
+    """True while a speak_text call is running."""
+    return _speak_lock.locked()
+
 def speak_text(text):
     with _speak_lock:
         # Determine the absolute path to the TTS worker script.